@@ -0,0 +1,94 @@
+"""Compares outbound request latency with a new httpx client per request and the shared client.
+
+Requests are sent concurrently to a local keep-alive stub server, the way make_request used to open
+an httpx.AsyncClient per call versus HTTPClientManager. Run from the server directory:
+
+  python -m benchmarks.http_client --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from core.http_client import HTTPClientManager
+
+
+RESPONSE = (
+  b'HTTP/1.1 200 OK\r\n'
+  b'Content-Type: application/json\r\n'
+  b'Content-Length: 11\r\n'
+  b'\r\n'
+  b'{"ok":true}'
+)
+
+
+async def handle_connection(reader, writer):
+  # Answers every request of the connection until the client closes it.
+  try:
+    while True:
+      headers = await reader.readuntil(b'\r\n\r\n')
+      for line in headers.split(b'\r\n'):
+        if line.lower().startswith(b'content-length:'):
+          await reader.readexactly(int(line.split(b':')[1]))
+
+      writer.write(RESPONSE)
+      await writer.drain()
+  except (asyncio.IncompleteReadError, ConnectionError):
+    pass
+  finally:
+    writer.close()
+
+
+async def new_client_request(url):
+  async with httpx.AsyncClient() as client:
+    return await client.request('POST', url, data={'key': 'value'})
+
+
+async def shared_client_request(url):
+  return await HTTPClientManager.request('POST', url, data={'key': 'value'})
+
+
+async def measure(send, url, requests, concurrency):
+  semaphore = asyncio.Semaphore(concurrency)
+  latencies = []
+
+  async def timed():
+    async with semaphore:
+      start = time.perf_counter()
+      await send(url)
+      latencies.append((time.perf_counter() - start) * 1000)
+
+  start = time.perf_counter()
+  await asyncio.gather(*[timed() for _ in range(requests)])
+  elapsed = time.perf_counter() - start
+  latencies.sort()
+  return {
+    'requests/s': requests / elapsed,
+    'p50 ms': statistics.median(latencies),
+    'p95 ms': latencies[int(len(latencies) * 0.95) - 1],
+  }
+
+
+async def main(requests, concurrency):
+  server = await asyncio.start_server(handle_connection, '127.0.0.1', 0)
+  url = f'http://127.0.0.1:{server.sockets[0].getsockname()[1]}/oauth/token'
+  try:
+    print(f'requests={requests} concurrency={concurrency}')
+    senders = [('client per request', new_client_request), ('shared client', shared_client_request)]
+    for name, send in senders:
+      stats = await measure(send, url, requests, concurrency)
+      print(f'{name:20}', '  '.join(f'{key}={value:8.2f}' for key, value in stats.items()))
+  finally:
+    await HTTPClientManager.close()
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--requests', type=int, default=2000)
+  parser.add_argument('--concurrency', type=int, default=50)
+  args = parser.parse_args()
+  asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,59 @@
+"""Measures how many entities per second Model.from_database constructs.
+
+This is the work done for every entity of a query result, before any field is read. Run from the
+server directory:
+
+  python -m benchmarks.model_construction --entities 100000
+"""
+import argparse
+import datetime
+import time
+
+from core.orm import fields
+from core.orm.model import Model
+from core.orm.model_key import ModelKey
+
+
+class BenchmarkOwner(Model):
+  name = fields.StringField(unique_key=True)
+
+
+class BenchmarkEntity(Model):
+  name = fields.StringField(unique_key=True)
+  owner = fields.ReferenceField(BenchmarkOwner)
+  count = fields.IntegerField()
+  enabled = fields.BooleanField()
+  description = fields.TextField()
+  created = fields.DateTimeField(auto_now_add=True)
+  modified = fields.DateTimeField(auto_now=True)
+
+
+def main(entities):
+  now = datetime.datetime.now()
+  rows = [
+    {
+      'name': f'entity-{index}',
+      'owner': ModelKey(BenchmarkOwner.kind, f'owner-{index % 10}'),
+      'count': index,
+      'enabled': bool(index % 2),
+      'description': 'A benchmark entity',
+      'created': now,
+      'modified': now,
+    }
+    for index in range(entities)
+  ]
+
+  start = time.perf_counter()
+  for row in rows:
+    BenchmarkEntity.from_database(**row)
+  elapsed = time.perf_counter() - start
+
+  print(f'entities={entities}')
+  print(f'from_database: {entities / elapsed:10.0f} entities/s')
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--entities', type=int, default=100000)
+  args = parser.parse_args()
+  main(args.entities)
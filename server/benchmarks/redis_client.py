@@ -0,0 +1,63 @@
+"""Compares requests per second of blocking vs asyncio Redis access under concurrent requests.
+
+Every simulated request fetches an entity hash, which is what RedisClient.get does on each
+authenticated request. Run from the server directory against a running Redis:
+
+  python -m benchmarks.redis_client --requests 5000 --concurrency 100
+"""
+import argparse
+import asyncio
+import time
+
+import redis
+
+from core import config
+from core.orm.redis_db import RedisDB
+
+KIND = 'BenchmarkRedisClient'
+
+
+async def measure(get, requests, concurrency):
+  """Runs `requests` calls of `get` with at most `concurrency` in flight, returns requests/s."""
+  semaphore = asyncio.Semaphore(concurrency)
+
+  async def request(index):
+    async with semaphore:
+      await get(KIND, str(index % 100))
+
+  start = time.perf_counter()
+  await asyncio.gather(*[request(index) for index in range(requests)])
+  return requests / (time.perf_counter() - start)
+
+
+async def main(requests, concurrency):
+  db = RedisDB()
+  sync_client = redis.Redis(decode_responses=True, port=config.REDIS_PORT, host=config.REDIS_HOST)
+
+  async def sync_get(kind, id):
+    # Mirrors the previous RedisDB behaviour: a blocking call inside a coroutine.
+    return sync_client.hgetall(f'{kind}:{id}')
+
+  for index in range(100):
+    await db.delete(KIND, str(index))
+    await db.create(KIND, str(index), {'key_name': str(index), 'access_token': f'token-{index}'})
+
+  try:
+    sync_rps = await measure(sync_get, requests, concurrency)
+    async_rps = await measure(db.get, requests, concurrency)
+  finally:
+    for index in range(100):
+      await db.delete(KIND, str(index))
+    sync_client.close()
+
+  print(f'requests={requests} concurrency={concurrency}')
+  print(f'sync redis:  {sync_rps:10.0f} req/s')
+  print(f'async redis: {async_rps:10.0f} req/s')
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--requests', type=int, default=5000)
+  parser.add_argument('--concurrency', type=int, default=100)
+  args = parser.parse_args()
+  asyncio.run(main(args.requests, args.concurrency))
@@ -0,0 +1,146 @@
+import collections
+import json
+import time
+
+
+_MISSING = object()
+_caches = {}
+
+
+class Cache:
+  """An in-process LRU cache with a TTL, optionally backed by a shared Redis tier.
+
+  Local entries expire after `ttl` seconds and the least recently used entries are evicted past
+  `max_size` entries. With `redis=True`, local misses are looked up in Redis, where entries are
+  stored as JSON under `cache:<name>:<key>` with the same TTL, so values must be JSON
+  serializable. Deleting an entry deletes it from both tiers, but other processes keep their local
+  copy until it expires.
+
+  `on_evict(value)` is called with the values that leave the local tier, whether they are evicted,
+  expire, or are deleted or replaced, so that resources they hold can be released.
+
+  Hit and miss counters are kept for each tier (see stats).
+  """
+
+  def __init__(self, name, max_size=1000, ttl=300, redis=False, on_evict=None):
+    self.name = name
+    self.max_size = max_size
+    self.ttl = ttl
+    self.redis = redis
+    self.on_evict = on_evict
+    self._entries = collections.OrderedDict()
+    self._counters = collections.Counter()
+
+  def _redis_key(self, key):
+    return f'cache:{self.name}:{key}'
+
+  @property
+  def _redis_client(self):
+    # redis is only a dependency of the Redis tier, the in-process cache does not need it.
+    from redis import asyncio as aioredis
+    from core.orm.redis_db import RedisDB
+
+    return aioredis.Redis(connection_pool=RedisDB.get_pool())
+
+  def _evicted(self, value):
+    if self.on_evict is not None:
+      self.on_evict(value)
+
+  def _get_local(self, key):
+    entry = self._entries.get(key)
+    if entry is None:
+      return _MISSING
+
+    expires_at, value = entry
+    if expires_at <= time.monotonic():
+      del self._entries[key]
+      self._counters['expirations'] += 1
+      self._evicted(value)
+      return _MISSING
+
+    self._entries.move_to_end(key)
+    return value
+
+  def _set_local(self, key, value, ttl):
+    previous = self._entries.get(key)
+    self._entries[key] = (time.monotonic() + ttl, value)
+    self._entries.move_to_end(key)
+    if previous is not None and previous[1] is not value:
+      self._evicted(previous[1])
+
+    while len(self._entries) > self.max_size:
+      _, (_, evicted) = self._entries.popitem(last=False)
+      self._counters['evictions'] += 1
+      self._evicted(evicted)
+
+  async def get(self, key, default=None):
+    value = self._get_local(key)
+    if value is not _MISSING:
+      self._counters['hits'] += 1
+      return value
+
+    if self.redis:
+      data = await self._redis_client.get(self._redis_key(key))
+      if data is not None:
+        self._counters['redis_hits'] += 1
+        value = json.loads(data)
+        self._set_local(key, value, self.ttl)
+        return value
+
+      self._counters['redis_misses'] += 1
+
+    self._counters['misses'] += 1
+    return default
+
+  async def set(self, key, value, ttl=None):
+    """Caches the value for `ttl` seconds, the cache TTL by default."""
+    ttl = self.ttl if ttl is None else ttl
+    self._set_local(key, value, ttl)
+    if self.redis:
+      await self._redis_client.set(self._redis_key(key), json.dumps(value), ex=max(1, int(ttl)))
+
+  async def delete(self, key):
+    entry = self._entries.pop(key, None)
+    if entry is not None:
+      self._evicted(entry[1])
+
+    if self.redis:
+      await self._redis_client.delete(self._redis_key(key))
+
+  def clear(self):
+    """Clears the local entries and counters."""
+    entries = list(self._entries.values())
+    self._entries.clear()
+    self._counters.clear()
+    for _, value in entries:
+      self._evicted(value)
+
+  def stats(self):
+    hits, misses = self._counters['hits'], self._counters['misses']
+    lookups = hits + self._counters['redis_hits'] + misses
+    return {
+      'size': len(self._entries),
+      'max_size': self.max_size,
+      'ttl': self.ttl,
+      'redis': self.redis,
+      'hits': hits,
+      'misses': misses,
+      'redis_hits': self._counters['redis_hits'],
+      'redis_misses': self._counters['redis_misses'],
+      'evictions': self._counters['evictions'],
+      'expirations': self._counters['expirations'],
+      'hit_rate': (lookups - misses) / lookups if lookups else 0.0,
+    }
+
+
+def get_cache(name, **kwargs):
+  """Returns the cache registered under the given name, creating it with kwargs on first use."""
+  if name not in _caches:
+    _caches[name] = Cache(name, **kwargs)
+
+  return _caches[name]
+
+
+def stats():
+  """Returns the stats of every registered cache by name."""
+  return {name: cache.stats() for name, cache in _caches.items()}
@@ -17,6 +17,28 @@ REMOTE_LOCALHOST = int(utils.getenv('REMOTE_LOCALHOST', default=0))
 ALLOW_UNAUTHENTICATED = [STATIC_PUBLIC_URL]
 REDIS_PORT = utils.getenv('REDIS_PORT', default=8082)
 REDIS_HOST = utils.getenv('REDIS_HOST', default='localhost')
+REDIS_MAX_CONNECTIONS = int(utils.getenv('REDIS_MAX_CONNECTIONS', default=50))
+REDIS_POOL_TIMEOUT = float(utils.getenv('REDIS_POOL_TIMEOUT', default=10))
+REDIS_SOCKET_TIMEOUT = float(utils.getenv('REDIS_SOCKET_TIMEOUT', default=5))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(utils.getenv('REDIS_SOCKET_CONNECT_TIMEOUT', default=5))
+REDIS_HEALTH_CHECK_INTERVAL = int(utils.getenv('REDIS_HEALTH_CHECK_INTERVAL', default=30))
+REDIS_QUERY_PAGE_SIZE = int(utils.getenv('REDIS_QUERY_PAGE_SIZE', default=100))
+ORM_IDENTITY_MAP = int(utils.getenv('ORM_IDENTITY_MAP', default=0))
+DATASTORE_MAX_WORKERS = int(utils.getenv('DATASTORE_MAX_WORKERS', default=16))
+DATASTORE_TIMEOUT = float(utils.getenv('DATASTORE_TIMEOUT', default=10))
+DATASTORE_QUERY_PAGE_SIZE = int(utils.getenv('DATASTORE_QUERY_PAGE_SIZE', default=100))
+AUTH_CACHE_SIZE = int(utils.getenv('AUTH_CACHE_SIZE', default=10000))
+AUTH_CACHE_TTL = int(utils.getenv('AUTH_CACHE_TTL', default=300))
+AUTH_CACHE_REDIS = int(utils.getenv('AUTH_CACHE_REDIS', default=0))
+REDIS_LOCKS = int(utils.getenv('REDIS_LOCKS', default=0))
+HTTP_MAX_CONNECTIONS = int(utils.getenv('HTTP_MAX_CONNECTIONS', default=100))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(utils.getenv('HTTP_MAX_KEEPALIVE_CONNECTIONS', default=20))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(utils.getenv('HTTP_MAX_CONNECTIONS_PER_HOST', default=20))
+HTTP_TIMEOUT = float(utils.getenv('HTTP_TIMEOUT', default=10))
+HTTP_CONNECT_TIMEOUT = float(utils.getenv('HTTP_CONNECT_TIMEOUT', default=5))
+HTTP_RETRIES = int(utils.getenv('HTTP_RETRIES', default=2))
+HTTP_RETRY_BACKOFF = float(utils.getenv('HTTP_RETRY_BACKOFF', default=0.1))
+HTTP2 = int(utils.getenv('HTTP2', default=1))
 
 
 def is_dev():
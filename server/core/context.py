@@ -0,0 +1,53 @@
+import asyncio
+
+
+class Lazy:
+  """A request context value computed by an async factory on first use, see set_lazy."""
+
+  def __init__(self, factory):
+    self._factory = factory
+    self._task = None
+
+  def __await__(self):
+    # Concurrent first uses share the same computation.
+    if self._task is None:
+      self._task = asyncio.ensure_future(self._factory())
+
+    return self._task.__await__()
+
+  def __getstate__(self):
+    # Factories and tasks cannot be pickled, e.g. by jsonpickle in the middleware test route.
+    return {}
+
+
+def set_lazy(ctx, name, factory):
+  """Registers an async factory computing ctx.<name> the first time it is awaited through get.
+
+  Middlewares use it for values that need I/O, so that requests which never use them skip the I/O.
+
+  i.e.
+
+  class AddDialpadUser(OnRequest):
+    async def middleware(request):
+      context.set_lazy(request.ctx, 'dialpad_user', lambda: DialpadUser.get_by_id(...))
+
+  class GetDialpadUser(Route):
+    async def handler(request):
+      dialpad_user = await context.get(request.ctx, 'dialpad_user')
+
+  Args:
+    ctx (types.SimpleNamespace): The request context.
+    name (str): The name of the context attribute.
+    factory (callable): Called without arguments, returns an awaitable of the value.
+  """
+  setattr(ctx, name, Lazy(factory))
+
+
+async def get(ctx, name, default=None):
+  """Returns ctx.<name>, computing and memoizing it for the request if it is lazy."""
+  value = getattr(ctx, name, default)
+  if isinstance(value, Lazy):
+    value = await value
+    setattr(ctx, name, value)
+
+  return value
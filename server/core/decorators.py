@@ -1,11 +1,10 @@
-import json
-import re
 import urllib.parse
 from functools import wraps
 from sanic.response import html
 from sanic.response import redirect
 
 from core import config
+from core import templating
 
 
 def templated_response(template_path, template_context=None, remote_localhost=False):
@@ -37,6 +36,8 @@ def templated_response(template_path, template_context=None, remote_localhost=Fa
 
   If REMOTE_LOCALHOST set to true on core config and remote_localhost set to true, request will
   be redirected to local webpack dev server.
+
+  Templates are parsed once and cached (see core.templating).
   """
   def decorator(f):
     @wraps(f)
@@ -50,13 +51,7 @@ def templated_response(template_path, template_context=None, remote_localhost=Fa
         query = urllib.parse.urlencode(request.ctx.template_context)
         return redirect(f'http://localhost:8087{request.path}?{query}')
 
-      with open(template_path) as template:
-        template_content = template.read()
-        for key, value in request.ctx.template_context.items():
-          value = value if value else ''
-          template_content = re.sub(rf'template.context.{key}', json.dumps(value), template_content)
-
-      return html(template_content)
+      return html(templating.render(template_path, request.ctx.template_context))
 
     return decorated_function
 
@@ -1,6 +1,8 @@
 from sanic.response import json
 
+from core import cache
 from core import exceptions
+from core.orm import config as orm_config
 from core.sanic import Route
 from core.models import User
 
@@ -13,3 +15,19 @@ class GetUser(Route):
     if not user:
       raise exceptions.NotFound(f'User not found: {user_id}')
     return json({'user': user.id})
+
+
+class GetCacheStats(Route):
+  PATH = '/cache/stats'
+
+  async def handler(request):
+    return json({'caches': cache.stats()})
+
+
+class GetExecutorStats(Route):
+  PATH = '/orm/executor/stats'
+
+  async def handler(request):
+    # Only clients wrapping a blocking library (e.g. DatastoreClient) run calls on an executor.
+    executor = getattr(orm_config.client, 'executor', None)
+    return json({'operations': executor.metrics.snapshot() if executor else {}})
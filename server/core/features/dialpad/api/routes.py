@@ -1,5 +1,7 @@
 from sanic.response import json
 
+from core import context
+from core.features.dialpad import utils
 from core.sanic import Route
 
 
@@ -7,4 +9,6 @@ class GetSettings(Route):
   PATH = '/settings'
 
   async def handler(request):
-    return json(request.ctx.dialpad_client.app_settings.get())
+    dialpad_user = await context.get(request.ctx, 'dialpad_user')
+    dialpad_client = await context.get(request.ctx, 'dialpad_client')
+    return json(await utils.get_app_settings(dialpad_client, dialpad_user.dialpad_api_key))
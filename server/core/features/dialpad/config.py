@@ -4,3 +4,11 @@ from core import utils
 DIALPAD_URL = utils.getenv('DIALPAD_URL')
 DIALPAD_CLIENT_ID = utils.getenv('DIALPAD_CLIENT_ID')
 DIALPAD_CLIENT_SECRET = utils.getenv('DIALPAD_CLIENT_SECRET')
+IDTOKEN_CACHE_SIZE = int(utils.getenv('DIALPAD_IDTOKEN_CACHE_SIZE', default=10000))
+IDTOKEN_CACHE_TTL = int(utils.getenv('DIALPAD_IDTOKEN_CACHE_TTL', default=300))
+APP_SETTINGS_CACHE_SIZE = int(utils.getenv('DIALPAD_APP_SETTINGS_CACHE_SIZE', default=10000))
+APP_SETTINGS_CACHE_TTL = int(utils.getenv('DIALPAD_APP_SETTINGS_CACHE_TTL', default=60))
+APP_SETTINGS_STALE_TTL = int(utils.getenv('DIALPAD_APP_SETTINGS_STALE_TTL', default=600))
+CLIENT_CACHE_SIZE = int(utils.getenv('DIALPAD_CLIENT_CACHE_SIZE', default=1000))
+CLIENT_CACHE_TTL = int(utils.getenv('DIALPAD_CLIENT_CACHE_TTL', default=3600))
+CLIENT_POOL_SIZE = int(utils.getenv('DIALPAD_CLIENT_POOL_SIZE', default=20))
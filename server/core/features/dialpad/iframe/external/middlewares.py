@@ -1,13 +1,22 @@
 from core import config
+from core import context
 from core.features.dialpad.iframe.external.core.client import ExternalClient
 from core.features.dialpad.iframe.external.core.oauth import CodeGrantOAuthHelper
 from core.sanic import OnRequest
 
 
 class AddExternalClient(OnRequest):
+  """Adds ExternalClient to the request context, connected on first use (see context.get)."""
 
   async def middleware(request):
     redirect_uri = f"{config.BASE_URL}{request.path.split('external')[0]}external/oauth-redirect"
-    request.ctx.external_client = ExternalClient(CodeGrantOAuthHelper(redirect_uri=redirect_uri))
-    if request.ctx.user:
-      await request.ctx.external_client.get_connection(request.ctx.user.id)
+    user = request.ctx.user
+
+    async def get_external_client():
+      external_client = ExternalClient(CodeGrantOAuthHelper(redirect_uri=redirect_uri))
+      if user:
+        await external_client.get_connection(user.id)
+
+      return external_client
+
+    context.set_lazy(request.ctx, 'external_client', get_external_client)
@@ -2,6 +2,7 @@ import os
 
 from sanic.response import json
 
+from core import context
 from core import exceptions
 from core.decorators import templated_response
 from core.sanic import Route
@@ -21,8 +22,9 @@ class OAuthRedirect(Route):
     )
   )
   async def handler(request):
+    external_client = await context.get(request.ctx, 'external_client')
     try:
-      await request.ctx.external_client.fetch_access_token(request.args)
+      await external_client.fetch_access_token(request.args)
     except Exception as e:
       raise exceptions.BadRequestError(f'Cannot fetch access token on OAuth redirect: \n {e}')
 
@@ -31,4 +33,5 @@ class GetConnection(Route):
   PATH = '/connection'
 
   async def handler(request):
-    return json(await request.ctx.external_client.get_connection(request.ctx.user.id))
+    external_client = await context.get(request.ctx, 'external_client')
+    return json(await external_client.get_connection(request.ctx.user.id))
@@ -1,3 +1,5 @@
+from core import context
+from core.features.dialpad import utils
 from core.sanic import OnRequest
 
 
@@ -9,5 +11,7 @@ class FetchOAuthAppSettings(OnRequest):
   """
 
   async def middleware(request):
-    settings = request.ctx.dialpad_client.app_settings.get()
+    dialpad_user = await context.get(request.ctx, 'dialpad_user')
+    dialpad_client = await context.get(request.ctx, 'dialpad_client')
+    settings = await utils.get_app_settings(dialpad_client, dialpad_user.dialpad_api_key)
     request.ctx.template_context['OAUTH_APP_SETTINGS'] = settings
@@ -4,50 +4,45 @@ from core.sanic import OnRequest
 from core.features.dialpad import config as dialpad_config
 from core.features.dialpad import utils
 from core.features.dialpad.models import DialpadUser
-from core.models import User
 
 
 class AuthenticateDialpad(OnRequest):
   """Bypass core authentication and uses Dialpad Iframe idtoken authentication."""
 
   async def middleware(request):
-    path = f'/{request.route.path}' if request.route else request.path
+    # Only the routes of the dialpad feature and its children are authenticated with an idtoken.
     if (
       request.args.get('access_token') or
       request.ctx.allow_unauthenticated or
-      (
-        request.route and
-        request.route.ctx and
-        hasattr(request.route.ctx, 'allow_unauthenticated')
-        and request.route.ctx.allow_unauthenticated
-      ) or
-      not path.startswith('/dialpad')
+      dialpad.unique_name not in request.ctx.route_policy.features
     ):
       return
 
     idtoken = request.args.get('idtoken')
     request.ctx.idtoken = idtoken
-    payload = await utils.get_auth_payload_from_idtoken(
-      idtoken, dialpad_config.DIALPAD_CLIENT_SECRET
-    )
-    dialpad_user_id = str(payload['user_id'])
-    dialpad_api_key = str(payload['api_key'])
-
-    dialpad_user = await DialpadUser.get_by_dialpad_user_id(dialpad_user_id)
+    dialpad_user, user = await utils.get_cached_idtoken_users(idtoken)
     if not dialpad_user:
-      user = await User.create()
-      dialpad_user = await DialpadUser.create(
-        user=user, dialpad_user_id=dialpad_user_id, dialpad_api_key=dialpad_api_key
+      payload = await utils.get_auth_payload_from_idtoken(
+        idtoken, dialpad_config.DIALPAD_CLIENT_SECRET
       )
-    else:
+      dialpad_user_id = str(payload['user_id'])
+      dialpad_api_key = str(payload['api_key'])
+
+      dialpad_user = await DialpadUser.get_by_dialpad_user_id(dialpad_user_id)
+      if not dialpad_user:
+        dialpad_user = await DialpadUser.provision(dialpad_user_id, dialpad_api_key)
+
       await dialpad_user.update_api_key_if_needed(dialpad_api_key)
 
+      user = await dialpad_user.resolve('user')
+      await utils.cache_idtoken_users(idtoken, payload, dialpad_user, user)
+
     request.ctx.dialpad_user = dialpad_user
-    request.ctx.user = dialpad_user.user
+    request.ctx.user = user
     request.ctx.authenticated = True
 
-
 dpi = Application.get_feature('dpi')
+dialpad = Application.get_feature('dpi_dialpad')
 # Injects AuthenticateDialpad middleware before any root middleware injected. This will ensure
 # that Dialpad Authentication will be prioritized over root middlewares.
 dpi.inject_middleware(AuthenticateDialpad)
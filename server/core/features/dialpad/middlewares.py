@@ -1,34 +1,42 @@
-from dialpad import DialpadClient
-
 from core import config as core_config
+from core import context
 from core import utils as core_utils
 from core.features.dialpad import config as dialpad_config
+from core.features.dialpad import utils as dialpad_utils
 from core.features.dialpad.models import DialpadUser
 from core.sanic import OnRequest
 from core.sanic import OnResponse
 
 
 class AddDialpadUser(OnRequest):
-  """Adds DialpadUser to the request context."""
+  """Adds DialpadUser to the request context, fetched on first use (see context.get)."""
 
   async def middleware(request):
     if not request.ctx.authenticated:
       return
 
     if not hasattr(request.ctx, 'dialpad_user') or not request.ctx.dialpad_user:
-      request.ctx.dialpad_user = await DialpadUser.get_by_id(request.ctx.user.id)
+      user_id = request.ctx.user.id
+      context.set_lazy(request.ctx, 'dialpad_user', lambda: DialpadUser.get_by_id(user_id))
 
 
 class AddDialpadClient(OnRequest):
-  """Adds DialpadClient to the request context."""
+  """Adds the DialpadClient of the Dialpad user to the request context, reused across requests.
+
+  The client is looked up on first use (see context.get).
+  """
 
   async def middleware(request):
     request.ctx.dialpad_client = None
     if request.ctx.authenticated:
-      request.ctx.dialpad_client = DialpadClient(
-        request.ctx.dialpad_user.dialpad_api_key,
-        base_url=dialpad_config.DIALPAD_URL,
-      )
+      async def get_dialpad_client():
+        dialpad_user = await context.get(request.ctx, 'dialpad_user')
+        return await dialpad_utils.get_dialpad_client(
+          dialpad_user.dialpad_api_key,
+          base_url=dialpad_config.DIALPAD_URL,
+        )
+
+      context.set_lazy(request.ctx, 'dialpad_client', get_dialpad_client)
 
 
 class AddCorsHeaders(OnResponse):
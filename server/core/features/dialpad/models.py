@@ -1,9 +1,15 @@
+from core import config
 from core.orm import fields
 from core.orm.model import Model
+from core.singleflight import SingleFlight
 
 from core.models import User
 
 
+# Provisions each Dialpad user once, even when their first requests arrive concurrently.
+provisioning = SingleFlight('dialpad_user', redis_lock=bool(config.REDIS_LOCKS))
+
+
 class DialpadUser(Model):
   user = fields.ReferenceField(User, unique_key=True)
   dialpad_user_id = fields.StringField()
@@ -16,6 +22,28 @@ class DialpadUser(Model):
     ]
     return results[0] if results else None
 
+  @classmethod
+  async def provision(cls, dialpad_user_id, dialpad_api_key):
+    """Returns the DialpadUser of the given Dialpad user id, creating it along with its User.
+
+    Concurrent calls for the same Dialpad user id share a single provisioning.
+    """
+    return await provisioning.do(
+      dialpad_user_id, cls._provision, dialpad_user_id, dialpad_api_key
+    )
+
+  @classmethod
+  async def _provision(cls, dialpad_user_id, dialpad_api_key):
+    # Another worker may have provisioned the user while this one was waiting for the lock.
+    dialpad_user = await cls.get_by_dialpad_user_id(dialpad_user_id)
+    if dialpad_user:
+      return dialpad_user
+
+    user = await User.create()
+    return await cls.create(
+      user=user, dialpad_user_id=dialpad_user_id, dialpad_api_key=dialpad_api_key
+    )
+
   async def update_api_key_if_needed(self, api_key):
     if self.dialpad_api_key != api_key:
       self.dialpad_api_key = api_key
@@ -1,5 +1,10 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
 from unittest.mock import patch
 
+from core import context
 from core.features.dialpad import config
 from core.features.dialpad import middlewares
 from core.features.dialpad import utils
@@ -26,20 +31,49 @@ class TestDialpadMiddleware(base.TransactionalClassTestCase):
     self.request.ctx.user = self.user
     self.request.ctx.authenticated = True
     await middlewares.AddDialpadUser.middleware(self.request)
-    self.assertEqual(self.dialpad_user.id, self.request.ctx.dialpad_user.id)
+    dialpad_user = await context.get(self.request.ctx, 'dialpad_user')
+    self.assertEqual(self.dialpad_user.id, dialpad_user.id)
 
     with patch.object(DialpadUser, 'get_by_id') as mock_dialpad_user:
       await middlewares.AddDialpadUser.middleware(self.request)
       mock_dialpad_user.assert_not_called()
 
   async def test_add_dialpad_client(self):
+    utils.dialpad_clients.clear()
     self.request.ctx.authenticated = True
     self.request.ctx.dialpad_user = self.dialpad_user
-    with patch('core.features.dialpad.middlewares.DialpadClient') as mock_dialpad_client:
+    with patch.object(
+      utils, 'PooledDialpadClient', wraps=utils.PooledDialpadClient
+    ) as mock_dialpad_client:
       await middlewares.AddDialpadClient.middleware(self.request)
+      mock_dialpad_client.assert_not_called()
+
+      dialpad_client = await context.get(self.request.ctx, 'dialpad_client')
       mock_dialpad_client.assert_called_with(
         self.dialpad_user.dialpad_api_key, base_url=config.DIALPAD_URL
       )
+      self.assertIs(utils.get_adapter(), dialpad_client._session.get_adapter(config.DIALPAD_URL))
+
+      # The client is reused by the next requests of the same API key.
+      await middlewares.AddDialpadClient.middleware(self.request)
+      self.assertIs(dialpad_client, await context.get(self.request.ctx, 'dialpad_client'))
+      self.assertEqual(1, mock_dialpad_client.call_count)
+
+    # Clients of other API keys share the connection pool, not the session and its cookies.
+    other_client = await utils.get_dialpad_client('other-api-key', base_url=config.DIALPAD_URL)
+    self.assertIsNot(dialpad_client._session, other_client._session)
+    self.assertIs(
+      dialpad_client._session.get_adapter(config.DIALPAD_URL),
+      other_client._session.get_adapter(config.DIALPAD_URL),
+    )
+
+    # Evicted clients close their session, not the shared connection pool.
+    adapter = utils.get_adapter()
+    with patch.object(other_client._session, 'close', wraps=other_client._session.close) as close:
+      with patch.object(adapter.poolmanager, 'clear') as clear_pool:
+        utils.dialpad_clients.clear()
+        close.assert_called_once()
+        clear_pool.assert_not_called()
 
 
 class TestDialpad(base.TransactionalTestCase):
@@ -59,6 +93,94 @@ class TestDialpad(base.TransactionalTestCase):
     response = await self.make_middleware_test_request('/dialpad', params={'idtoken': self.idtoken})
     self.assertEqual(User, type(response.request_context.user))
 
+  async def test_concurrent_first_requests(self):
+    idtoken = utils.get_mock_idtoken(user_id='2', api_key='new-api-key')
+    responses = await asyncio.gather(*[
+      self.make_middleware_test_request('/dialpad', params={'idtoken': idtoken})
+      for _ in range(10)
+    ])
+
+    user_ids = {response.request_context.user.id for response in responses}
+    self.assertEqual(1, len(user_ids))
+    self.assertEqual(2, len([user async for user in User.all()]))
+    dialpad_users = [user async for user in DialpadUser.all().filter('dialpad_user_id', '=', '2')]
+    self.assertEqual(1, len(dialpad_users))
+    self.assertEqual(user_ids, {dialpad_users[0].user.id})
+
   async def test_authentication_fails(self):
     response = await self.make_middleware_test_request('/dialpad')
     self.assertEqual(response.status_code, 403)
+
+
+class TestIdtokenCache(base.TransactionalTestCase):
+
+  async def asyncSetUp(self):
+    await super().asyncSetUp()
+    utils.idtoken_cache.clear()
+    self.user = await User.create()
+    self.dialpad_user = await DialpadUser.create(
+      user=self.user, dialpad_user_id='1', dialpad_api_key='test-api-key'
+    )
+    self.payload = {'user_id': '1', 'api_key': 'test-api-key'}
+
+  async def test_cached_users(self):
+    self.assertEqual((None, None), await utils.get_cached_idtoken_users('idtoken'))
+
+    await utils.cache_idtoken_users('idtoken', self.payload, self.dialpad_user, self.user)
+    dialpad_user, user = await utils.get_cached_idtoken_users('idtoken')
+    self.assertEqual(self.dialpad_user.id, dialpad_user.id)
+    self.assertEqual(self.user.id, user.id)
+    self.assertEqual((None, None), await utils.get_cached_idtoken_users('other-idtoken'))
+
+  async def test_expired_idtoken(self):
+    self.payload['exp'] = time.time() - 1
+    await utils.cache_idtoken_users('idtoken', self.payload, self.dialpad_user, self.user)
+    self.assertEqual((None, None), await utils.get_cached_idtoken_users('idtoken'))
+
+    self.payload['exp'] = time.time() + 1
+    with patch.object(utils.idtoken_cache, 'set', wraps=utils.idtoken_cache.set) as mock_set:
+      await utils.cache_idtoken_users('idtoken', self.payload, self.dialpad_user, self.user)
+      self.assertLessEqual(mock_set.call_args.kwargs['ttl'], 1)
+
+  async def test_deleted_user(self):
+    await utils.cache_idtoken_users('idtoken', self.payload, self.dialpad_user, self.user)
+    await self.dialpad_user.delete()
+    self.assertEqual((None, None), await utils.get_cached_idtoken_users('idtoken'))
+
+
+class TestAppSettingsCache(unittest.IsolatedAsyncioTestCase):
+
+  def setUp(self):
+    utils.app_settings_cache.clear()
+    self.dialpad_client = mock.MagicMock()
+    self.dialpad_client.app_settings.get.side_effect = lambda: time.sleep(0.01) or {'version': 1}
+
+  async def test_coalesced_and_cached(self):
+    settings = await asyncio.gather(*[
+      utils.get_app_settings(self.dialpad_client, 'api-key') for _ in range(5)
+    ])
+    self.assertEqual([{'version': 1}] * 5, settings)
+    self.assertEqual({'version': 1}, await utils.get_app_settings(self.dialpad_client, 'api-key'))
+    self.assertEqual(1, self.dialpad_client.app_settings.get.call_count)
+
+    await utils.get_app_settings(self.dialpad_client, 'other-api-key')
+    self.assertEqual(2, self.dialpad_client.app_settings.get.call_count)
+
+  async def test_stale_while_revalidate(self):
+    with patch('time.monotonic', return_value=100):
+      await utils.get_app_settings(self.dialpad_client, 'api-key')
+
+    self.dialpad_client.app_settings.get.side_effect = lambda: {'version': 2}
+    stale_at = 100 + config.APP_SETTINGS_CACHE_TTL
+    with patch('time.monotonic', return_value=stale_at):
+      self.assertEqual({'version': 1}, await utils.get_app_settings(self.dialpad_client, 'api-key'))
+
+      # The stale settings are served until the background refresh completes.
+      deadline = time.time() + 1
+      settings = {'version': 1}
+      while settings == {'version': 1} and time.time() < deadline:
+        await asyncio.sleep(0)
+        settings = await utils.get_app_settings(self.dialpad_client, 'api-key')
+
+      self.assertEqual({'version': 2}, settings)
+      self.assertEqual(2, self.dialpad_client.app_settings.get.call_count)
@@ -1,8 +1,19 @@
+import asyncio
+import hashlib
+import time
+
+from dialpad import DialpadClient
+from requests.adapters import HTTPAdapter
 from jose import jwe
 from jose import jwt
 
+from core import cache
 from core import exceptions
 from core.features.dialpad import config
+from core.features.dialpad.models import DialpadUser
+from core.logging import logger
+from core.models import User
+from core.singleflight import SingleFlight
 
 
 async def get_auth_payload_from_idtoken(id_token, secret):
@@ -27,4 +38,149 @@ async def get_auth_payload_from_idtoken(id_token, secret):
 def get_mock_idtoken(user_id='test-dialpad-user-id', api_key='test-dialpad-api-key'):
   """Returns mock encrypted idtoken in the same format Dialpad using."""
   jwt_token = jwt.encode({'user_id': user_id, 'api_key': api_key}, config.DIALPAD_CLIENT_SECRET)
-  return jwe.encrypt(jwt_token, config.DIALPAD_CLIENT_SECRET[:32])
+  return jwe.encrypt(jwt_token, config.DIALPAD_CLIENT_SECRET[:32]).decode()
+
+
+# sha256(idtoken) -> decoded payload and the ids of the DialpadUser and User it authenticates.
+# Kept in-process only, since payloads hold API keys.
+idtoken_cache = cache.get_cache(
+  'dialpad_idtoken',
+  max_size=config.IDTOKEN_CACHE_SIZE,
+  ttl=config.IDTOKEN_CACHE_TTL,
+)
+
+
+# sha256(api_key) -> (fetched_at, settings). Entries outlive APP_SETTINGS_CACHE_TTL by
+# APP_SETTINGS_STALE_TTL seconds, during which they are served while being refreshed.
+app_settings_cache = cache.get_cache(
+  'dialpad_app_settings',
+  max_size=config.APP_SETTINGS_CACHE_SIZE,
+  ttl=config.APP_SETTINGS_CACHE_TTL + config.APP_SETTINGS_STALE_TTL,
+)
+app_settings_fetches = SingleFlight('dialpad_app_settings')
+
+# sha256(api_key:base_url) -> PooledDialpadClient.
+dialpad_clients = cache.get_cache(
+  'dialpad_clients',
+  max_size=config.CLIENT_CACHE_SIZE,
+  ttl=config.CLIENT_CACHE_TTL,
+  on_evict=lambda dialpad_client: dialpad_client.close(),
+)
+_adapter = None
+
+
+def _digest(value):
+  return hashlib.sha256(value.encode()).hexdigest()
+
+
+async def get_cached_idtoken_users(idtoken):
+  """Returns the DialpadUser and User authenticated by an already verified idtoken.
+
+  Returns (None, None) if the idtoken has not been verified yet, or expired.
+  """
+  if not idtoken:
+    return None, None
+
+  digest = _digest(idtoken)
+  entry = await idtoken_cache.get(digest)
+  if not entry:
+    return None, None
+
+  dialpad_user, user = await asyncio.gather(
+    DialpadUser.get_by_id(entry['dialpad_user_id']), User.get_by_id(entry['user_id'])
+  )
+  if not dialpad_user or not user:
+    await idtoken_cache.delete(digest)
+    return None, None
+
+  return dialpad_user, user
+
+
+async def cache_idtoken_users(idtoken, payload, dialpad_user, user):
+  """Remembers the users authenticated by the idtoken, at most until the idtoken expires."""
+  ttl = idtoken_cache.ttl
+  if 'exp' in payload:
+    ttl = min(ttl, payload['exp'] - time.time())
+    if ttl <= 0:
+      return
+
+  entry = {'payload': payload, 'dialpad_user_id': dialpad_user.id, 'user_id': user.id}
+  await idtoken_cache.set(_digest(idtoken), entry, ttl=ttl)
+
+
+async def _fetch_app_settings(digest, dialpad_client):
+  # The Dialpad client is blocking, so it is called off the event loop.
+  settings = await asyncio.to_thread(dialpad_client.app_settings.get)
+  await app_settings_cache.set(digest, (time.monotonic(), settings))
+  return settings
+
+
+def _log_refresh_error(task):
+  if not task.cancelled() and task.exception():
+    logger.warning(f'Could not refresh Dialpad app settings: {task.exception()}')
+
+
+async def get_app_settings(dialpad_client, api_key):
+  """Returns the OAuth app settings fetched with the Dialpad client, cached per API key.
+
+  Settings older than APP_SETTINGS_CACHE_TTL seconds are returned as they are while they are
+  refreshed in the background. Concurrent fetches for the same API key share one request.
+  """
+  digest = _digest(api_key)
+  entry = await app_settings_cache.get(digest)
+  if entry is None:
+    return await app_settings_fetches.do(digest, _fetch_app_settings, digest, dialpad_client)
+
+  fetched_at, settings = entry
+  if time.monotonic() - fetched_at >= config.APP_SETTINGS_CACHE_TTL:
+    refresh = app_settings_fetches.start(digest, _fetch_app_settings, digest, dialpad_client)
+    refresh.add_done_callback(_log_refresh_error)
+
+  return settings
+
+
+class SharedHTTPAdapter(HTTPAdapter):
+  """An HTTPAdapter mounted on several sessions, closing one of them leaves its pool open."""
+
+  def close(self):
+    pass
+
+
+def get_adapter():
+  """Returns the keep-alive connection pool shared by the Dialpad clients, created on first use."""
+  global _adapter
+  if _adapter is None:
+    _adapter = SharedHTTPAdapter(
+      pool_connections=config.CLIENT_POOL_SIZE, pool_maxsize=config.CLIENT_POOL_SIZE
+    )
+
+  return _adapter
+
+
+class PooledDialpadClient(DialpadClient):
+  """A DialpadClient sending its requests through the shared connection pool (see get_adapter).
+
+  Each client keeps the session it creates for itself, so cookies are never shared between API
+  keys, only the pooled connections are. The session is closed once the client leaves the
+  dialpad_clients cache.
+  """
+
+  def __init__(self, token, sandbox=False, base_url=None):
+    super().__init__(token, sandbox=sandbox, base_url=base_url)
+    self._session.mount('http://', get_adapter())
+    self._session.mount('https://', get_adapter())
+
+  def close(self):
+    """Closes the session of the client, the shared connection pool stays open."""
+    self._session.close()
+
+
+async def get_dialpad_client(api_key, base_url=None):
+  """Returns the DialpadClient of the given API key and base url, creating it on first use."""
+  digest = _digest(f'{api_key}:{base_url}')
+  dialpad_client = await dialpad_clients.get(digest)
+  if dialpad_client is None:
+    dialpad_client = PooledDialpadClient(api_key, base_url=base_url)
+    await dialpad_clients.set(digest, dialpad_client)
+
+  return dialpad_client
@@ -0,0 +1,102 @@
+import asyncio
+import collections
+import weakref
+
+import httpx
+
+from core import config
+
+
+# Requests are retried on these responses, and on transport errors, only if sending them twice is
+# safe. Requests that could not connect are retried whatever their method.
+RETRY_STATUS_CODES = frozenset([502, 503, 504])
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class HTTPClientManager:
+  """Shares keep-alive httpx.AsyncClients between the outbound requests of the application.
+
+  httpx clients are bound to the loop that opened their connections, so one client is kept per
+  running event loop. The server opens it when it starts and closes it when it stops (see
+  Application.create_sanic_app), outside of the server it is opened on first use.
+
+  At most HTTP_MAX_CONNECTIONS_PER_HOST requests are sent to a host at a time, HTTP/2 is used with
+  the hosts that support it if HTTP2 is set.
+  """
+  _clients = weakref.WeakKeyDictionary()
+  _host_limits = weakref.WeakKeyDictionary()
+
+  @classmethod
+  def _create_client(cls):
+    return httpx.AsyncClient(
+      http2=bool(config.HTTP2),
+      limits=httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+      ),
+      timeout=httpx.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+    )
+
+  @classmethod
+  def get_client(cls):
+    """Returns the client of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = cls._clients.get(loop)
+    if client is None or client.is_closed:
+      client = cls._clients[loop] = cls._create_client()
+      cls._host_limits[loop] = collections.defaultdict(
+        lambda: asyncio.Semaphore(config.HTTP_MAX_CONNECTIONS_PER_HOST)
+      )
+
+    return client
+
+  @classmethod
+  async def start(cls, app=None, loop=None):
+    """Opens the client of the running event loop, used as a Sanic listener."""
+    cls.get_client()
+
+  @classmethod
+  async def close(cls, app=None, loop=None):
+    """Closes the client of the running event loop, used as a Sanic listener."""
+    loop = asyncio.get_running_loop()
+    # The semaphores are bound to the loop too, the next client starts with fresh ones.
+    cls._host_limits.pop(loop, None)
+    client = cls._clients.pop(loop, None)
+    if client is not None:
+      await client.aclose()
+
+  @classmethod
+  async def request(cls, method, url, **kwargs):
+    """Sends the request with the shared client, retrying it up to HTTP_RETRIES times.
+
+    Retries wait HTTP_RETRY_BACKOFF seconds, doubled after every attempt.
+
+    Args:
+      method (str): The HTTP method for this request.
+      url (str): The url to be called.
+      kwargs: The arguments of httpx.AsyncClient.request.
+
+    Returns:
+      httpx.Response
+    """
+    method = method.upper()
+    client = cls.get_client()
+    host_limit = cls._host_limits[asyncio.get_running_loop()][httpx.URL(url).host]
+    retry = method in IDEMPOTENT_METHODS
+    for attempt in range(config.HTTP_RETRIES + 1):
+      last_attempt = attempt == config.HTTP_RETRIES
+      try:
+        async with host_limit:
+          response = await client.request(method, url, **kwargs)
+      except CONNECT_ERRORS:
+        if last_attempt:
+          raise
+      except httpx.TransportError:
+        if not retry or last_attempt:
+          raise
+      else:
+        if not retry or last_attempt or response.status_code not in RETRY_STATUS_CODES:
+          return response
+
+      await asyncio.sleep(config.HTTP_RETRY_BACKOFF * 2 ** attempt)
@@ -1,9 +1,20 @@
 import uuid
 
+from core import cache
+from core import config
 from core.orm import fields
 from core.orm.model import Model
 
 
+# access_token -> User id, saves the access token query on authenticated requests.
+access_token_cache = cache.get_cache(
+  'access_token',
+  max_size=config.AUTH_CACHE_SIZE,
+  ttl=config.AUTH_CACHE_TTL,
+  redis=bool(config.AUTH_CACHE_REDIS),
+)
+
+
 class User(Model):
   """Core User model."""
   key_name = fields.StringField(unique_key=True)
@@ -18,5 +29,32 @@ class User(Model):
 
   @classmethod
   async def get_by_access_token(cls, access_token):
+    """Returns the user with the given access token, through the access token cache."""
+    user_id = await access_token_cache.get(access_token)
+    if user_id is not None:
+      user = await cls.get_by_id(user_id)
+      # Tokens changed outside of this process are only caught here.
+      if user and user.access_token == access_token:
+        return user
+
+      await access_token_cache.delete(access_token)
+
     results = [user async for user in cls.all().filter('access_token', '=', access_token).limit(1)]
-    return results[0] if results else None
+    if not results:
+      return None
+
+    await access_token_cache.set(access_token, results[0].id)
+    return results[0]
+
+  async def update(self):
+    previous_access_token = self.fields['access_token'].get_persisted_value(self)
+    changed = 'access_token' in self.dirty_fields
+    result = await super().update()
+    if changed and previous_access_token:
+      await access_token_cache.delete(previous_access_token)
+
+    return result
+
+  async def delete(self):
+    await super().delete()
+    await access_token_cache.delete(self.access_token)
@@ -1,4 +1,5 @@
 import abc
+from typing import AsyncIterator
 from typing import Optional
 
 from core.orm import model
@@ -40,6 +41,20 @@ class Client(metaclass=abc.ABCMeta):
   async def delete(self, key: 'model.ModelKey') -> None:
     pass
 
+  @abc.abstractmethod
+  async def get_multi(self, keys: 'list[model.ModelKey]') -> 'list[Optional[model.Model]]':
+    """Returns the entities of the given keys in the same order, None for missing entities."""
+    pass
+
+  @abc.abstractmethod
+  async def put_multi(self, instances: 'list[model.Model]') -> 'list[model.Model]':
+    """Creates or replaces the given entities."""
+    pass
+
+  @abc.abstractmethod
+  async def delete_multi(self, keys: 'list[model.ModelKey]') -> None:
+    pass
+
   @abc.abstractmethod
   async def flushall(self) -> None:
     pass
@@ -56,5 +71,42 @@ class Client(metaclass=abc.ABCMeta):
     """Returns a tuple containing a list of models and a cursor."""
     pass
 
+  async def stream_query(
+    self,
+    model_cls: type['model.Model'],
+    filters: dict,
+    order_by: list = None,
+    limit: int = None,
+    cursor: str = None,
+    page_size: int = None,
+  ) -> 'AsyncIterator[tuple[model.Model, str]]':
+    """Yields the query results one by one, each with a cursor resuming the query at that result.
+
+    This default implementation reads the pages of run_query one at a time and ignores page_size.
+    Its cursors are "<page cursor>:<index>", so resuming re-reads the page and skips the results
+    before the index. Clients should override it with cursors pointing right at each result.
+    """
+    skip = 0
+    if cursor:
+      split_cursor = cursor.split(':')
+      cursor = ':'.join(split_cursor[:-1]) or None
+      skip = int(split_cursor[-1])
+
+    while True:
+      page, next_cursor = await self.run_query(
+        model_cls, filters, order_by=order_by, limit=limit, cursor=cursor
+      )
+      for index, item in enumerate(page[skip:], start=skip):
+        yield item, ':'.join([cursor or '', str(index)])
+
+      if not page or not next_cursor:
+        break
+
+      cursor, skip = next_cursor, 0
+
+  async def close(self) -> None:
+    """Releases the connections the client opened on the running event loop."""
+    pass
+
   def query(self, model_cls):
     return Query(self, model_cls)
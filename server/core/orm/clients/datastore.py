@@ -5,13 +5,26 @@ from google.cloud import datastore
 from core import config
 from core import exceptions
 from core import utils
+from core.orm import exceptions as orm_exceptions
 from core.orm import model
 from core.orm.clients.base import Client
+from core.orm.executor import BlockingExecutor
+from typing import AsyncIterator
 from typing import Optional
 
 
 class DatastoreClient(Client):
+  """Google Cloud Datastore storage.
+
+  The datastore library is blocking, so every RPC runs on a bounded thread pool (see
+  BlockingExecutor) sized by DATASTORE_MAX_WORKERS, and fails after DATASTORE_TIMEOUT seconds.
+  """
   client = datastore.Client()
+  executor = BlockingExecutor(
+    max_workers=config.DATASTORE_MAX_WORKERS,
+    timeout=config.DATASTORE_TIMEOUT,
+    thread_name_prefix='datastore',
+  )
 
   def _serialize_value(self, value):
     if isinstance(value, model.ModelKey):
@@ -26,7 +39,7 @@ class DatastoreClient(Client):
     return value
 
   async def get(self, key: 'model.ModelKey') -> 'model.Model':
-    entity = self.client.get(self._serialize_value(key))
+    entity = await self.executor.run('get', self.client.get, self._serialize_value(key))
     if not entity:
       return
     data = {k: self._deserialize_value(v) for k, v in dict(entity).items()}
@@ -38,24 +51,69 @@ class DatastoreClient(Client):
 
     data = instance.serialize()
     entity.update({k: self._serialize_value(v) for k, v in data.items()})
-    entity = self.client.put(entity)
+    await self.executor.run('put', self.client.put, entity)
 
     return instance.set_persisted(**data)
 
-  async def update(self, instance: 'model.Model') -> 'model.Model':
+  def _update(self, ds_key, data):
+    """Applies data to the stored entity in a transaction, returns False if it does not exist."""
     with self.client.transaction():
-      entity = self.client.get(self._serialize_value(instance.key))
+      entity = self.client.get(ds_key)
       if not entity:
-        return
+        return False
 
-      data = instance.serialize()
       entity.update({k: self._serialize_value(v) for k, v in data.items()})
-      entity = self.client.put(entity)
+      self.client.put(entity)
+
+    return True
+
+  async def update(self, instance: 'model.Model') -> 'model.Model':
+    # Only the changed fields are written, other properties keep their stored values.
+    data = instance.serialize(instance.dirty_fields)
+    ds_key = self._serialize_value(instance.key)
+    if not await self.executor.run('update', self._update, ds_key, data):
+      return
 
     return instance.set_persisted(**data)
 
   async def delete(self, key: 'model.ModelKey') -> None:
-    self.client.delete(self._serialize_value(key))
+    await self.executor.run('delete', self.client.delete, self._serialize_value(key))
+
+  async def get_multi(self, keys: 'list[model.ModelKey]') -> 'list[Optional[model.Model]]':
+    # Datastore returns the found entities in no particular order.
+    found = await self.executor.run(
+      'get_multi', self.client.get_multi, [self._serialize_value(key) for key in keys]
+    )
+    entities = {entity.key: entity for entity in found}
+    results = []
+    for key in keys:
+      entity = entities.get(self._serialize_value(key))
+      if not entity:
+        results.append(None)
+        continue
+
+      data = {k: self._deserialize_value(v) for k, v in dict(entity).items()}
+      results.append(key.model_cls.from_database(**data))
+
+    return results
+
+  async def put_multi(self, instances: 'list[model.Model]') -> 'list[model.Model]':
+    data = [instance.serialize() for instance in instances]
+    entities = []
+    for instance, values in zip(instances, data):
+      entity = datastore.Entity(
+        self._serialize_value(instance.key), exclude_from_indexes=instance.exclude_from_indexes
+      )
+      entity.update({k: self._serialize_value(v) for k, v in values.items()})
+      entities.append(entity)
+
+    await self.executor.run('put_multi', self.client.put_multi, entities)
+    return [instance.set_persisted(**values) for instance, values in zip(instances, data)]
+
+  async def delete_multi(self, keys: 'list[model.ModelKey]') -> None:
+    await self.executor.run(
+      'delete_multi', self.client.delete_multi, [self._serialize_value(key) for key in keys]
+    )
 
   async def _flushall(self):
     await utils.make_request('POST', f"{utils.getenv('DATASTORE_HOST')}/reset")
@@ -86,6 +144,85 @@ class DatastoreClient(Client):
     cursor: str = None,
   ) -> 'tuple[list[model.Model], Optional[str]]':
 
+    query = self._build_query(model_cls, filters, order_by)
+    entities, next_cursor = await self.executor.run(
+      'run_query', self._fetch, query, limit=limit, cursor=cursor
+    )
+    return [self._from_entity(model_cls, entity) for entity in entities], next_cursor
+
+  async def stream_query(
+    self,
+    model_cls: type['model.Model'],
+    filters: list,
+    order_by: str = None,
+    limit: int = None,
+    cursor: str = None,
+    page_size: int = None,
+  ) -> 'AsyncIterator[tuple[model.Model, str]]':
+    """Yields the query results page by page, fetching the next page while the current is consumed.
+
+    At most two pages of DATASTORE_QUERY_PAGE_SIZE (or page_size) raw entities are held at once,
+    and models are only built as they are yielded.
+
+    Item cursors are "<datastore cursor>:<offset>:<remaining>", resuming passes the offset to
+    Datastore along with the cursor, so skipped entities are never sent back. Like the cursors of
+    RedisClient, they hold the number of entities left to return (empty without a limit), which
+    replaces the limit when resuming.
+    """
+    query = self._build_query(model_cls, filters, order_by)
+    page_size = page_size or config.DATASTORE_QUERY_PAGE_SIZE
+    remaining = limit
+    offset = 0
+    if cursor:
+      cursor, offset, remaining = self.decode_cursor(cursor)
+
+    def read_page(page_cursor, offset=0):
+      count = page_size if remaining is None else min(page_size, remaining)
+      return count, asyncio.ensure_future(
+        self.executor.run('run_query', self._fetch_page, query, count, page_cursor, offset)
+      )
+
+    if remaining is not None and remaining <= 0:
+      return
+
+    count, next_page = read_page(cursor, offset)
+    try:
+      while next_page:
+        entities, next_cursor = await next_page
+        next_page = None
+        page_remaining = remaining
+        if remaining is not None:
+          remaining -= len(entities)
+
+        # Read ahead: the next page is fetched while the consumer processes this one. Datastore may
+        # return a short batch while more results exist, so only the cursor tells whether to go on.
+        if next_cursor and remaining != 0:
+          count, next_page = read_page(next_cursor)
+
+        for index, entity in enumerate(entities, start=offset):
+          item_remaining = None if page_remaining is None else page_remaining - (index - offset)
+          item_cursor = self.encode_cursor(cursor, index, item_remaining)
+          yield self._from_entity(model_cls, entity), item_cursor
+
+        cursor, offset = next_cursor, 0
+    finally:
+      if next_page:
+        next_page.cancel()
+
+  @staticmethod
+  def encode_cursor(cursor, offset, remaining):
+    return f'{cursor or ""}:{offset}:{"" if remaining is None else remaining}'
+
+  @staticmethod
+  def decode_cursor(cursor):
+    """Returns the Datastore cursor, the offset and the remaining count of an item cursor."""
+    try:
+      page_cursor, offset, remaining = cursor.rsplit(':', 2)
+      return page_cursor or None, int(offset), int(remaining) if remaining else None
+    except ValueError:
+      raise orm_exceptions.ClientError(f'Invalid cursor "{cursor}"')
+
+  def _build_query(self, model_cls, filters, order_by):
     query = self.client.query(kind=model_cls.kind)
     for item in filters:
       query.add_filter(*item)
@@ -93,11 +230,30 @@ class DatastoreClient(Client):
     if order_by:
       query.order = order_by
 
+    return query
+
+  def _from_entity(self, model_cls, entity):
+    return model_cls.from_database(
+      **{k: self._deserialize_value(v) for k, v in dict(entity).items()}
+    )
+
+  def _fetch(self, query, limit=None, cursor=None):
+    """Runs the query, returns the list of entities and the next cursor."""
     query_iterator = query.fetch(limit=limit, start_cursor=cursor)
     next_cursor = ''
     if query_iterator.next_page_token:
       next_cursor = query_iterator.next_page_token.decode('utf-8')
-    return [
-      model_cls.from_database(**{k: self._deserialize_value(v) for k, v in dict(entity).items()})
-      for entity in query_iterator
-    ], next_cursor
+    return list(query_iterator), next_cursor
+
+  def _fetch_page(self, query, limit, cursor=None, offset=0):
+    """Reads a single page of the query, returns its entities and the cursor following them.
+
+    The cursor is None once Datastore reports NO_MORE_RESULTS, the library only leaves
+    next_page_token unset in that case.
+    """
+    query_iterator = query.fetch(limit=limit, offset=offset, start_cursor=cursor)
+    entities = list(next(query_iterator.pages, []))
+    next_cursor = None
+    if query_iterator.next_page_token:
+      next_cursor = query_iterator.next_page_token.decode('utf-8')
+    return entities, next_cursor
@@ -1,3 +1,6 @@
+import datetime
+
+from core.orm import exceptions
 from core.orm import model
 from core.orm.clients.base import Client
 from core.orm.redis_db import RedisDB
@@ -11,33 +14,94 @@ class RedisClient(Client):
     if isinstance(value, model.ModelKey):
       return value.entity_id
 
+    if isinstance(value, datetime.datetime):
+      return value.isoformat()
+
+    if isinstance(value, bool):
+      return int(value)
+
+    return value
+
+  def _serialize(self, data):
+    # Redis hashes cannot hold None, missing fields are loaded back as None.
+    return {k: self._serialize_value(v) for k, v in data.items() if v is not None}
+
+  def _deserialize_value(self, field, value):
+    field_type = getattr(field, 'type', None)
+    if field_type is bool:
+      return bool(int(value))
+
+    if field_type is int:
+      return int(value)
+
+    if field_type is datetime.datetime:
+      return datetime.datetime.fromisoformat(value)
+
     return value
 
+  def _deserialize(self, model_cls, entity):
+    fields = model_cls.class_fields
+    return {k: self._deserialize_value(fields.get(k), v) for k, v in entity.items()}
+
   async def get(self, key):
-    entity = self.client.get(key.kind, key.entity_id)
+    entity = await self.client.get(key.kind, key.entity_id)
     if not entity:
       return
 
-    return key.model_cls.from_database(**entity)
+    return key.model_cls.from_database(**self._deserialize(key.model_cls, entity))
 
   async def create(self, instance):
     data = instance.serialize()
-    self.client.create(
-      instance.kind, instance.id, {k: self._serialize_value(v) for k, v in data.items()}
+    await self.client.create(
+      instance.kind,
+      instance.id,
+      self._serialize(data),
+      exclude_from_indexes=instance.exclude_from_indexes,
     )
     return instance.set_persisted(**data)
 
   async def update(self, instance):
-    data = instance.serialize()
-    self.client.update(instance.kind, instance.id, data)
+    # Only the changed fields are written, fields set to None are removed from the hash.
+    data = instance.serialize(instance.dirty_fields)
+    if not data:
+      return instance
+
+    await self.client.update(
+      instance.kind,
+      instance.id,
+      self._serialize(data),
+      deleted=[name for name, value in data.items() if value is None],
+      exclude_from_indexes=instance.exclude_from_indexes,
+    )
     return instance.set_persisted(**data)
 
   async def delete(self, key):
-    self.client.delete(key.kind, key.entity_id)
+    await self.client.delete(key.kind, key.entity_id)
+
+  async def get_multi(self, keys):
+    entities = await self.client.get_multi([(key.kind, key.entity_id) for key in keys])
+    return [
+      key.model_cls.from_database(**self._deserialize(key.model_cls, entity)) if entity else None
+      for key, entity in zip(keys, entities)
+    ]
+
+  async def put_multi(self, instances):
+    data = [instance.serialize() for instance in instances]
+    await self.client.put_multi([
+      (instance.kind, instance.id, self._serialize(values), instance.exclude_from_indexes)
+      for instance, values in zip(instances, data)
+    ])
+    return [instance.set_persisted(**values) for instance, values in zip(instances, data)]
+
+  async def delete_multi(self, keys):
+    await self.client.delete_multi([(key.kind, key.entity_id) for key in keys])
 
   def flushall(self):
     self.client.flushall()
 
+  async def close(self):
+    await RedisDB.close_pool()
+
   async def run_query(
     self,
     model_cls,
@@ -46,8 +110,62 @@ class RedisClient(Client):
     limit=None,
     cursor=None,
   ):
-    result_list = self.client.query(model_cls.kind, filters)
+    result_list, _, next_cursor = await self.client.query(
+      model_cls.kind,
+      filters,
+      order=self._order(model_cls, order_by),
+      limit=limit,
+      cursor=cursor,
+    )
     return [
-      model_cls.from_database(**entity)
+      model_cls.from_database(**self._deserialize(model_cls, entity))
       for entity in result_list
-    ], None
+      if entity
+    ], next_cursor
+
+  async def stream_query(
+    self,
+    model_cls,
+    filters,
+    order_by=None,
+    limit=None,
+    cursor=None,
+    page_size=None,
+  ):
+    # Every entity comes with a cursor pointing right at it, so resuming never re-reads entities.
+    order = self._order(model_cls, order_by)
+    while True:
+      result_list, cursors, next_cursor = await self.client.query(
+        model_cls.kind, filters, order=order, limit=limit, cursor=cursor, page_size=page_size
+      )
+      for entity, item_cursor in zip(result_list, cursors):
+        if entity:
+          yield model_cls.from_database(**self._deserialize(model_cls, entity)), item_cursor
+
+      if not next_cursor:
+        break
+
+      cursor = next_cursor
+
+  def _order(self, model_cls, order_by):
+    """Returns the (field_name, descending, scored) order RedisDB expects for order_by.
+
+    A leading "-" orders by descending values, as with the Datastore client.
+    """
+    if not order_by:
+      return None
+
+    if isinstance(order_by, str):
+      order_by = [order_by]
+
+    if len(order_by) > 1:
+      raise exceptions.ClientError('RedisClient can only order by a single field')
+
+    field_name = order_by[0]
+    descending = field_name.startswith('-')
+    field_name = field_name.lstrip('-')
+    field = model_cls.class_fields.get(field_name)
+    if field is None:
+      raise exceptions.FieldDoesNotExist(f'{model_cls.kind} has no field "{field_name}"')
+
+    return field_name, descending, field.type in (int, float, bool)
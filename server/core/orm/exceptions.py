@@ -32,3 +32,7 @@ class EntityExists(Exception):
 
 class MaxRetryExceeded(Exception):
   pass
+
+
+class ClientTimeout(ClientError):
+  pass
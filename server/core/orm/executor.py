@@ -0,0 +1,131 @@
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import threading
+import time
+
+from core.orm import exceptions
+
+
+class ExecutorMetrics:
+  """Timing counters of the calls run by a BlockingExecutor, grouped by operation name.
+
+  Queue wait is the time between submitting a call and a worker thread starting it, call time is
+  the time spent in the blocking call itself. A growing queue wait with a steady call time means
+  the pool is too small for the load.
+
+  Counters are recorded from the worker threads and read from the event loop, so they are guarded
+  by a lock.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._operations = collections.defaultdict(
+      lambda: {
+        'calls': 0,
+        'errors': 0,
+        'timeouts': 0,
+        'queue_wait_total': 0.0,
+        'queue_wait_max': 0.0,
+        'call_time_total': 0.0,
+        'call_time_max': 0.0,
+      }
+    )
+
+  def record(self, operation, queue_wait, call_time, error=False):
+    with self._lock:
+      stats = self._operations[operation]
+      stats['calls'] += 1
+      stats['errors'] += int(error)
+      stats['queue_wait_total'] += queue_wait
+      stats['queue_wait_max'] = max(stats['queue_wait_max'], queue_wait)
+      stats['call_time_total'] += call_time
+      stats['call_time_max'] = max(stats['call_time_max'], call_time)
+
+  def record_timeout(self, operation):
+    with self._lock:
+      self._operations[operation]['timeouts'] += 1
+
+  def snapshot(self):
+    """Returns a copy of the counters, with average queue wait and call times in seconds."""
+    with self._lock:
+      operations = {operation: dict(stats) for operation, stats in self._operations.items()}
+
+    snapshot = {}
+    for operation, stats in operations.items():
+      calls = stats['calls'] or 1
+      stats['queue_wait_avg'] = stats['queue_wait_total'] / calls
+      stats['call_time_avg'] = stats['call_time_total'] / calls
+      snapshot[operation] = stats
+
+    return snapshot
+
+  def reset(self):
+    with self._lock:
+      self._operations.clear()
+
+
+class BlockingExecutor:
+  """Runs blocking client calls on a bounded thread pool, off the event loop.
+
+  At most `max_workers` calls run at once, further calls wait in the pool queue. Awaiting a call
+  raises exceptions.ClientTimeout after `timeout` seconds (including the queue wait). The worker
+  thread cannot be interrupted, so a timed out call still completes in the background, but its
+  result is discarded.
+  """
+
+  def __init__(self, max_workers, timeout=None, thread_name_prefix='orm'):
+    self.max_workers = max_workers
+    self.timeout = timeout
+    self.metrics = ExecutorMetrics()
+    self._thread_name_prefix = thread_name_prefix
+    self._pool = None
+
+  @property
+  def pool(self):
+    # Created on first use, so that importing a client does not start threads.
+    if self._pool is None:
+      self._pool = concurrent.futures.ThreadPoolExecutor(
+        max_workers=self.max_workers, thread_name_prefix=self._thread_name_prefix
+      )
+
+    return self._pool
+
+  def _timed(self, operation, submitted_at, func, args, kwargs):
+    started_at = time.perf_counter()
+    error = False
+    try:
+      return func(*args, **kwargs)
+    except Exception:
+      error = True
+      raise
+    finally:
+      self.metrics.record(
+        operation, started_at - submitted_at, time.perf_counter() - started_at, error=error
+      )
+
+  async def run(self, operation, func, *args, timeout=None, **kwargs):
+    """Runs func(*args, **kwargs) on the pool and returns its result.
+
+    Args:
+      operation (str): The name the call is recorded under in the metrics.
+      func (callable): The blocking callable.
+      timeout (float): Overrides the executor timeout for this call.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(
+      self.pool,
+      functools.partial(self._timed, operation, time.perf_counter(), func, args, kwargs),
+    )
+    timeout = self.timeout if timeout is None else timeout
+    try:
+      return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+      self.metrics.record_timeout(operation)
+      raise exceptions.ClientTimeout(f'{operation} did not complete within {timeout}s')
+
+  def shutdown(self, wait=True):
+    if self._pool is not None:
+      self._pool.shutdown(wait=wait)
+      self._pool = None
@@ -7,6 +7,10 @@ from core.orm.model_key import ModelKey
 from core.orm.model_registry import ModelRegistry
 
 
+# Marks a field that has no staged value, since None is a valid staged value.
+UNSET = object()
+
+
 def _default_unique_key():
   return str(uuid.uuid4())
 
@@ -26,8 +30,10 @@ class Field(abc.ABC):
   behaviour of the value interface methods.
 
   Fields are responsible for validating and storing data on behalf of the ORM Models that use them.
-  To facilitate this, every instance of a Model creates new instances of its Fields to allow each
-  Field to store data for that particular data entity.
+  Field instances are declared once on the Model class and shared by every entity of that Model,
+  so they must not hold entity data themselves. Instead, each field is given a position when it is
+  registered, and every entity keeps its field data in compact per-instance lists indexed by that
+  position. The field methods receive the entity they operate on.
 
   Internally, a Field can store its value however it likes, but there are two distinc ways that the
   field value can be accessed and mutated:
@@ -42,12 +48,13 @@ class Field(abc.ABC):
   whereas when model fields are being referenced or set, a different representation might be more
   convenient for the consumer. (Reference fields are a good example of this distinction)
 
-  Subclasses can override the value getter and setter to customize the consumer interface, and they
+  Subclasses can override get_value and set_value to customize the consumer interface, and they
   can override the serialize and deserialize methods to customize the persitence interface.
 
-  To track pending changes to this field that have not yet been persisted, Field maintains a
-  "committed" value, and a list of "staged" values. The "_value" getter and setter should be used
-  by subclasses rather than directly mutating _committed_values and _staged_values.
+  To track pending changes to this field that have not yet been persisted, every entity holds a
+  "committed" value and a "staged" value for the field. Only the latest assignment is staged, and
+  the field is dirty until the staged value is persisted. The _get_value and _set_value methods
+  should be used by subclasses rather than directly mutating the entity's value lists.
   """
   def __init__(
     self,
@@ -67,8 +74,7 @@ class Field(abc.ABC):
     self.choices = choices
     self.unique_key = unique_key
     self.nullable = nullable
-    self._committed_value = None
-    self._staged_values = []
+    self.position = None
 
   def __set_name__(self, model_class, name) -> None:
     self.model_class = model_class
@@ -85,53 +91,70 @@ class Field(abc.ABC):
 
     return self._default
 
-  @property
-  def _value(self):
-    """Returns the internally-stored value for this field."""
-    return self._staged_values[-1] if len(self._staged_values) > 0 else self._committed_value
+  def _get_value(self, entity):
+    """Returns the internally-stored value of this field for the given entity."""
+    value = entity._staged_values[self.position]
+    if value is UNSET:
+      return entity._committed_values[self.position]
 
-  @_value.setter
-  def _value(self, val):
-    """Set the internally-stored value for this field."""
-    self._staged_values.append(val)
+    return value
 
-  @property
-  def value(self):
+  def _set_value(self, entity, val):
+    """Set the internally-stored value of this field for the given entity."""
+    entity._staged_values[self.position] = val
+
+  def __get__(self, entity, model_class=None):
+    if entity is None:
+      return self
+
+    return self.get_value(entity)
+
+  def __set__(self, entity, val):
+    self.set_value(entity, val)
+
+  def get_value(self, entity):
     """Returns a model-facing representation of the field's value.
 
     i.e. `user.some_field` will return this value representation.
     """
-    return self._value
+    return self._get_value(entity)
 
-  @value.setter
-  def value(self, val):
+  def set_value(self, entity, val):
     """model-facing setter for the field's value.
 
     i.e. `user.some_field = 5` will use this setter.
     """
-    self._value = self.validate(val)
+    self._set_value(entity, self.validate(val))
 
-  def serialize(self):
+  def serialize(self, entity):
     """Returns a perstintence-facing representation of the field's value.
 
     i.e. User(some_field=5).put() will persist this value to the database.
     """
-    return self.value
+    return self.get_value(entity)
 
-  def deserialize(self, val):
+  def deserialize(self, entity, val):
     """db-facing setter for the field's value.
 
     i.e. User.get('abc123') will load this value from the database using this method.
     """
-    self.value = val
+    self.set_value(entity, val)
+
+  def get_persisted_value(self, entity):
+    """Returns the value last loaded from or saved to the database."""
+    return entity._committed_values[self.position]
+
+  def is_dirty(self, entity):
+    """Returns whether the field has a value that has not been persisted yet."""
+    return entity._staged_values[self.position] is not UNSET
 
-  def set_persisted(self, persisted_value):
+  def set_persisted(self, entity, persisted_value):
     """Remembers the currently-persisted value.
 
     This method should be called by the model after loading or saving an entity.
     """
-    self._committed_value = persisted_value
-    self._staged_values = []
+    entity._committed_values[self.position] = persisted_value
+    entity._staged_values[self.position] = UNSET
 
   def validate(self, value):
     """Validates the given value, and either returns a validated value, or raises BadValueError.
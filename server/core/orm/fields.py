@@ -6,6 +6,7 @@ from core.orm import exceptions
 from core.orm.field import Field
 from core.orm.model import Model
 from core.orm.model_key import ModelKey
+from core.orm.model_registry import ModelRegistry
 
 
 class IntegerField(Field):
@@ -66,13 +67,17 @@ class DateTimeField(Field):
 
     return super().default
 
-  def serialize(self):
+  def is_dirty(self, entity):
+    # auto_now fields are refreshed on every write.
+    return self.auto_now or super().is_dirty(entity)
+
+  def serialize(self, entity):
     # If the auto-now flag is set, then this property should be the current time whenever it gets
     # persisted.
     if self.auto_now:
       return datetime.datetime.now()
 
-    return super().serialize()
+    return super().serialize(entity)
 
 
 class BooleanField(Field):
@@ -89,54 +94,106 @@ class ReferenceField(Field):
         f'reference_model ({type(reference_model)}) must inherit from Model')
 
     self._reference_model = reference_model
-    self._resolved_entity = None
 
-  async def _fetch_from_key(self):
-    self._resolved_entity = await self._value.fetch()
+  async def _fetch_from_key(self, entity):
+    entity._resolved_values[self.position] = await self._get_value(entity).fetch()
 
-  def _fetch(self):
+  def _fetch(self, entity):
     loop = asyncio.new_event_loop()
     try:
-      loop.run_until_complete(self._fetch_from_key())
+      loop.run_until_complete(self._fetch_from_key(entity))
     except Exception as e:
       raise e
     finally:
+      # The connections opened for this loop would otherwise stay open.
+      loop.run_until_complete(entity.client.close())
       loop.close()
 
-  def fetch(self):
-    thread = threading.Thread(target=self._fetch)
+  def fetch(self, entity):
+    thread = threading.Thread(target=self._fetch, args=(entity,))
     thread.start()
     thread.join()
 
-  @property
-  def value(self):
-    """A resolved instance of the referenced entity."""
-    if self._value is None:
+  def get_value(self, entity):
+    """A resolved instance of the referenced entity.
+
+    Unresolved references are fetched synchronously on a separate thread, prefer awaiting
+    Model.resolve or Model.prefetch before reading the field from async code.
+    """
+    value = self._get_value(entity)
+    if value is None:
       return None
 
-    if not isinstance(self._value, ModelKey) and self.kind is not None:
-      self._value = ModelKey(self.kind, self._value)
+    if not isinstance(value, ModelKey) and self.kind is not None:
+      self._set_value(entity, ModelKey(self.kind, value))
+
+    if entity._resolved_values.get(self.position) is None:
+      self.fetch(entity)
 
-    if self._resolved_entity is None:
-      self.fetch()
+    return entity._resolved_values.get(self.position)
 
-    return self._resolved_entity
+  def get_key(self, entity):
+    """Returns the ModelKey of the referenced entity without resolving it."""
+    value = self._get_value(entity)
+    if value is not None and not isinstance(value, ModelKey) and self.kind is not None:
+      return ModelKey(self.kind, value)
+
+    return value
 
-  @value.setter
-  def value(self, val):
+  async def resolve(self, entity):
+    """Returns the referenced entity, fetching it if it is not resolved yet."""
+    resolved = entity._resolved_values.get(self.position)
+    if resolved is None:
+      key = self.get_key(entity)
+      if key is None:
+        return None
+
+      resolved = await key.fetch()
+      entity._resolved_values[self.position] = resolved
+
+    return resolved
+
+  async def prefetch(self, entities):
+    """Resolves this field for all given entities, fetching every distinct referenced key once."""
+    pending = [
+      (entity, self.get_key(entity))
+      for entity in entities
+      if entity._resolved_values.get(self.position) is None
+    ]
+    keys_by_kind = {}
+    for _, key in pending:
+      if key is not None:
+        keys_by_kind.setdefault(key.kind, {})[key] = None
+
+    resolved = {}
+    for kind, keys in keys_by_kind.items():
+      model_cls = ModelRegistry.get_class(kind)
+      entities = await model_cls.get_multi([key.entity_id for key in keys])
+      resolved.update(zip(keys, entities))
+    for entity, key in pending:
+      if key is not None:
+        entity._resolved_values[self.position] = resolved[key]
+
+  def set_value(self, entity, val):
     """Takes a ModelKey or Model."""
-    self._value = self.validate(val)
+    self._set_value(entity, self.validate(val))
 
     # We can pre-cache the entity if we were given a full Model, but otherwise we need to
     # invalidate.
-    self._resolved_entity = val if isinstance(val, Model) else None
+    entity._resolved_values[self.position] = val if isinstance(val, Model) else None
 
-  def set_persisted(self, persisted_value):
+  def set_persisted(self, entity, persisted_value):
     """Remembers the currently-persisted value.
 
-    This method should be called by the model after loading or saving an entity.
+    This method should be called by the model after loading or saving an entity. The resolved
+    entity is kept, since persisting does not change which entity is referenced.
     """
-    self._persisted_value = persisted_value
+    if isinstance(persisted_value, Model):
+      persisted_value = persisted_value.key
+    elif persisted_value is not None and not isinstance(persisted_value, ModelKey) and self.kind:
+      persisted_value = ModelKey(self.kind, persisted_value)
+
+    super().set_persisted(entity, persisted_value)
 
   @property
   def kind(self):
@@ -166,12 +223,6 @@ class ReferenceField(Field):
 
     return value
 
-  def serialize(self):
-    value = self.value
-    if isinstance(value, Model):
-      return value.key
-
-    if isinstance(value, ModelKey):
-      return value
-
-    return value
+  def serialize(self, entity):
+    # Only the key is persisted, so there is no need to resolve the referenced entity.
+    return self.get_key(entity)
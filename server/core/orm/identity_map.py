@@ -0,0 +1,45 @@
+"""Per-context identity map of loaded entities.
+
+While an identity map is active in the current context (e.g. the current request), entities loaded
+with Model.get_by_id are remembered by key, so that the same entity is only fetched once and every
+lookup returns the same instance.
+"""
+import contextvars
+
+
+_entities = contextvars.ContextVar('orm_identity_map', default=None)
+
+
+def begin():
+  """Starts a new, empty identity map for the current context."""
+  _entities.set({})
+
+
+def end():
+  """Stops tracking entities in the current context."""
+  _entities.set(None)
+
+
+def is_active():
+  return _entities.get() is not None
+
+
+def get(key):
+  """Returns the tracked entity with the given ModelKey, None if it is not tracked."""
+  entities = _entities.get()
+  if entities is None:
+    return None
+
+  return entities.get(key)
+
+
+def add(entity):
+  entities = _entities.get()
+  if entities is not None and entity is not None:
+    entities[entity.key] = entity
+
+
+def discard(key):
+  entities = _entities.get()
+  if entities is not None:
+    entities.pop(key, None)
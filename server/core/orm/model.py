@@ -1,25 +1,37 @@
 import abc
-import copy
-
-from functools import cached_property
 
 from core.orm import exceptions
+from core.orm import identity_map
 from core.orm.config import client
+from core.orm.field import UNSET
 from core.orm.model_registry import ModelRegistry
 from core.orm.model_key import ModelKey
 from core.orm.query import Query
 
 
-class Model(abc.ABC):
-  _special_attrs = {
-    '_instance_fields'
-  }
+class ModelMeta(abc.ABCMeta):
+  """Gives every model class empty __slots__ unless it declares its own.
+
+  A subclass without __slots__ would give its entities a __dict__ again.
+  """
+
+  def __new__(mcs, name, bases, namespace, **kwargs):
+    namespace.setdefault('__slots__', ())
+    return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+
+class Model(abc.ABC, metaclass=ModelMeta):
+  # Field definitions are shared by the class, each entity only stores its field values in lists
+  # indexed by field position (see Field).
+  __slots__ = ('_staged_values', '_committed_values', '_resolved_values')
+  _special_attrs = frozenset(__slots__)
 
   def __new__(cls, _from_database=False, **values):
-    # Whenever we construct a new instance, we need to make a deep copy of the class fields to
-    # allow each entity to store values within thier own field instances.
     self = super().__new__(cls)
-    self._instance_fields = copy.deepcopy(ModelRegistry.get_fields(cls.kind))
+    field_count = len(cls.class_fields or ())
+    object.__setattr__(self, '_staged_values', [UNSET] * field_count)
+    object.__setattr__(self, '_committed_values', [None] * field_count)
+    object.__setattr__(self, '_resolved_values', {})
 
     # Either initialize or deserialize the field values depending on whether we're being populated
     # from the database or from a developer hitting the constructor.
@@ -42,13 +54,14 @@ class Model(abc.ABC):
     """Convenience method for loading an entity from raw database values."""
     return cls(_from_database=True, **values)
 
-  @cached_property
+  @property
   def _unique_key_fields(self):
+    # Not cached on the instance, so that entities only hold their field values.
     return [f for f in self.fields.values() if f.unique_key]
 
   @property
   def id(self):
-    return ':'.join(str(f.serialize()) for f in self._unique_key_fields)
+    return ':'.join(str(f.serialize(self)) for f in self._unique_key_fields)
 
   def _initialize_values(self, **values):
     """Initializes field values for newly-created entities."""
@@ -81,19 +94,26 @@ class Model(abc.ABC):
     for name, field in self.fields.items():
       # Any fields that have explicitly-prescribed values should be deserialized.
       if name in values:
-        field.deserialize(values[name])
+        field.deserialize(self, values[name])
 
       # Regardless of which fields were present in the database, this state is currently persisted.
-      field.set_persisted(values.get(name))
+      field.set_persisted(self, values.get(name))
 
     return self
 
   def set_persisted(self, **persisted_values):
+    """Marks the given field values as persisted, other fields are left untouched."""
     for name, field in self.fields.items():
-      field.set_persisted(persisted_values.get(name))
+      if name in persisted_values:
+        field.set_persisted(self, persisted_values[name])
 
     return self
 
+  @property
+  def dirty_fields(self):
+    """The names of the fields changed since the entity was loaded or saved."""
+    return {name for name, field in self.fields.items() if field.is_dirty(self)}
+
   @classmethod
   @property
   def class_fields(cls):
@@ -101,39 +121,44 @@ class Model(abc.ABC):
 
   @property
   def fields(self):
-    return self._instance_fields
+    return self.class_fields or {}
 
   @property
   def values(self):
-    return {f.name: f.value for f in self.fields.values()}
+    return {name: field.get_value(self) for name, field in self.fields.items()}
 
   def __iter__(self):
     return self.values.items()
 
   def __setattr__(self, name, value):
-    if name in super().__getattribute__('_special_attrs'):
-      return super().__setattr__(name, value)
-    if name not in super().__getattribute__('class_fields'):
+    # Field values are read and written by the Field descriptors, any other attribute is rejected.
+    if name not in self._special_attrs and name not in self.fields:
       raise exceptions.FieldDoesNotExist(f'Field {name} does not exists!')
 
-    self.fields[name].value = value
-
-  def __getattribute__(self, name):
-    if name in super().__getattribute__('_special_attrs'):
-      return super().__getattribute__(name)
+    super().__setattr__(name, value)
 
-    fields = super().__getattribute__('fields')
-    if name in fields:
-      return fields[name].value
+  def __getstate__(self):
+    # Slotted entities are pickled (e.g. by jsonpickle) as their serialized field values.
+    return self.serialize()
 
-    return super().__getattribute__(name)
+  def __setstate__(self, state):
+    # Restored like an entity loaded from the database, the restored values are not dirty.
+    object.__setattr__(self, '_staged_values', [UNSET] * len(self.fields))
+    object.__setattr__(self, '_committed_values', [None] * len(self.fields))
+    object.__setattr__(self, '_resolved_values', {})
+    self._deserialize_values(**state)
 
-  @cached_property
+  @property
   def exclude_from_indexes(self):
     return [name for name, field in self.fields.items() if not field.indexed]
 
-  def serialize(self):
-    return {name: field.serialize() for name, field in self.fields.items()}
+  def serialize(self, field_names=None):
+    """Returns the persistence-facing values of the given fields, all fields by default."""
+    return {
+      name: field.serialize(self)
+      for name, field in self.fields.items()
+      if field_names is None or name in field_names
+    }
 
   @classmethod
   @property
@@ -158,21 +183,77 @@ class Model(abc.ABC):
     if not enitity_id:
       return
 
-    return await cls.client.get(ModelKey(cls.kind, enitity_id))
+    key = ModelKey(cls.kind, enitity_id)
+    entity = identity_map.get(key)
+    if entity is None:
+      entity = await cls.client.get(key)
+      identity_map.add(entity)
+
+    return entity
 
   @classmethod
   async def create(cls, **kwargs):
-    return await cls.client.create(cls(**kwargs))
+    entity = await cls.client.create(cls(**kwargs))
+    identity_map.add(entity)
+    return entity
 
   async def update(self):
     return await self.client.update(self)
 
   async def delete(self):
+    identity_map.discard(self.key)
     await self.client.delete(self.key)
 
   @classmethod
   async def delete_by_id(cls, entity_id):
-    await cls.client.delete(ModelKey(cls.kind, entity_id))
+    key = ModelKey(cls.kind, entity_id)
+    identity_map.discard(key)
+    await cls.client.delete(key)
+
+  @classmethod
+  async def get_multi(cls, entity_ids):
+    """Returns the entities with the given ids in the same order, None for missing entities."""
+    keys = [ModelKey(cls.kind, entity_id) for entity_id in entity_ids]
+    entities = {key: identity_map.get(key) for key in keys}
+    missing = [key for key, entity in entities.items() if entity is None]
+    if missing:
+      for key, entity in zip(missing, await cls.client.get_multi(missing)):
+        entities[key] = entity
+        identity_map.add(entity)
+
+    return [entities[key] for key in keys]
+
+  @classmethod
+  async def put_multi(cls, entities):
+    """Creates or replaces the given entities in one batch."""
+    entities = await cls.client.put_multi(entities)
+    for entity in entities:
+      identity_map.add(entity)
+
+    return entities
+
+  @classmethod
+  async def delete_multi(cls, entity_ids):
+    keys = [ModelKey(cls.kind, entity_id) for entity_id in entity_ids]
+    for key in keys:
+      identity_map.discard(key)
+
+    await cls.client.delete_multi(keys)
+
+  async def resolve(self, field_name):
+    """Returns the entity referenced by the given ReferenceField, loading it if needed.
+
+    Once resolved, reading the field (e.g. `entity.user`) returns the entity without blocking.
+    """
+    return await self.fields[field_name].resolve(self)
+
+  @classmethod
+  async def prefetch(cls, entities, *field_names):
+    """Resolves the given ReferenceFields of all entities with one get_multi per referenced kind."""
+    for field_name in field_names:
+      await cls.class_fields[field_name].prefetch(entities)
+
+    return entities
 
   @classmethod
   def all(cls):
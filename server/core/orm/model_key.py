@@ -13,6 +13,12 @@ class ModelKey:
   def __hash__(self):
     return hash((self.kind, self.entity_id))
 
+  def __eq__(self, other):
+    if not isinstance(other, ModelKey):
+      return NotImplemented
+
+    return (self.kind, self.entity_id) == (other.kind, other.entity_id)
+
   def __str__(self):
     return self.entity_id
 
@@ -1,6 +1,3 @@
-import copy
-
-
 class ModelRegistry:
   _class_registry = {}
   _fields_registry = {}
@@ -14,7 +11,10 @@ class ModelRegistry:
     if model_kind not in cls._fields_registry:
       cls._fields_registry[model_kind] = {}
 
-    cls._fields_registry[model_kind][name] = copy.deepcopy(field)
+    # Fields are shared by every entity of the kind, entities store their values at the field's
+    # position.
+    field.position = len(cls._fields_registry[model_kind])
+    cls._fields_registry[model_kind][name] = field
 
   @classmethod
   def get_class(cls, kind):
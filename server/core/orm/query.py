@@ -9,12 +9,18 @@ class Query:
     self._filters = []
     self._order_by = []
     self._limit = None
+    self._page_size = None
     self._query_iterator = None
 
   def limit(self, limit):
     self._limit = limit
     return self
 
+  def page_size(self, page_size):
+    """Sets how many entities the client reads per round trip, when the client supports it."""
+    self._page_size = page_size
+    return self
+
   def filter(self, field_name, cmp, value):
     self._filters.append((field_name, cmp, value))
     return self
@@ -62,8 +68,8 @@ class Query:
 class QueryIterator:
   """QueryIterator exposes an entire set of query results as an async iterator.
 
-  It also exposes an augmented cursor that allows each item to have a unique cursor value by
-  appending an item index to the raw client cursor. This is useful for consumers that want to
+  It also exposes an item-level cursor that allows each item to have a unique cursor value, from
+  which the query resumes at that item. This is useful for consumers that want to
   expose paginated queries with some filtering applied after the query runs, but still provide a
   consistent page size. e.g.:
 
@@ -97,31 +103,12 @@ class QueryIterator:
     """Async iterator that yields results for this query iterator.
 
     As results are yielded, self._cursor is updated to expose an item-level cursor to the consumer.
+    Item-level cursors are produced by the client and resume the query exactly at that item, so
+    the client never has to re-read the results that were already served.
     """
-
-    _raw_cursor, _skip = None, 0
-    if self._cursor:
-      split_cursor = self._cursor.split(':')
-      _raw_cursor = ':'.join(split_cursor[:-1])
-      _skip = int(split_cursor[-1])
-
-    async for item, cursor in self._itemized_iter(raw_cursor=_raw_cursor):
-      if _skip > 0:
-        _skip -= 1
-        continue
-
+    results = self._client.stream_query(
+      cursor=self._cursor, page_size=self._query._page_size, **self._query.params
+    )
+    async for item, cursor in results:
       self._cursor = cursor
       yield item
-
-  async def _itemized_iter(self, raw_cursor=None):
-    """Async iterator that yields pairs of results with item-level cursor strings."""
-    _page, _next_cursor = await self._client.run_query(cursor=raw_cursor, **self._query.params)
-    while _page:
-      for index, item in enumerate(_page):
-        yield item, ':'.join([raw_cursor or '', str(index)])
-
-      if not _next_cursor:
-        break
-
-      raw_cursor = _next_cursor
-      _page, _next_cursor = await self._client.run_query(cursor=raw_cursor, **self._query.params)
@@ -1,93 +1,291 @@
-import operator
+import asyncio
+import base64
+import json
+import weakref
+
 import redis
+from redis import asyncio as aioredis
 
 from core import config
 from core.orm import exceptions
+from core.orm.redis_index import RedisIndex
 
 
 class RedisDB:
+  """Asyncio Redis storage used by RedisClient.
+
+  Connections are drawn from a shared, bounded pool so that concurrent requests never block the
+  event loop on a Redis round trip. asyncio connections are bound to the loop that opened them, so
+  one pool is kept per running event loop.
+  """
   MAX_RETRY = 10
+  _pools = weakref.WeakKeyDictionary()
+
+  @classmethod
+  def get_pool(cls):
+    """Returns the connection pool of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    pool = cls._pools.get(loop)
+    if pool is None:
+      pool = aioredis.BlockingConnectionPool(
+        host=config.REDIS_HOST,
+        port=config.REDIS_PORT,
+        decode_responses=True,
+        max_connections=config.REDIS_MAX_CONNECTIONS,
+        timeout=config.REDIS_POOL_TIMEOUT,
+        socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=config.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=config.REDIS_HEALTH_CHECK_INTERVAL,
+      )
+      cls._pools[loop] = pool
+
+    return pool
+
+  @classmethod
+  async def close_pool(cls):
+    """Disconnects and forgets the connection pool of the running event loop, if it has one."""
+    pool = cls._pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+      await pool.disconnect()
+
+  @property
+  def client(self):
+    return aioredis.Redis(connection_pool=self.get_pool())
+
+  async def _watch(self, entity_key, operation):
+    """Runs operation(pipeline, entity) while watching the entity key.
+
+    The operation is retried if a concurrent writer changes the entity between WATCH and EXEC.
+    """
+    async with self.client.pipeline() as pipeline:
+      for _ in range(self.MAX_RETRY):
+        try:
+          await pipeline.watch(entity_key)
+          entity = await pipeline.hgetall(entity_key)
+          return await operation(pipeline, entity)
+        except redis.exceptions.WatchError:
+          continue
 
-  def __init__(self):
-    self.client = redis.Redis(decode_responses=True, port=config.REDIS_PORT, host=config.REDIS_HOST)
+    raise exceptions.MaxRetryExceeded(f'Could not write {entity_key}')
 
-  def create(self, kind, id, data):
+  async def _watch_many(self, entity_keys, operation):
+    """Runs operation(pipeline, entities) while watching all entity keys.
+
+    The current entities are read in a single round trip on a separate connection, the WATCH still
+    guarantees that none of them changed before the operation is executed.
+    """
+    client = self.client
+    async with client.pipeline() as pipeline:
+      for _ in range(self.MAX_RETRY):
+        try:
+          await pipeline.watch(*entity_keys)
+          async with client.pipeline(transaction=False) as reader:
+            [reader.hgetall(entity_key) for entity_key in entity_keys]
+            entities = await reader.execute()
+
+          return await operation(pipeline, entities)
+        except redis.exceptions.WatchError:
+          continue
+
+    raise exceptions.MaxRetryExceeded(f'Could not write {len(entity_keys)} entities')
+
+  async def create(self, kind, id, data, exclude_from_indexes=()):
     entity_key = f'{kind}:{id}'
     try:
-      pipeline = self.client.pipeline()
-      pipeline.watch(entity_key)
-      entity = pipeline.hgetall(entity_key)
-      if entity:
-        raise exceptions.EntityExists()
+      async with self.client.pipeline() as pipeline:
+        await pipeline.watch(entity_key)
+        if await pipeline.exists(entity_key):
+          raise exceptions.EntityExists()
 
-      pipeline.multi()
-      pipeline.hset(entity_key, mapping=data)
-      pipeline.sadd(kind, entity_key)
-
-      for key, value in data.items():
-        field_key = f'{kind}:{id}:{key}:{value}'
-        pipeline.set(field_key, 1)
+        pipeline.multi()
+        pipeline.hset(entity_key, mapping=data)
+        RedisIndex(kind).add(pipeline, id, data, exclude_from_indexes)
 
-      count_meta_key = f'{kind}:meta:count'
-      pipeline.incrby(count_meta_key)
-      pipeline.execute()
+        count_meta_key = f'{kind}:meta:count'
+        pipeline.incrby(count_meta_key)
+        await pipeline.execute()
     except redis.exceptions.WatchError:
       raise exceptions.EntityExists('Entity is already created')
 
   def flushall(self):
-    self.client.flushall()
+    # Flushing is only used by the test suite outside of a running loop, so a short lived
+    # synchronous connection is enough here.
+    client = redis.Redis(port=config.REDIS_PORT, host=config.REDIS_HOST)
+    try:
+      client.flushall()
+    finally:
+      client.close()
 
-  def get(self, kind, id):
-    return self.client.hgetall(f'{kind}:{id}')
+  async def get(self, kind, id):
+    return await self.client.hgetall(f'{kind}:{id}')
 
-  def delete(self, kind, id):
-    deleted = self.client.delete(f'{kind}:{id}')
-    if not deleted:
+  async def get_multi(self, keys):
+    """Returns the entities of the given (kind, id) keys in order, {} for missing entities."""
+    async with self.client.pipeline(transaction=False) as pipeline:
+      [pipeline.hgetall(f'{kind}:{id}') for kind, id in keys]
+      return await pipeline.execute()
+
+  async def put_multi(self, entities):
+    """Creates or replaces entities in a single transaction.
+
+    Args:
+      entities (list): (kind, id, data, exclude_from_indexes) tuples.
+    """
+    # The last write of a repeated key wins.
+    entities = list({(entity[0], entity[1]): entity for entity in entities}.values())
+    entity_keys = [f'{kind}:{id}' for kind, id, _, _ in entities]
+
+    async def _put_multi(pipeline, stored_entities):
+      pipeline.multi()
+      for (kind, id, data, exclude_from_indexes), entity_key, stored in zip(
+        entities, entity_keys, stored_entities
+      ):
+        index = RedisIndex(kind)
+        if stored:
+          index.remove(pipeline, id, stored)
+          pipeline.delete(entity_key)
+        else:
+          pipeline.incrby(f'{kind}:meta:count')
+
+        pipeline.hset(entity_key, mapping=data)
+        index.add(pipeline, id, data, exclude_from_indexes)
+
+      await pipeline.execute()
+
+    if entities:
+      await self._watch_many(entity_keys, _put_multi)
+
+  async def delete_multi(self, keys):
+    """Deletes the entities of the given (kind, id) keys, returns the number of deleted entities."""
+    keys = list(dict.fromkeys(keys))
+    entity_keys = [f'{kind}:{id}' for kind, id in keys]
+
+    async def _delete_multi(pipeline, stored_entities):
+      pipeline.multi()
+      deleted = 0
+      for (kind, id), entity_key, stored in zip(keys, entity_keys, stored_entities):
+        if not stored:
+          continue
+
+        pipeline.delete(entity_key)
+        RedisIndex(kind).remove(pipeline, id, stored)
+        pipeline.decrby(f'{kind}:meta:count')
+        deleted += 1
+
+      await pipeline.execute()
+      return deleted
+
+    if not keys:
       return 0
 
-    pipeline = self.client.pipeline()
-    pipeline.srem(kind, id)
-    [
-      pipeline.delete(field_key)
-      for field_key in self.client.scan_iter(match=f'{kind}:{id}:*:*')
-    ]
-    pipeline.decrby(f'{kind}:meta:count')
-    pipeline.execute()
-    return 1
+    return await self._watch_many(entity_keys, _delete_multi)
 
-  def update(self, kind, id, data):
-    pipeline = self.client.pipeline()
+  async def delete(self, kind, id):
     entity_key = f'{kind}:{id}'
-    deleted = pipeline.delete(f'{kind}:{id}')
-    if not deleted:
-      return
-
-    pipeline.multi()
-    pipeline.hset(entity_key, mapping=data)
-    pipeline.execute()
-
-  def query(self, kind, filters):
-
-    def _compare(inp, relate, cut):
-      ops = {'>': operator.gt,
-             '<': operator.lt,
-             '>=': operator.ge,
-             '<=': operator.le,
-             '=': operator.eq}
-      return ops[relate](inp, cut)
-
-    pipeline = self.client.pipeline()
-    filtered = []
-    if not filters:
-      entity_keys = self.client.smembers(kind)
-      [pipeline.hgetall(entity_key) for entity_key in entity_keys]
-
-    else:
-      for field_name, cmp, value in filters:
-        _, matches = self.client.scan(match=f'{kind}:*:{field_name}:*')
-        filtered += filter(lambda x: _compare(x.split(':')[-1], cmp, value), matches)
-
-      entity_ids = set([key.split(':')[1] for key in filtered])
-      [pipeline.hgetall(f'{kind}:{entity_id}') for entity_id in entity_ids]
-
-    return pipeline.execute()
+
+    async def _delete(pipeline, entity):
+      if not entity:
+        return 0
+
+      pipeline.multi()
+      pipeline.delete(entity_key)
+      RedisIndex(kind).remove(pipeline, id, entity)
+      pipeline.decrby(f'{kind}:meta:count')
+      await pipeline.execute()
+      return 1
+
+    return await self._watch(entity_key, _delete)
+
+  async def update(self, kind, id, data, deleted=(), exclude_from_indexes=()):
+    """Writes the given fields of an existing entity, and removes the `deleted` fields.
+
+    Fields missing from both are left untouched.
+    """
+    entity_key = f'{kind}:{id}'
+
+    async def _update(pipeline, entity):
+      if not entity:
+        return
+
+      changed = set(data) | set(deleted)
+      index = RedisIndex(kind)
+      pipeline.multi()
+      index.remove(pipeline, id, {k: v for k, v in entity.items() if k in changed})
+      if deleted:
+        pipeline.hdel(entity_key, *deleted)
+      if data:
+        pipeline.hset(entity_key, mapping=data)
+      index.add(pipeline, id, data, exclude_from_indexes)
+      await pipeline.execute()
+
+    await self._watch(entity_key, _update)
+
+  async def query(self, kind, filters, order=None, limit=None, cursor=None, page_size=None):
+    """Returns a page of the entities of the given kind matching all filters.
+
+    Matching ids are resolved and ordered on the server from the secondary indexes, only one page
+    of ids is read, then the entity hashes are fetched in a single pipeline.
+
+    Cursors hold the sort value and id of the entry preceding the position they point at (and the
+    number of entities left to return), so that reading can resume right there.
+
+    Args:
+      kind (str): The kind of the entities.
+      filters (list): (field_name, operator, value) tuples.
+      order (tuple): (field_name, descending, scored) to order by a field, None to order by id.
+      limit (int): The total number of entities to return across pages, None for no limit.
+      cursor (str): A cursor returned by a previous query.
+      page_size (int): The maximum number of entities to read, REDIS_QUERY_PAGE_SIZE by default.
+
+    Returns:
+      tuple: The list of entities, the list of cursors resuming at each of these entities and the
+        cursor of the next page, None if there is none.
+    """
+    after, remaining = None, limit
+    if cursor:
+      sort_value, entity_id, remaining = self.decode_cursor(cursor)
+      after = (sort_value, entity_id)
+
+    count = page_size or config.REDIS_QUERY_PAGE_SIZE
+    if remaining is not None:
+      count = min(count, remaining)
+
+    if count <= 0:
+      return [], [], None
+
+    client = self.client
+    page = await RedisIndex(kind).page(client, filters, order=order, after=after, count=count)
+    async with client.pipeline(transaction=False) as pipeline:
+      [pipeline.hgetall(f'{kind}:{entity_id}') for _, entity_id in page]
+      entities = await pipeline.execute()
+
+    cursors = [cursor] + [
+      self.encode_cursor(*position, None if remaining is None else remaining - index)
+      for index, position in enumerate(page[:-1], start=1)
+    ]
+
+    if remaining is not None:
+      remaining -= len(page)
+
+    next_cursor = None
+    if len(page) == count and remaining != 0:
+      next_cursor = self.encode_cursor(*page[-1], remaining)
+
+    return entities, cursors[:len(page)], next_cursor
+
+  @staticmethod
+  def encode_cursor(sort_value, entity_id, remaining):
+    data = json.dumps([sort_value, entity_id, remaining])
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+  @staticmethod
+  def decode_cursor(cursor):
+    try:
+      data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+      data = None
+
+    if not isinstance(data, list) or len(data) != 3:
+      raise exceptions.ClientError(f'Invalid cursor "{cursor}"')
+
+    return data
@@ -0,0 +1,334 @@
+import datetime
+import hashlib
+import json
+import uuid
+
+from core.orm import exceptions
+
+
+# Moves the ids found in a lexicographical index range into a set, so that string range filters
+# can be intersected with other filters without leaving the server.
+# Lex index members are stored as "<value>\0<entity_id>".
+_LEX_RANGE_TO_SET = """
+local members = redis.call('ZRANGE', KEYS[2], ARGV[1], ARGV[2], 'BYLEX')
+for _, member in ipairs(members) do
+  redis.call('SADD', KEYS[1], string.sub(member, string.find(member, '\\0', 1, true) + 1))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return #members
+"""
+
+
+class RedisIndex:
+  """Secondary indexes of a single kind stored by RedisDB.
+
+  Every indexed field value is kept in:
+  - an equality set `<kind>:index:<field>:eq:<value>` holding the entity ids with that value.
+  - a sorted set `<kind>:index:<field>:score` scored by the value for numbers, or
+    `<kind>:index:<field>:lex` of "<value>\\0<entity_id>" members for strings (datetimes are
+    indexed by their ISO format). These serve range filters (>, <, >=, <=).
+
+  All entity ids of the kind are kept in the `<kind>:index:__key__` sorted set.
+
+  Query results are read page by page: unordered results are walked by entity id, results ordered
+  by a numeric field are walked by rank in the field's score index, and results ordered by a string
+  field are walked in the field's lexicographical index.
+
+  Filtered results ordered by a field are first collected into a match key named after the filters
+  and the order. The first page builds it, following pages reuse it while it lives (MATCH_KEY_TTL
+  seconds), so that a page costs O(log(n) + page size) instead of O(matches). Entities written
+  after the first page may therefore not show up on the following pages of that query.
+
+  Index commands are queued on the pipeline given by RedisDB, so that they are applied within the
+  same MULTI transaction as the entity write.
+  """
+  RANGE_OPERATORS = ('>', '<', '>=', '<=')
+  TEMP_KEY_TTL = 30
+  MATCH_KEY_TTL = 60
+
+  def __init__(self, kind):
+    self.kind = kind
+
+  @property
+  def all_key(self):
+    return f'{self.kind}:index:__key__'
+
+  def eq_key(self, field_name, value):
+    return f'{self.kind}:index:{field_name}:eq:{self.encode(value)}'
+
+  def score_key(self, field_name):
+    return f'{self.kind}:index:{field_name}:score'
+
+  def lex_key(self, field_name):
+    return f'{self.kind}:index:{field_name}:lex'
+
+  def temp_key(self):
+    return f'{self.kind}:index:tmp:{uuid.uuid4()}'
+
+  def match_key(self, filters, field_name):
+    filters = [[name, cmp, self.encode(value)] for name, cmp, value in filters]
+    digest = hashlib.sha1(json.dumps([filters, field_name]).encode()).hexdigest()
+    return f'{self.kind}:index:match:{digest}'
+
+  @staticmethod
+  def normalize(value):
+    """Returns the value in the form RedisClient stores it."""
+    if isinstance(value, datetime.datetime):
+      return value.isoformat()
+
+    if isinstance(value, bool):
+      return int(value)
+
+    return value
+
+  @classmethod
+  def encode(cls, value):
+    """Returns the string Redis stores for the given value."""
+    return str(cls.normalize(value))
+
+  @classmethod
+  def is_scored(cls, value):
+    return isinstance(cls.normalize(value), (int, float))
+
+  def add(self, pipeline, entity_id, data, exclude_from_indexes=()):
+    """Queues commands indexing the given entity data."""
+    pipeline.zadd(self.all_key, {entity_id: 0})
+    for field_name, value in data.items():
+      if value is None or field_name in exclude_from_indexes:
+        continue
+
+      value = self.normalize(value)
+      pipeline.sadd(self.eq_key(field_name, value), entity_id)
+      if isinstance(value, (int, float)):
+        pipeline.zadd(self.score_key(field_name), {entity_id: value})
+      elif isinstance(value, str):
+        pipeline.zadd(self.lex_key(field_name), {f'{value}\0{entity_id}': 0})
+
+  def remove(self, pipeline, entity_id, data):
+    """Queues commands removing the given (stored) entity data from the indexes."""
+    pipeline.zrem(self.all_key, entity_id)
+    for field_name, value in data.items():
+      pipeline.srem(self.eq_key(field_name, value), entity_id)
+      pipeline.zrem(self.score_key(field_name), entity_id)
+      pipeline.zrem(self.lex_key(field_name), f'{value}\0{entity_id}')
+
+  async def match(self, pipeline, filters):
+    """Queues commands collecting the ids matching all filters into a sorted set.
+
+    Returns:
+      tuple: The key of the sorted set holding the matching ids and a list of temporary keys that
+        should be deleted once the result is read.
+    """
+    if not filters:
+      return self.all_key, []
+
+    keys, temp_keys = [], []
+    for field_name, cmp, value in filters:
+      if cmp == '=':
+        keys.append(self.eq_key(field_name, value))
+        continue
+
+      if cmp not in self.RANGE_OPERATORS:
+        raise exceptions.ClientError(f'Unsupported query operator "{cmp}"')
+
+      temp_key = self.temp_key()
+      if self.is_scored(value):
+        low, high = self._score_range(cmp, self.normalize(value))
+        pipeline.zrangestore(temp_key, self.score_key(field_name), low, high, byscore=True)
+        pipeline.expire(temp_key, self.TEMP_KEY_TTL)
+      else:
+        low, high = self._lex_range(cmp, self.encode(value))
+        lex_range_to_set = pipeline.register_script(_LEX_RANGE_TO_SET)
+        await lex_range_to_set(
+          keys=[temp_key, self.lex_key(field_name)],
+          args=[low, high, self.TEMP_KEY_TTL],
+          client=pipeline,
+        )
+
+      keys.append(temp_key)
+      temp_keys.append(temp_key)
+
+    # Zero weights keep every matching id at score 0, so results can be walked by id with BYLEX.
+    result_key = self.temp_key()
+    pipeline.zinterstore(result_key, {key: 0 for key in keys})
+    pipeline.expire(result_key, self.TEMP_KEY_TTL)
+    return result_key, temp_keys + [result_key]
+
+  async def page(self, client, filters, order=None, after=None, count=100):
+    """Returns up to `count` matching entries following the `after` position.
+
+    Args:
+      client (redis.asyncio.Redis): The Redis client.
+      filters (list): (field_name, operator, value) tuples.
+      order (tuple): (field_name, descending, scored) to order by a field, None to order by id.
+      after (tuple): (sort_value, entity_id) of the last entry of the previous page.
+      count (int): The maximum number of entries to return.
+
+    Returns:
+      list: (sort_value, entity_id) tuples.
+    """
+    if order is None:
+      return await self._page_by_id(client, filters, after, count)
+
+    field_name, descending, scored = order
+    if scored:
+      return await self._page_by_score(client, filters, field_name, descending, after, count)
+
+    return await self._page_by_lex(client, filters, field_name, descending, after, count)
+
+  async def _page_by_id(self, client, filters, after, count):
+    if len(filters) == 1 and filters[0][1] == '=':
+      return await self._page_by_eq(client, filters[0][0], filters[0][2], after, count)
+
+    async with client.pipeline() as pipeline:
+      result_key, temp_keys = await self.match(pipeline, filters)
+      low = f'({after[1]}' if after else '-'
+      pipeline.zrange(result_key, low, '+', bylex=True, offset=0, num=count)
+      if temp_keys:
+        pipeline.delete(*temp_keys)
+      results = await pipeline.execute()
+
+    entity_ids = results[-2] if temp_keys else results[-1]
+    return [(None, entity_id) for entity_id in entity_ids]
+
+  async def _page_by_eq(self, client, field_name, value, after, count):
+    """Pages through the ids of a single equality filter, read straight from its equality set.
+
+    Equality sets mostly hold one or a few ids (e.g. unique tokens), so reading the set is a single
+    command instead of intersecting it into a temporary key.
+    """
+    entity_ids = sorted(await client.smembers(self.eq_key(field_name, value)))
+    if after:
+      entity_ids = [entity_id for entity_id in entity_ids if entity_id > after[1]]
+
+    return [(None, entity_id) for entity_id in entity_ids[:count]]
+
+  async def _page_by_score(self, client, filters, field_name, descending, after, count):
+    """Pages through matching ids ordered by the score index of the given field.
+
+    Matching ids are intersected with the score index so that the result carries field values as
+    scores, then the page starts right after the rank of the previous page's last entry.
+    """
+    order_key = self.score_key(field_name)
+    if filters:
+      order_key = await self._match_key(client, filters, field_name, after)
+
+    start = 0
+    if after:
+      if descending:
+        rank = await client.zrevrank(order_key, after[1])
+      else:
+        rank = await client.zrank(order_key, after[1])
+
+      if rank is None:
+        rank = await self._rank_of_position(client, order_key, descending, after)
+      start = rank + 1
+
+    return [
+      (score, entity_id)
+      for entity_id, score in await client.zrange(
+        order_key, start, start + count - 1, desc=descending, withscores=True
+      )
+    ]
+
+  async def _match_key(self, client, filters, field_name, after):
+    """Returns the match key of the filters, scored by the given field if any.
+
+    The key is built again for the first page of a query (no `after` position) or once it expired,
+    following pages reuse it. Redis does not keep empty sorted sets, so the key does not exist when
+    nothing matches.
+    """
+    match_key = self.match_key(filters, field_name)
+    if after and await client.exists(match_key):
+      return match_key
+
+    async with client.pipeline() as pipeline:
+      result_key, temp_keys = await self.match(pipeline, filters)
+      weights = {result_key: 0}
+      if field_name:
+        weights[self.score_key(field_name)] = 1
+      pipeline.zinterstore(match_key, weights)
+      pipeline.expire(match_key, self.MATCH_KEY_TTL)
+      if temp_keys:
+        pipeline.delete(*temp_keys)
+      await pipeline.execute()
+
+    return match_key
+
+  async def _rank_of_position(self, client, order_key, descending, after):
+    """Returns the rank of the last entry before the given position.
+
+    Used when the entity of the position does not match anymore, e.g. it was deleted or its field
+    changed since the previous page was read.
+    """
+    score, entity_id = after
+    async with client.pipeline(transaction=False) as pipeline:
+      if descending:
+        pipeline.zcount(order_key, f'({score}', '+inf')
+      else:
+        pipeline.zcount(order_key, '-inf', f'({score}')
+      pipeline.zrange(order_key, score, score, byscore=True)
+      before, ties = await pipeline.execute()
+
+    if descending:
+      return before + len([member for member in ties if member > entity_id]) - 1
+
+    return before + len([member for member in ties if member < entity_id]) - 1
+
+  async def _page_by_lex(self, client, filters, field_name, descending, after, count):
+    """Walks the lexicographical index of the given field, keeping ids matching the filters.
+
+    The index is read in page sized batches, the ids of a batch are checked against the match key
+    with a single ZMSCORE.
+    """
+    lex_key = self.lex_key(field_name)
+    bound = '+' if descending else '-'
+    if after:
+      bound = f'({after[0]}\0{after[1]}'
+
+    result_key = None
+    if filters:
+      result_key = await self._match_key(client, filters, None, after)
+      # Nothing matches, the whole index would be walked for nothing.
+      if not await client.exists(result_key):
+        return []
+
+    page = []
+    while len(page) < count:
+      end = '-' if descending else '+'
+      members = await client.zrange(
+        lex_key, bound, end, desc=descending, bylex=True, offset=0, num=count
+      )
+
+      if not members:
+        break
+
+      bound = f'({members[-1]}'
+      entries = [tuple(member.split('\0', 1)) for member in members]
+      if result_key:
+        matches = await client.zmscore(result_key, [entity_id for _, entity_id in entries])
+        entries = [entry for entry, score in zip(entries, matches) if score is not None]
+
+      page.extend(entries)
+
+    return page[:count]
+
+  @staticmethod
+  def _score_range(cmp, score):
+    return {
+      '>': (f'({score}', '+inf'),
+      '>=': (score, '+inf'),
+      '<': ('-inf', f'({score}'),
+      '<=': ('-inf', score),
+    }[cmp]
+
+  @staticmethod
+  def _lex_range(cmp, value):
+    # Members are "<value>\0<id>", "\0" sorts before any other character so "<value>\0" and
+    # "<value>\1" bound every member holding exactly <value>.
+    return {
+      '>': (f'[{value}\1', '+'),
+      '>=': (f'[{value}\0', '+'),
+      '<': ('-', f'({value}\0'),
+      '<=': ('-', f'({value}\1'),
+    }[cmp]
@@ -10,8 +10,10 @@ from sanic.response import text
 from core import config
 from core import exceptions
 from core import utils
+from core.http_client import HTTPClientManager
 from core.logging import logger
 from core.models import User
+from core.orm import identity_map
 
 
 _REQUIRED_MODULES = []
@@ -24,9 +26,12 @@ class Application:
     _feature_registry (dict): A dictionary which keeps a feature unique name and feature instance
       map.
     root (Feature): The root feature instance of the application.
+    route_policies (dict): The RoutePolicy of each registered route by route name, compiled when
+      the server starts.
   """
   _feature_registry = {}
   root = None
+  route_policies = {}
 
   @classmethod
   def get_feature(cls, name):
@@ -82,6 +87,8 @@ class Application:
     - Injects core post-create middlewares
     - Configures Sanic
     - Runs post-create lifehooks (pre-order traversal)
+    - Compiles route policies before the server starts
+    - Opens the shared HTTP client while the server runs
 
     Returns:
       Sanic: The Sanic app object that would be used for running Sanic server.
@@ -102,10 +109,91 @@ class Application:
     for feature in cls.root.children:
       cls.root.wrapper.blueprint(feature.wrapper)
     cls.root.post_create()
+    # Routes added after the app is created (e.g. static files) are only known when the server
+    # starts.
+    cls.root.wrapper.register_listener(cls.compile_route_policies, 'before_server_start')
+    cls.root.wrapper.register_listener(HTTPClientManager.start, 'before_server_start')
+    cls.root.wrapper.register_listener(HTTPClientManager.close, 'after_server_stop')
 
     logger.trace(f'App created: FEATURES {list(cls._feature_registry.keys())}')
     return cls.root.wrapper
 
+  @classmethod
+  def get_route_features(cls, route):
+    """Returns the unique names of the feature owning the route and of its ancestors.
+
+    Routes are owned by the feature of their blueprint, named `<app>.<blueprint>.<handler>`, or by
+    the root feature if they were added to the app itself.
+    """
+    parts = route.name.split('.')
+    feature = cls.get_feature(parts[1].removesuffix('-virtual')) if len(parts) > 2 else None
+    feature = feature or cls.root
+    features = set()
+    while feature:
+      features.add(feature.unique_name)
+      feature = feature.parent
+
+    return frozenset(features)
+
+  @classmethod
+  def compile_route_policies(cls, app, loop=None):
+    """Compiles the RoutePolicy of every route registered to the Sanic app.
+
+    Args:
+      app (Sanic): The Sanic app, its router must be finalized.
+      loop (asyncio.AbstractEventLoop): Unused, passed by Sanic to listeners.
+    """
+    policies = {}
+    for route in app.router.routes:
+      path = f'/{route.path}'
+      policies[route.name] = RoutePolicy(
+        path=path,
+        allow_unauthenticated=bool(
+          getattr(route.ctx, 'allow_unauthenticated', False)
+          or any(path.startswith(allowed) for allowed in config.ALLOW_UNAUTHENTICATED)
+        ),
+        features=cls.get_route_features(route),
+      )
+      logger.trace(f'Route {route.name}: {policies[route.name]}')
+
+    cls.route_policies = policies
+
+  @classmethod
+  def get_route_policy(cls, request):
+    """Returns the policy compiled for the request route.
+
+    Requests without a compiled route (e.g. not found, or made before the server started) get a
+    policy computed from the request path.
+    """
+    policy = cls.route_policies.get(getattr(request.route, 'name', None))
+    if policy:
+      return policy
+
+    return RoutePolicy(
+      path=request.path,
+      allow_unauthenticated=bool(
+        getattr(getattr(request.route, 'ctx', None), 'allow_unauthenticated', False)
+        or any(request.path.startswith(allowed) for allowed in config.ALLOW_UNAUTHENTICATED)
+      ),
+      features=frozenset(),
+    )
+
+
+class RoutePolicy(collections.namedtuple('RoutePolicy', [
+  'path',
+  'allow_unauthenticated',
+  'features',
+])):
+  """The request handling policy of a route, computed once instead of on every request.
+
+  Attributes:
+    path (str): The url path of the route.
+    allow_unauthenticated (bool): Whether requests to the route skip authentication, either because
+      the route allows it or because its path is in config.ALLOW_UNAUTHENTICATED.
+    features (frozenset<str>): The unique names of the feature owning the route and its ancestors.
+  """
+  __slots__ = ()
+
 
 class Feature:
   """An object that orchestrates feature configuration and holds all the information that shapes
@@ -345,9 +433,11 @@ class Feature:
     logger.trace(
       f'Feature {self.unique_name}: injecting route {route.log()}'
     )
+    # Named after the route class, handlers are all named "handler".
     wrapper.add_route(
       route.default_function,
       route.path,
+      name=route.__name__,
       methods=route.methods,
       ctx_allow_unauthenticated=route.allow_unauthenticated,
       **route.context
@@ -620,16 +710,15 @@ def initialize_request_context(request):
   request.ctx.user = None
   request.ctx.template_context = {}
   request.ctx.path = request.path
-  request.ctx.allow_unauthenticated = (
-    (
-      request.route and
-      request.route.ctx and
-      hasattr(request.route.ctx, 'allow_unauthenticated') and
-      request.route.ctx.allow_unauthenticated
-    )
-    or any(request.ctx.path.startswith(allowed) for allowed in config.ALLOW_UNAUTHENTICATED)
-  )
+  request.ctx.route_policy = Application.get_route_policy(request)
+  request.ctx.allow_unauthenticated = request.ctx.route_policy.allow_unauthenticated
   request.ctx.authenticated = False
+  # Connections handle their requests in sequence within one context, so the identity map is
+  # reset for every request.
+  if config.ORM_IDENTITY_MAP:
+    identity_map.begin()
+  else:
+    identity_map.end()
 
 
 class InitializeContext(OnRequest):
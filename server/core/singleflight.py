@@ -0,0 +1,90 @@
+import asyncio
+import uuid
+
+from core import exceptions
+
+
+class SingleFlight:
+  """Runs at most one call per key at a time, concurrent callers of the same key share its result.
+
+  Calls are coalesced within the process. With `redis_lock=True`, each call also holds a Redis lock
+  on `lock:<name>:<key>`, so that calls of the same key do not overlap across workers either.
+  Callers from other workers are not coalesced: they wait for the lock and then run their own
+  call, which should therefore check whether the work was already done.
+  """
+
+  LOCK_POLL_INTERVAL = 0.05
+
+  def __init__(self, name, redis_lock=False, lock_timeout=10):
+    """Initializes the single flight group.
+
+    Args:
+      name (str): The name of the group, used in the Redis lock keys.
+      redis_lock (bool): Whether or not calls hold a Redis lock.
+      lock_timeout (float): Seconds after which a Redis lock is released even if its call is still
+        running, and the longest time to wait for it.
+    """
+    self.name = name
+    self.redis_lock = redis_lock
+    self.lock_timeout = lock_timeout
+    self._calls = {}
+
+  async def _acquire(self, client, lock_key, token):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + self.lock_timeout
+    while not await client.set(lock_key, token, nx=True, px=int(self.lock_timeout * 1000)):
+      if loop.time() >= deadline:
+        raise exceptions.ServiceUnavailable(f'Could not acquire {lock_key}')
+
+      await asyncio.sleep(self.LOCK_POLL_INTERVAL)
+
+  async def _release(self, client, lock_key, token):
+    import redis
+
+    # Only delete the lock if it is still ours, it may have timed out and been taken over.
+    async with client.pipeline() as pipeline:
+      try:
+        await pipeline.watch(lock_key)
+        if await pipeline.get(lock_key) == token:
+          pipeline.multi()
+          pipeline.delete(lock_key)
+          await pipeline.execute()
+      except redis.exceptions.WatchError:
+        pass
+
+  async def _run(self, key, func, args, kwargs):
+    if not self.redis_lock:
+      return await func(*args, **kwargs)
+
+    # redis is only a dependency of the Redis locks, see requirements/dev.txt.
+    from redis import asyncio as aioredis
+    from core.orm.redis_db import RedisDB
+
+    client = aioredis.Redis(connection_pool=RedisDB.get_pool())
+    lock_key, token = f'lock:{self.name}:{key}', str(uuid.uuid4())
+    await self._acquire(client, lock_key, token)
+    try:
+      return await func(*args, **kwargs)
+    finally:
+      await self._release(client, lock_key, token)
+
+  def start(self, key, func, *args, **kwargs):
+    """Starts func(*args, **kwargs) unless a call for the key is in flight, returns the call task.
+
+    Callers that do not await the task are responsible for retrieving its exception.
+    """
+    task = self._calls.get(key)
+    if task is None:
+      task = asyncio.ensure_future(self._run(key, func, args, kwargs))
+      self._calls[key] = task
+      task.add_done_callback(lambda _: self._calls.pop(key, None))
+
+    return task
+
+  async def do(self, key, func, *args, **kwargs):
+    """Returns the result of func(*args, **kwargs), unless a call for the key is in flight.
+
+    In that case the result (or exception) of the call in flight is returned instead.
+    """
+    # A cancelled caller must not cancel the call the other callers are waiting for.
+    return await asyncio.shield(self.start(key, func, *args, **kwargs))
@@ -0,0 +1,68 @@
+import json
+import os
+import re
+
+from core import config
+
+
+PLACEHOLDER_PATTERN = re.compile(r'template\.context\.(\w+)')
+
+_templates = {}
+
+
+class Template:
+  """A template pre-parsed into literal chunks and `template.context.<KEY>` placeholder slots.
+
+  Rendering joins the chunks with the JSON encoded context values, placeholders of keys missing
+  from the context are left as they are.
+  """
+
+  def __init__(self, source, mtime=None):
+    self.mtime = mtime
+    # Chunks alternate literal text and placeholder keys, slots hold the placeholder positions.
+    self._chunks = PLACEHOLDER_PATTERN.split(source)
+    self._slots = range(1, len(self._chunks), 2)
+
+  @classmethod
+  def from_file(cls, path):
+    with open(path) as template:
+      return cls(template.read(), mtime=os.path.getmtime(path))
+
+  @property
+  def keys(self):
+    """The context keys used by the template."""
+    return {self._chunks[slot] for slot in self._slots}
+
+  def render(self, context):
+    chunks = self._chunks.copy()
+    for slot in self._slots:
+      key = chunks[slot]
+      if key in context:
+        chunks[slot] = json.dumps(context[key] or '')
+      else:
+        chunks[slot] = f'template.context.{key}'
+
+    return ''.join(chunks)
+
+
+def get_template(path):
+  """Returns the parsed template of the given file, loading it on first use.
+
+  Templates are cached for the lifetime of the process, in dev mode they are reloaded when their
+  file changes.
+  """
+  template = _templates.get(path)
+  if template is None or (config.is_dev() and template.mtime != os.path.getmtime(path)):
+    template = _templates[path] = Template.from_file(path)
+
+  return template
+
+
+def render(path, context):
+  """Renders the template of the given file with the given context."""
+  return get_template(path).render(context)
+
+
+def clear():
+  """Clears the cached templates."""
+  _templates.clear()
@@ -0,0 +1,131 @@
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from core import cache
+from core.models import User
+from core.models import access_token_cache
+from core.tests import base
+
+
+class TestCache(unittest.IsolatedAsyncioTestCase):
+
+  async def test_lru(self):
+    lru = cache.Cache('test_lru', max_size=2)
+    await lru.set('a', 1)
+    await lru.set('b', 2)
+    self.assertEqual(1, await lru.get('a'))
+
+    await lru.set('c', 3)
+    self.assertIsNone(await lru.get('b'))
+    self.assertEqual(1, await lru.get('a'))
+    self.assertEqual(3, await lru.get('c'))
+
+    stats = lru.stats()
+    self.assertEqual(3, stats['hits'])
+    self.assertEqual(1, stats['misses'])
+    self.assertEqual(1, stats['evictions'])
+
+  @patch('core.cache.time.monotonic')
+  async def test_ttl(self, mock_monotonic):
+    mock_monotonic.return_value = 100
+    ttl_cache = cache.Cache('test_ttl', ttl=10)
+    await ttl_cache.set('a', 1)
+
+    mock_monotonic.return_value = 109
+    self.assertEqual(1, await ttl_cache.get('a'))
+
+    mock_monotonic.return_value = 110
+    self.assertIsNone(await ttl_cache.get('a'))
+    self.assertEqual(1, ttl_cache.stats()['expirations'])
+
+  @patch('core.cache.time.monotonic')
+  async def test_on_evict(self, mock_monotonic):
+    mock_monotonic.return_value = 100
+    evicted = []
+    lru = cache.Cache('test_on_evict', max_size=2, ttl=10, on_evict=evicted.append)
+    await lru.set('a', 'a1')
+    await lru.set('b', 'b1')
+    await lru.set('c', 'c1')
+    self.assertEqual(['a1'], evicted)
+
+    await lru.set('b', 'b2')
+    await lru.delete('c')
+    self.assertEqual(['a1', 'b1', 'c1'], evicted)
+
+    mock_monotonic.return_value = 110
+    self.assertIsNone(await lru.get('b'))
+    self.assertEqual(['a1', 'b1', 'c1', 'b2'], evicted)
+
+    await lru.set('d', 'd1')
+    lru.clear()
+    self.assertEqual(['a1', 'b1', 'c1', 'b2', 'd1'], evicted)
+
+  async def test_redis_tier(self):
+    first = cache.Cache('test_redis_tier', redis=True)
+    second = cache.Cache('test_redis_tier', redis=True)
+    try:
+      await first.set('a', {'value': 1})
+      self.assertEqual({'value': 1}, await second.get('a'))
+      self.assertEqual(1, second.stats()['redis_hits'])
+
+      await second.delete('a')
+      first.clear()
+      self.assertIsNone(await first.get('a'))
+    finally:
+      await first.delete('a')
+
+  def test_without_redis(self):
+    # The in-process cache must work where the redis package is not installed (see base.txt).
+    code = (
+      'import asyncio, sys; sys.modules["redis"] = None; from core import cache; '
+      'lru = cache.Cache("test_without_redis"); asyncio.run(lru.set("a", 1)); '
+      'assert asyncio.run(lru.get("a")) == 1'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+  def test_registry(self):
+    registered = cache.get_cache('test_registry', max_size=5)
+    self.assertIs(registered, cache.get_cache('test_registry'))
+    self.assertEqual(5, cache.stats()['test_registry']['max_size'])
+
+
+class TestAccessTokenCache(base.TransactionalTestCase):
+
+  def setUp(self):
+    super().setUp()
+    access_token_cache.clear()
+
+  async def test_get_by_access_token(self):
+    user = await User.create(access_token='token')
+    self.assertEqual(user.id, (await User.get_by_access_token('token')).id)
+    self.assertEqual(user.id, (await User.get_by_access_token('token')).id)
+
+    stats = access_token_cache.stats()
+    self.assertEqual(1, stats['hits'])
+    self.assertEqual(1, stats['misses'])
+
+  async def test_invalidated_on_access_token_change(self):
+    user = await User.create(access_token='token')
+    await User.get_by_access_token('token')
+
+    user.access_token = 'new-token'
+    await user.update()
+    self.assertIsNone(await User.get_by_access_token('token'))
+    self.assertEqual(user.id, (await User.get_by_access_token('new-token')).id)
+
+    await user.delete()
+    self.assertIsNone(await User.get_by_access_token('new-token'))
+
+  async def test_stale_entry(self):
+    user = await User.create(access_token='token')
+    await User.get_by_access_token('token')
+
+    # A change made by another process is not seen by this cache.
+    other = await User.get_by_id(user.id)
+    other.access_token = 'new-token'
+    await other.update()
+    await access_token_cache.set('token', user.id)
+
+    self.assertIsNone(await User.get_by_access_token('token'))
@@ -0,0 +1,31 @@
+import asyncio
+import types
+import unittest
+
+from core import context
+
+
+class TestContext(unittest.IsolatedAsyncioTestCase):
+
+  async def asyncSetUp(self):
+    self.ctx = types.SimpleNamespace(user='user')
+    self.calls = 0
+
+  async def factory(self):
+    self.calls += 1
+    await asyncio.sleep(0.01)
+    return 'value'
+
+  async def test_computed_on_first_use(self):
+    context.set_lazy(self.ctx, 'lazy', self.factory)
+    self.assertEqual(0, self.calls)
+
+    values = await asyncio.gather(context.get(self.ctx, 'lazy'), context.get(self.ctx, 'lazy'))
+    self.assertEqual(['value', 'value'], values)
+    self.assertEqual('value', await context.get(self.ctx, 'lazy'))
+    self.assertEqual('value', self.ctx.lazy)
+    self.assertEqual(1, self.calls)
+
+  async def test_plain_values(self):
+    self.assertEqual('user', await context.get(self.ctx, 'user'))
+    self.assertIsNone(await context.get(self.ctx, 'missing'))
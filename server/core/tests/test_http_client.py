@@ -0,0 +1,78 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from core import exceptions
+from core import utils
+from core.http_client import HTTPClientManager
+
+
+class TestHTTPClientManager(unittest.IsolatedAsyncioTestCase):
+
+  def setUp(self):
+    self.responses = []
+    self.requests = []
+    client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+    patcher = patch.object(HTTPClientManager, '_create_client', return_value=client)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+    patcher = patch('core.http_client.config.HTTP_RETRY_BACKOFF', 0)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  async def asyncTearDown(self):
+    await HTTPClientManager.close()
+
+  def handle(self, request):
+    self.requests.append(request)
+    response = self.responses.pop(0)
+    if isinstance(response, Exception):
+      raise response
+
+    return httpx.Response(response)
+
+  async def test_shared_client(self):
+    self.assertIs(HTTPClientManager.get_client(), HTTPClientManager.get_client())
+
+    await HTTPClientManager.close()
+    self.assertTrue(HTTPClientManager._create_client.return_value.is_closed)
+
+  async def test_close_drops_host_limits(self):
+    self.responses = [200]
+    await HTTPClientManager.request('GET', 'http://localhost/resource')
+    loop = asyncio.get_running_loop()
+    host_limit = HTTPClientManager._host_limits[loop]['localhost']
+
+    await HTTPClientManager.close()
+    self.assertNotIn(loop, HTTPClientManager._host_limits)
+
+    self.responses = [200]
+    HTTPClientManager._create_client.return_value = httpx.AsyncClient(
+      transport=httpx.MockTransport(self.handle)
+    )
+    await HTTPClientManager.request('GET', 'http://localhost/resource')
+    self.assertIsNot(host_limit, HTTPClientManager._host_limits[loop]['localhost'])
+
+  async def test_retries(self):
+    self.responses = [503, httpx.ReadTimeout('timeout'), 200]
+    response = await HTTPClientManager.request('GET', 'http://localhost/resource')
+    self.assertEqual(200, response.status_code)
+    self.assertEqual(3, len(self.requests))
+
+  async def test_non_idempotent_requests_are_not_resent(self):
+    self.responses = [503]
+    with self.assertRaises(exceptions.BadRequestError):
+      await utils.make_request('POST', 'http://localhost/resource')
+
+    self.responses = [httpx.ConnectError('refused'), 200]
+    response = await utils.make_request('POST', 'http://localhost/resource')
+    self.assertEqual(200, response.status_code)
+    self.assertEqual(3, len(self.requests))
+
+  async def test_retries_exhausted(self):
+    self.responses = [httpx.ConnectError('refused')] * 3
+    with self.assertRaises(httpx.ConnectError):
+      await HTTPClientManager.request('GET', 'http://localhost/resource')
@@ -0,0 +1,403 @@
+import base64
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from core import config
+from core.orm import config as orm_config
+from core.orm import exceptions
+from core.orm import fields
+from core.orm import identity_map
+from core.orm.executor import BlockingExecutor
+from core.orm.executor import ExecutorMetrics
+from core.orm.model import Model
+from core.orm.redis_db import RedisDB
+from core.orm.redis_index import RedisIndex
+from core.tests import base
+
+
+class OrmTestModel(Model):
+  name = fields.StringField(unique_key=True)
+  age = fields.IntegerField()
+  group = fields.StringField()
+
+
+class OrmTestReference(Model):
+  name = fields.StringField(unique_key=True)
+  target = fields.ReferenceField(OrmTestModel)
+
+
+class TestModel(base.TransactionalTestCase):
+
+  async def test_entities_share_field_definitions(self):
+    first = OrmTestModel.from_database(name='a', age=1)
+    second = OrmTestModel.from_database(name='b', age=2)
+    second.age = 3
+
+    self.assertIs(OrmTestModel.class_fields['age'], first.fields['age'])
+    self.assertEqual({'name': 'a', 'age': 1, 'group': None}, first.values)
+    self.assertEqual({'name': 'b', 'age': 3, 'group': None}, second.values)
+
+  async def test_entities_have_no_dict(self):
+    entity = OrmTestModel(name='a', age=1)
+    self.assertFalse(hasattr(entity, '__dict__'))
+
+  async def test_set_persisted(self):
+    entity = await OrmTestModel.create(name='a', age=1)
+    entity.age = 2
+    entity.set_persisted(**entity.serialize())
+    self.assertEqual(2, entity.age)
+
+    entity = await OrmTestModel.get_by_id('a')
+    self.assertEqual(1, entity.age)
+
+  async def test_dirty_fields(self):
+    entity = await OrmTestModel.create(name='a', age=1)
+    self.assertEqual(set(), entity.dirty_fields)
+
+    entity = await OrmTestModel.get_by_id('a')
+    self.assertEqual(set(), entity.dirty_fields)
+
+    for age in range(10):
+      entity.age = age
+    self.assertEqual({'age'}, entity.dirty_fields)
+
+    await entity.update()
+    self.assertEqual(set(), entity.dirty_fields)
+    self.assertEqual(9, (await OrmTestModel.get_by_id('a')).age)
+
+  async def test_update_writes_dirty_fields_only(self):
+    await OrmTestModel.create(name='a', age=1, group='odd')
+    first = await OrmTestModel.get_by_id('a')
+    second = await OrmTestModel.get_by_id('a')
+
+    first.age = 2
+    await first.update()
+    second.group = None
+    await second.update()
+
+    entity = await OrmTestModel.get_by_id('a')
+    self.assertEqual({'name': 'a', 'age': 2, 'group': None}, entity.values)
+    self.assertEqual([], [e async for e in OrmTestModel.all().filter('group', '=', 'odd')])
+
+
+class TestReference(base.TransactionalTestCase):
+
+  async def asyncSetUp(self):
+    await super().asyncSetUp()
+    for name in ['a', 'b']:
+      target = await OrmTestModel.create(name=name, age=0)
+      await OrmTestReference.create(name=f'{name}1', target=target)
+      await OrmTestReference.create(name=f'{name}2', target=target.key)
+
+  async def test_resolve(self):
+    reference = await OrmTestReference.get_by_id('a1')
+    target = await reference.resolve('target')
+    self.assertEqual('a', target.name)
+    self.assertIs(target, reference.target)
+
+  async def test_sync_fetch(self):
+    client_cls = type(OrmTestReference.client)
+    with patch.object(client_cls, 'close', autospec=True, side_effect=client_cls.close) as close:
+      reference = await OrmTestReference.get_by_id('b1')
+      self.assertEqual('b', reference.target.name)
+      close.assert_called_once()
+
+  @patch.object(OrmTestModel, 'get_multi', wraps=OrmTestModel.get_multi)
+  async def test_prefetch(self, mock_get_multi):
+    references = [e async for e in OrmTestReference.all()]
+    await OrmTestReference.prefetch(references, 'target')
+
+    mock_get_multi.assert_called_once_with(['a', 'b'])
+    self.assertEqual(['a', 'a', 'b', 'b'], [r.target.name for r in references])
+    self.assertIs(references[0].target, references[1].target)
+
+  async def test_identity_map(self):
+    first = await OrmTestModel.get_by_id('a')
+    self.assertIsNot(first, await OrmTestModel.get_by_id('a'))
+
+    identity_map.begin()
+    try:
+      first = await OrmTestModel.get_by_id('a')
+      self.assertIs(first, await OrmTestModel.get_by_id('a'))
+      self.assertIs(first, await (await OrmTestReference.get_by_id('a1')).resolve('target'))
+
+      await first.delete()
+      self.assertIsNone(await OrmTestModel.get_by_id('a'))
+    finally:
+      identity_map.end()
+
+
+class TestMulti(base.TransactionalTestCase):
+
+  async def test_get_multi(self):
+    await OrmTestModel.create(name='a', age=1)
+    await OrmTestModel.create(name='b', age=2)
+
+    entities = await OrmTestModel.get_multi(['b', 'missing', 'a'])
+    self.assertEqual(['b', None, 'a'], [e.name if e else None for e in entities])
+
+  async def test_put_multi(self):
+    await OrmTestModel.create(name='a', age=1, group='odd')
+    await OrmTestModel.put_multi([
+      OrmTestModel(name='a', age=2, group='even'), OrmTestModel(name='b', age=3, group='odd')
+    ])
+
+    entities = await OrmTestModel.get_multi(['a', 'b'])
+    self.assertEqual([2, 3], [e.age for e in entities])
+    odd = [e.name async for e in OrmTestModel.all().filter('group', '=', 'odd')]
+    self.assertEqual(['b'], odd)
+
+  async def test_delete_multi(self):
+    await OrmTestModel.create(name='a', age=1)
+    await OrmTestModel.create(name='b', age=2)
+    await OrmTestModel.create(name='c', age=3)
+
+    await OrmTestModel.delete_multi(['a', 'c', 'missing'])
+    self.assertEqual(['b'], [e.name async for e in OrmTestModel.all()])
+
+
+class TestQuery(base.TransactionalTestCase):
+
+  async def asyncSetUp(self):
+    await super().asyncSetUp()
+    for age, name in enumerate(['a', 'b', 'c', 'd']):
+      await OrmTestModel.create(name=name, age=age, group='odd' if age % 2 else 'even')
+
+  async def query(self, *filters):
+    query = OrmTestModel.all()
+    for item in filters:
+      query.filter(*item)
+
+    return sorted([entity.name async for entity in query])
+
+  async def test_all(self):
+    self.assertEqual(['a', 'b', 'c', 'd'], await self.query())
+
+  async def test_equality(self):
+    self.assertEqual(['b', 'd'], await self.query(('group', '=', 'odd')))
+    self.assertEqual(['c'], await self.query(('group', '=', 'even'), ('name', '=', 'c')))
+    self.assertEqual([], await self.query(('group', '=', 'none')))
+
+  async def test_range(self):
+    self.assertEqual(['c', 'd'], await self.query(('name', '>', 'b')))
+    self.assertEqual(['b', 'c', 'd'], await self.query(('name', '>=', 'b')))
+    self.assertEqual(['a'], await self.query(('name', '<', 'b')))
+    self.assertEqual(['a', 'b'], await self.query(('name', '<=', 'b')))
+    self.assertEqual(['d'], await self.query(('group', '=', 'odd'), ('name', '>', 'b')))
+    self.assertEqual(['c', 'd'], await self.query(('age', '>', 1)))
+    self.assertEqual(['a', 'b'], await self.query(('age', '<=', 1)))
+
+  async def test_index_follows_writes(self):
+    entity = await OrmTestModel.get_by_id('b')
+    entity.group = 'even'
+    await entity.update()
+    self.assertEqual(['d'], await self.query(('group', '=', 'odd')))
+
+    await entity.delete()
+    self.assertEqual(['a', 'c'], await self.query(('group', '=', 'even')))
+
+
+@patch.object(config, 'REDIS_QUERY_PAGE_SIZE', 2)
+class TestQueryPages(base.TransactionalTestCase):
+
+  async def asyncSetUp(self):
+    await super().asyncSetUp()
+    for age, name in zip([2, 0, 3, 1, 2], ['e', 'c', 'a', 'd', 'b']):
+      await OrmTestModel.create(name=name, age=age, group='odd' if age % 2 else 'even')
+
+  async def names(self, query, cursor=None):
+    return [entity.name async for entity in query.fetch(cursor=cursor)]
+
+  async def test_order_by(self):
+    self.assertEqual(['a', 'b', 'c', 'd', 'e'], await self.names(OrmTestModel.all()))
+    self.assertEqual(
+      ['a', 'b', 'c', 'd', 'e'], await self.names(OrmTestModel.all().order_by('name'))
+    )
+    self.assertEqual(
+      ['e', 'd', 'c', 'b', 'a'], await self.names(OrmTestModel.all().order_by('-name'))
+    )
+    self.assertEqual(
+      ['c', 'd', 'b', 'e', 'a'], await self.names(OrmTestModel.all().order_by('age'))
+    )
+    self.assertEqual(
+      ['a', 'e', 'b', 'd', 'c'], await self.names(OrmTestModel.all().order_by('-age'))
+    )
+
+  async def test_equality_pages(self):
+    query = OrmTestModel.all().filter('group', '=', 'even')
+    self.assertEqual(['b', 'c', 'e'], await self.names(query))
+
+  @unittest.skipUnless(orm_config.client.__name__ == 'RedisClient', 'Reads RedisDB pages')
+  @patch('redis.asyncio.client.Pipeline.zinterstore')
+  async def test_single_equality_filter_reads_its_set(self, mock_zinterstore):
+    query = OrmTestModel.all().filter('group', '=', 'odd')
+    self.assertEqual(['a', 'd'], await self.names(query))
+    mock_zinterstore.assert_not_called()
+
+  async def test_order_by_with_filters(self):
+    query = OrmTestModel.all().filter('group', '=', 'even').order_by('-age')
+    self.assertEqual(['e', 'b', 'c'], await self.names(query))
+
+    query = OrmTestModel.all().filter('name', '<', 'e').order_by('-name')
+    self.assertEqual(['d', 'c', 'b', 'a'], await self.names(query))
+
+  @unittest.skipUnless(orm_config.client.__name__ == 'RedisClient', 'Reads RedisDB pages')
+  @patch.object(RedisIndex, 'match', autospec=True, side_effect=RedisIndex.match)
+  async def test_filtered_pages_reuse_match_key(self, mock_match):
+    query = OrmTestModel.all().filter('age', '<', 3).order_by('-age')
+    self.assertEqual(['e', 'b', 'd', 'c'], await self.names(query))
+    mock_match.assert_called_once()
+
+    mock_match.reset_mock()
+    query = OrmTestModel.all().filter('group', '=', 'even').order_by('name')
+    self.assertEqual(['b', 'c', 'e'], await self.names(query))
+    mock_match.assert_called_once()
+
+  @unittest.skipUnless(orm_config.client.__name__ == 'RedisClient', 'Reads RedisDB pages')
+  async def test_invalid_cursor(self):
+    for data in [b'not json', b'[1]', b'{"a": 1}', b'1']:
+      with self.assertRaises(exceptions.ClientError):
+        await self.names(OrmTestModel.all(), cursor=base64.urlsafe_b64encode(data).decode())
+
+    with self.assertRaises(exceptions.ClientError):
+      await self.names(OrmTestModel.all(), cursor='%%%')
+
+  async def test_limit(self):
+    self.assertEqual(['a', 'b', 'c'], await self.names(OrmTestModel.all().limit(3)))
+    self.assertEqual(['c'], await self.names(OrmTestModel.all().order_by('age').limit(1)))
+
+  async def test_cursor(self):
+    query = OrmTestModel.all().order_by('age')
+    iterator = query.fetch()
+    names = []
+    async for entity in iterator:
+      names.append(entity.name)
+      if len(names) == 3:
+        break
+
+    # The item-level cursor resumes at the last yielded entity.
+    self.assertEqual(['c', 'd', 'b'], names)
+    self.assertEqual(['b', 'e', 'a'], await self.names(query, cursor=iterator.cursor))
+
+  async def test_cursor_keeps_limit(self):
+    query = OrmTestModel.all().order_by('age').limit(3)
+    iterator = query.fetch()
+    names = []
+    async for entity in iterator:
+      names.append(entity.name)
+      if len(names) == 2:
+        break
+
+    # The cursor counts the entities already returned against the limit.
+    self.assertEqual(['c', 'd'], names)
+    self.assertEqual(['d', 'b'], await self.names(query, cursor=iterator.cursor))
+
+  @unittest.skipUnless(orm_config.client.__name__ == 'RedisClient', 'Reads RedisDB pages')
+  async def test_cursor_resumes_at_item(self):
+    query = OrmTestModel.all().order_by('age')
+    iterator = query.fetch()
+    async for entity in iterator:
+      if entity.name == 'e':
+        break
+
+    with patch.object(RedisDB, 'query', autospec=True, side_effect=RedisDB.query) as mock_query:
+      self.assertEqual(['e', 'a'], await self.names(query, cursor=iterator.cursor))
+
+    # The last page of 2 entities, then an empty page.
+    self.assertEqual(2, mock_query.call_count)
+
+  async def test_cursor_after_deleted_entity(self):
+    query = OrmTestModel.all().order_by('age')
+    iterator = query.fetch()
+    async for entity in iterator:
+      if entity.name == 'b':
+        break
+
+    # The second page starts after "d", which does not exist anymore.
+    await (await OrmTestModel.get_by_id('d')).delete()
+    self.assertEqual(['b', 'e', 'a'], await self.names(query, cursor=iterator.cursor))
+
+
+class TestBlockingExecutor(unittest.IsolatedAsyncioTestCase):
+
+  async def test_run(self):
+    executor = BlockingExecutor(max_workers=2)
+    try:
+      thread_name = await executor.run('name', lambda: threading.current_thread().name)
+      self.assertNotEqual(threading.current_thread().name, thread_name)
+
+      with self.assertRaises(ValueError):
+        await executor.run('fail', int, 'a')
+    finally:
+      executor.shutdown()
+
+    metrics = executor.metrics.snapshot()
+    self.assertEqual(1, metrics['name']['calls'])
+    self.assertEqual(1, metrics['fail']['errors'])
+
+  def test_metrics_from_threads(self):
+    metrics = ExecutorMetrics()
+
+    def record():
+      for _ in range(10000):
+        metrics.record('op', 0.001, 0.002)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+    self.assertEqual(80000, metrics.snapshot()['op']['calls'])
+
+  async def test_queue_wait_and_timeout(self):
+    executor = BlockingExecutor(max_workers=1, timeout=0.05)
+    try:
+      with self.assertRaises(exceptions.ClientTimeout):
+        await executor.run('sleep', time.sleep, 0.2)
+
+      await executor.run('queued', lambda: None, timeout=1)
+    finally:
+      executor.shutdown()
+
+    metrics = executor.metrics.snapshot()
+    self.assertEqual(1, metrics['sleep']['timeouts'])
+    self.assertGreater(metrics['sleep']['call_time_max'], 0.1)
+    self.assertGreater(metrics['queued']['queue_wait_max'], 0.1)
+
+
+@unittest.skipUnless(
+  orm_config.client.__name__ == 'DatastoreClient', 'Runs against the Datastore emulator'
+)
+class TestDatastoreClient(base.TransactionalTestCase):
+
+  async def test_calls_run_on_executor(self):
+    executor = orm_config.client.executor
+    executor.metrics.reset()
+    entity = await OrmTestModel.create(name='a', age=1)
+    entity.age = 2
+    await entity.update()
+    self.assertEqual(2, (await OrmTestModel.get_by_id('a')).age)
+    self.assertEqual(['a'], [e.name async for e in OrmTestModel.all()])
+
+    metrics = executor.metrics.snapshot()
+    for operation in ['put', 'update', 'get', 'run_query']:
+      self.assertEqual(1, metrics[operation]['calls'])
+
+  async def test_stream_query_pages(self):
+    for name in ['a', 'b', 'c', 'd', 'e']:
+      await OrmTestModel.create(name=name, age=0)
+
+    executor = orm_config.client.executor
+    executor.metrics.reset()
+    query = OrmTestModel.all().order_by('name').page_size(2)
+    self.assertEqual(['a', 'b', 'c', 'd', 'e'], [e.name async for e in query])
+    self.assertEqual(3, executor.metrics.snapshot()['run_query']['calls'])
+
+  async def test_stream_query_short_batches(self):
+    # Datastore may return fewer entities than asked for while more results exist.
+    pages = [([{'name': 'a', 'age': 0}], 'cursor'), ([{'name': 'b', 'age': 1}], None)]
+    with patch.object(orm_config.client, '_fetch_page', side_effect=pages) as mock_fetch_page:
+      query = OrmTestModel.all().order_by('name').page_size(2)
+      self.assertEqual(['a', 'b'], [e.name async for e in query])
+
+    self.assertEqual(2, mock_fetch_page.call_count)
@@ -4,12 +4,78 @@ from unittest import mock
 from unittest.mock import call
 from unittest.mock import patch
 
+from sanic import Blueprint
+from sanic import Sanic
+
 from core.sanic import Application
 from core.sanic import DPI
 from core.sanic import Feature
+from core.sanic import InitializeContext
 from core.tests import mocks
 
 
+class TestRoutePolicies(unittest.TestCase):
+
+  def setUp(self):
+    Application._feature_registry = {}
+    Application.root = DPI()
+    Application.register_feature(Application.root)
+    self.sourced = mocks.Sourced(parent=Application.root)
+    Application.register_feature(self.sourced)
+
+    self.app = Sanic(f'test_route_policies_{self._testMethodName}')
+    blueprint = Blueprint(self.sourced.unique_name, url_prefix=self.sourced.url_prefix)
+    blueprint.add_route(mocks.MockRoute.handler, '/private', name='Private')
+    blueprint.add_route(
+      mocks.MockRoute.handler, '/private', name='PrivatePost', methods=['POST'],
+      ctx_allow_unauthenticated=True,
+    )
+    blueprint.add_route(
+      mocks.MockRoute.handler, '/public', name='Public', ctx_allow_unauthenticated=True
+    )
+    blueprint.on_request(mocks.MockOnRequest.middleware)
+    self.app.add_route(mocks.MockRoute.handler, '/static/file', name='StaticFile')
+    self.app.on_request(InitializeContext.middleware)
+    self.app.blueprint(blueprint)
+    self.app.router.finalize()
+
+  def tearDown(self):
+    Application._feature_registry = {}
+    Application.root = None
+    Application.route_policies = {}
+
+  def test_compile_route_policies(self):
+    Application.compile_route_policies(self.app)
+    prefix = f'{self.app.name}.dpi_sourced'
+    private = Application.route_policies[f'{prefix}.Private']
+    self.assertEqual('/sourced/private', private.path)
+    self.assertFalse(private.allow_unauthenticated)
+    self.assertEqual({'dpi', 'dpi_sourced'}, private.features)
+
+    # Routes sharing a path keep their own policy.
+    private_post = Application.route_policies[f'{prefix}.PrivatePost']
+    self.assertEqual('/sourced/private', private_post.path)
+    self.assertTrue(private_post.allow_unauthenticated)
+
+    self.assertTrue(Application.route_policies[f'{prefix}.Public'].allow_unauthenticated)
+    static = Application.route_policies[f'{self.app.name}.StaticFile']
+    self.assertTrue(static.allow_unauthenticated)
+    self.assertEqual({'dpi'}, static.features)
+
+  def test_get_route_policy(self):
+    Application.compile_route_policies(self.app)
+    name = f'{self.app.name}.dpi_sourced.Private'
+    request = mocks.MockSanicRequest('/sourced/private')
+    request.route.name = name
+    self.assertIs(Application.route_policies[name], Application.get_route_policy(request))
+
+    # Unknown routes fall back to the request path.
+    request = mocks.MockSanicRequest('/static/other')
+    policy = Application.get_route_policy(request)
+    self.assertEqual('/static/other', policy.path)
+    self.assertTrue(policy.allow_unauthenticated)
+
+
 class TestApplication(unittest.TestCase):
   maxDiff = None
 
@@ -340,6 +406,7 @@ class TestApplication(unittest.TestCase):
       call.on_request(mocks.MockOnRequest.middleware),
       call.on_response(mocks.MockOnResponse.middleware),
       call.add_route(mocks.MockRoute.handler, mocks.MockRoute.PATH,
+                     name=mocks.MockRoute.__name__,
                      methods=mocks.MockRoute.METHODS + ['OPTIONS'],
                      ctx_allow_unauthenticated=mocks.MockRoute.ALLOW_UNAUTHENTICATED)
     ])
@@ -457,6 +524,7 @@ class TestFeature(unittest.TestCase):
     wrapper.add_route.assert_called_with(
       route.default_function,
       route.path,
+      name=route.__name__,
       methods=route.methods,
       ctx_allow_unauthenticated=route.allow_unauthenticated,
       **route.context
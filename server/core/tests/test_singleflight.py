@@ -0,0 +1,59 @@
+import asyncio
+import subprocess
+import sys
+import unittest
+
+from core.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+
+  async def asyncSetUp(self):
+    self.calls = []
+    self.running = 0
+    self.max_running = 0
+
+  async def work(self, key):
+    self.calls.append(key)
+    self.running += 1
+    self.max_running = max(self.max_running, self.running)
+    await asyncio.sleep(0.01)
+    self.running -= 1
+    return f'result-{key}'
+
+  async def test_coalesces_concurrent_calls(self):
+    flight = SingleFlight('test')
+    results = await asyncio.gather(*[flight.do(key, self.work, key) for key in 'aaab'])
+    self.assertEqual(['result-a', 'result-a', 'result-a', 'result-b'], results)
+    self.assertEqual(['a', 'b'], self.calls)
+
+    # Calls made after the previous one completed run again.
+    await flight.do('a', self.work, 'a')
+    self.assertEqual(['a', 'b', 'a'], self.calls)
+
+  async def test_shares_exceptions(self):
+    async def fail():
+      await asyncio.sleep(0.01)
+      raise ValueError('failed')
+
+    flight = SingleFlight('test')
+    results = await asyncio.gather(
+      flight.do('a', fail), flight.do('a', fail), return_exceptions=True
+    )
+    self.assertEqual([ValueError, ValueError], [type(result) for result in results])
+
+  def test_without_redis(self):
+    # Calls without a Redis lock must work where the redis package is not installed.
+    code = (
+      'import asyncio, sys; sys.modules["redis"] = None; from core import singleflight; '
+      'flight = singleflight.SingleFlight("test"); asyncio.run(flight.do("a", asyncio.sleep, 0))'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+  async def test_redis_lock(self):
+    first, second = SingleFlight('test', redis_lock=True), SingleFlight('test', redis_lock=True)
+    results = await asyncio.gather(first.do('a', self.work, 'a'), second.do('a', self.work, 'b'))
+    # Neither call is coalesced, but they do not overlap.
+    self.assertEqual(['result-a', 'result-b'], results)
+    self.assertEqual(['a', 'b'], sorted(self.calls))
+    self.assertEqual(1, self.max_running)
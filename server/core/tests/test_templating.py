@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from core import templating
+
+
+class TestTemplating(unittest.TestCase):
+
+  def setUp(self):
+    templating.clear()
+    handle, self.path = tempfile.mkstemp(suffix='.html')
+    os.close(handle)
+    self.write('const token = template.context.ACCESS_TOKEN, other = template.context.OTHER;')
+
+  def tearDown(self):
+    templating.clear()
+    os.remove(self.path)
+
+  def write(self, source, mtime=None):
+    with open(self.path, 'w') as template:
+      template.write(source)
+
+    if mtime:
+      os.utime(self.path, (mtime, mtime))
+
+  def test_render(self):
+    template = templating.get_template(self.path)
+    self.assertEqual({'ACCESS_TOKEN', 'OTHER'}, template.keys)
+    self.assertEqual(
+      'const token = "a\\\\b", other = template.context.OTHER;',
+      template.render({'ACCESS_TOKEN': 'a\\b'}),
+    )
+    self.assertEqual(
+      'const token = "", other = {"key": 1};',
+      template.render({'ACCESS_TOKEN': None, 'OTHER': {'key': 1}}),
+    )
+
+  @patch('core.templating.config.is_dev', return_value=False)
+  def test_cached(self, mock_is_dev):
+    template = templating.get_template(self.path)
+    self.write('changed', mtime=template.mtime + 10)
+    self.assertIs(template, templating.get_template(self.path))
+
+  @patch('core.templating.config.is_dev', return_value=True)
+  def test_reloaded_in_dev_mode(self, mock_is_dev):
+    template = templating.get_template(self.path)
+    self.assertIs(template, templating.get_template(self.path))
+
+    self.write('changed template.context.KEY', mtime=template.mtime + 10)
+    self.assertEqual('changed "value"', templating.render(self.path, {'KEY': 'value'}))
@@ -29,7 +29,9 @@ def make_list(val):
 
 
 async def make_request(method, url, params=None, data=None, headers=None):
-  """Makes HTTP Request using AsyncClient inside the application event loop.
+  """Makes HTTP Request using the shared AsyncClient of the application event loop.
+
+  See core.http_client.HTTPClientManager for connection reuse, limits and retries.
 
   Args:
     method (str): The HTTP method for this request.
@@ -41,14 +43,18 @@ async def make_request(method, url, params=None, data=None, headers=None):
   Returns:
     HTTPResponse
   """
-  async with httpx.AsyncClient() as client:
-    response = await client.request(method, url, params=params, data=data, headers=headers)
-    try:
-      response.raise_for_status()
-    except httpx._exceptions.HTTPStatusError as e:
-      raise exceptions.BadRequestError(f'{method} request error to {url}: {e}')
-
-    return response
+  # Imported here, core.config depends on this module.
+  from core.http_client import HTTPClientManager
+
+  response = await HTTPClientManager.request(
+    method, url, params=params, data=data, headers=headers
+  )
+  try:
+    response.raise_for_status()
+  except httpx._exceptions.HTTPStatusError as e:
+    raise exceptions.BadRequestError(f'{method} request error to {url}: {e}')
+
+  return response
 
 
 def get_cors_headers(allow_methods=None, allow_origins=None, allow_headers=None):
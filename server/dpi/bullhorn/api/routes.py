@@ -1,10 +1,8 @@
 from sanic import response
 import json
-import requests
 
+from core.logging import logger
 from core.sanic import Route
-from core.utils import make_request
-from dpi.bullhorn.api.util import get_bhrest_token
 
 from dpi.bullhorn.config import BullhornConfig
 from dpi.bullhorn.api.util import BullhornAction
@@ -24,17 +22,16 @@ class Search(Route):
 
   async def handler(request):
     try:
-      search = request.args.get("search", False)
-      print("SEARCH : {}".format(search))
-
       bhrest_token = request.args.get("bhrest_token", None)
-      if not bhrest_token:
-        bhrest_token = get_bhrest_token()
       bh_access_token = request.args.get("bh_access_token", None)
       bh_action = BullhornAction(request=request, bhrest_token=bhrest_token, access_token=bh_access_token)
 
-      result = bh_action.search_contact()
-      print("RESULT : {}".format(result))
+      stream = request.args.get("stream", None)
+      if stream:
+        await bh_action.stream_search_contact(stream)
+        return
+
+      result = await bh_action.search_contact()
       if result.get('status') == 200:
         return response.json(result, 200)
       elif result.get('status') == 400:
@@ -47,13 +44,19 @@ class Search(Route):
         return response.json(result, 401)
       else:
         return response.json(result, result.get('status'))
+    except ValueError as e:
+      resp = {
+        'message': str(e),
+        'status': 400
+      }
+      return response.json(resp, 400)
     except Exception as e:
       resp = {
         "message": "Internal server error",
         "details": str(e),
         "status": 500
       }
-      print("Expenctions : {}".format(str(e)))
+      logger.error('Contact search failed: {}'.format(e))
       return response.json(resp, 500)
 
 class SampleEndpoint(Route):
@@ -61,7 +64,6 @@ class SampleEndpoint(Route):
     
     async def handler(request):
       try:
-        print("candidate type name : {}".format(bh_config.entity_types['candidate']))
         resp = {
           'data': [
             {
@@ -1,64 +1,40 @@
-import requests
+import asyncio
 import json
 
+from core.logging import logger
+from dpi.bullhorn.client import BullhornClient
 from dpi.bullhorn.config import BullhornConfig
+from dpi.bullhorn.phone_index import normalize_phone
+from dpi.bullhorn.phone_index import phone_index
+from dpi.bullhorn.search_cache import search_cache
+from dpi.bullhorn.session import sessions
 
-def get_bhrest_token():
-    ## Required details to get Authentication code, Access code and BhRestToken
-    client_id = "5166a72d-6ddc-454c-aa35-b287d085be8a"
-    client_secret = "QLcu3T9vSSB0QXsdkH6KIrfn"
-    username = "dialpad.api"
-    password = "T32F3kv$P!S][TQ1"
-    response_type = "code"
-    action = "Login"
-    state = ""
-    grant_type = "authorization_code"
-    redirect_uri = ""
-    version = "*"
-
-    ## Bullhorn Authentication base-urls
-    get_auth_code_url = "https://auth.bullhornstaffing.com/oauth/authorize"
-    get_access_token_url = "https://auth.bullhornstaffing.com/oauth/token"
-    get_bhrest_token_url = "https://rest.bullhornstaffing.com/rest-services/login"
-
-    ## Request to get Authentication code
-    get_auth_code_url += "?client_id={}&password={}&username={}&action={}&response_type={}".format(client_id, password, username, action, response_type)
-    auth_code_resp = requests.get(url=get_auth_code_url, allow_redirects=False)
-    location = auth_code_resp.headers['Location']
-    print("Auth code resp : {}".format(location))
-    from urllib.parse import urlparse
-    parsed_url = urlparse(location)
-    print("Parsed URL : {}".format(parsed_url))
-    print("Code : {}".format(parsed_url.query[5:]))
-    code = parsed_url.query[5:]
-
-    ## Request to get Access Token
-    get_access_token_url += "?client_id={}&client_secret={}&grant_type={}&code={}".format(client_id, client_secret, grant_type, code)
-    access_token_resp = requests.post(url=get_access_token_url)
-    json_resp = json.loads(access_token_resp.text)
-    print("Access Token resp : {}".format(json_resp))
-    access_token = json_resp['access_token']
-
-    ## Request to get BhRestToken
-    get_bhrest_token_url += "?version={}&access_token={}".format(version, access_token)
-    bhrest_token_resp = requests.post(url=get_bhrest_token_url)
-    parsed_resp =  json.loads(bhrest_token_resp.text) 
-    print("BhRestToken resp : {}".format(parsed_resp))
-    bhrest_token = parsed_resp.get('BhRestToken')
-    return bhrest_token
+async def get_bhrest_token():
+    ## Returns the BhRestToken of the shared session, logging in only if it expired
+    client = await sessions.get_client()
+    return client.rest_token
 
 
 
 class BullhornAction():
+    ## Request parameters of the contact search that are not entity fields
+    SEARCH_PARAMS = [
+        'bhrest_token', 'access_token', 'bh_access_token', 'idtoken', 'fields', 'start', 'count', 'stream',
+    ]
+    STREAM_CONTENT_TYPES = {
+        'json': 'application/json',
+        'ndjson': 'application/x-ndjson',
+    }
 
     def __init__(self, request, access_token=None, bhrest_token=None):
         self.request = request
         self.access_token = access_token
         self.bhrest_token = bhrest_token
         self.bh_config = BullhornConfig()
+        ## Without a caller provided BhRestToken, the shared session is used (see BullhornSessionManager)
+        self.client = BullhornClient(access_token=access_token, rest_token=bhrest_token) if bhrest_token else sessions
 
     def build_free_search_query(self, entity_type, search_val):
-        print("\n---------------------- In build_free_search_query() ---------------------\n")
         query = ""
         search_val = search_val.strip()
         for i, field in enumerate(self.bh_config.entity_types.get(entity_type).get('search_query_fields')):
@@ -66,12 +42,9 @@ class BullhornAction():
                 query += "{}:{}*".format(field, search_val)
             else: 
                 query += " OR {}:{}*".format(field, search_val)
-        print("QUERY = {}".format(query))
         return query
 
     def build_auto_search_query(self, params):
-        print("\n----------------------In build_auto_search_query(params = {}) ---------------------\n".format(params))
-        
         query = ""
         i = 0
         for key, val in params.items():
@@ -80,90 +53,212 @@ class BullhornAction():
             else: 
                 query += " AND {}:{}".format(key, val[0])
             i +=1
-        print("AUTO SEARCH QUERY -- = {}".format(query))
         return query
     
-    def make_request(self, url, method, body=dict()):
-        print("\n---------------------- In make_request(url={}, method={}, body={}) ---------------------\n".format(url, method, body))
-        request_resp = None
-        resp = {}
-        if method == "GET":
-            request_resp = requests.get(url)
-        elif method == "POST":
-            request_resp = requests.post(url, data=body)
-        elif method == "PUT":
-            request_resp = requests.put(url, data=body)
-        elif method == "PATCH":
-            request_resp = requests.patch(url, data=body)
+    async def make_request(self, uri, method, params=None, body=None):
+        logger.debug('Bullhorn request: {} {}'.format(method, uri))
+        ## Bullhorn statuses other than 200, 400, 401 and 403 are reported as 500
+        response = await self.client.request(method, uri, params=params, data=body)
+        return response.json()
         
-        if request_resp.status_code == 200:
-            resp.update(json.loads(request_resp.text))
-            resp['status'] = 200
-        elif request_resp.status_code == 400:
-            resp.update(json.loads(request_resp.text))
-            resp['status'] = 400
-        elif request_resp.status_code == 401:
-            resp.update(json.loads(request_resp.text))
-            resp['status'] = 401
-        elif request_resp.status_code == 403:
-            resp.update(json.loads(request_resp.text))
-            resp['status'] = 403
-        else:
-            resp.update(json.loads(request_resp.text))
-            resp['status'] = 500
+    def parse_search_params(self):
+        ## Paging and field projection apply to the search of every entity type, invalid values raise a ValueError
+        args = self.request.args
+        fields = [field.strip() for field in args.get('fields', '').split(',') if field.strip()]
+        ## The id is always returned, it identifies the records
+        self.fields = ['id'] + [field for field in fields if field != 'id'] if fields else None
+        self.start = int(args.get('start', 0))
+        self.count = int(args.get('count')) if args.get('count') else None
+        if self.start < 0:
+            raise ValueError('start must not be negative')
+        if self.count is not None and not 0 < self.count <= self.bh_config.search_max_count:
+            raise ValueError('count must be between 1 and {}'.format(self.bh_config.search_max_count))
+
+    def get_search_fields(self, entity_type):
+        ## Fields requested with the fields parameter override the response_fields of the entity type
+        return self.fields or self.bh_config.entity_types.get(entity_type).get('response_fields')
+
+    async def search_entity(self, entity_type, query, semaphore):
+        ## Searches a single entity type, at most search_concurrency at a time and for at most search_timeout seconds
+        entity = self.bh_config.entity_types.get(entity_type)
+        fields = self.get_search_fields(entity_type)
+        ## Only the searches of the shared session are cached, caller provided sessions may see other records
+        cached = self.client is sessions
+        if cached:
+            resp = await search_cache.get(entity_type, query, fields, self.start, self.count)
+            if resp is not None:
+                return resp
+
+        async with semaphore:
+            response = await asyncio.wait_for(
+                self.client.search(entity.get('name'), query, fields, start=self.start or None, count=self.count),
+                self.bh_config.search_timeout,
+            )
+        resp = response.json()
+        if cached and response.ok:
+            await search_cache.set(entity_type, query, fields, resp, self.start, self.count)
         return resp
-        
-    def search_contact(self):
-        print("\n----------------------In search_contact() ---------------------\n")
+
+    async def lookup_phone_index(self, entity_types, search):
+        ## Returns the results of each entity type from the local phone index, None on a miss
+        fields = self.fields or []
+        indexed_fields = all(
+            set(fields) <= set(self.bh_config.entity_types.get(entity_type).get('response_fields'))
+            for entity_type in entity_types
+        )
+        ## Paged searches and fields the index does not store are sent to Bullhorn
+        if self.start or not indexed_fields:
+            return None
+
+        data = await phone_index.lookup(search)
+        if not data:
+            return None
+
+        results = {}
+        for entity_type in entity_types:
+            records = [rec for rec in data if rec['entity_type'] == entity_type][:self.count]
+            if self.fields:
+                records = [{field: rec.get(field) for field in self.fields} for rec in records]
+            results[entity_type] = {'data': records, 'count': len(records), 'total': len(records), 'status': 200}
+        return results
+
+    @staticmethod
+    def completed_search(resp):
+        ## Returns a search that already has its response, to be iterated with the searches in flight
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(resp)
+        return future
+
+    async def get_searches(self):
+        ## Starts the search of every contact entity type, returns {entity_type: future}
+        self.parse_search_params()
+        entity_types = [key for key, val in self.bh_config.entity_types.items() if val.get('is_contact_entity')]
         search = self.request.args.get("search", False)
-        query = ""
-        
-        entity_types = [key for key,val in self.bh_config.entity_types.items()]
+        if not search:
+            ## The request args are left as they are, the middlewares and routes still read them
+            params = {key: val for key, val in self.request.args.items() if key not in self.SEARCH_PARAMS}
+            auto_search_query = self.build_auto_search_query(params)
+        elif self.bh_config.phone_index_enabled and self.client is sessions and normalize_phone(search):
+            ## Callers are identified with the local phone index, the Bullhorn search is only used on a miss
+            results = await self.lookup_phone_index(entity_types, search)
+            if results:
+                return {entity_type: self.completed_search(resp) for entity_type, resp in results.items()}
+
+        semaphore = asyncio.Semaphore(self.bh_config.search_concurrency)
+        return {
+            entity_type: asyncio.ensure_future(self.search_entity(
+                entity_type,
+                self.build_free_search_query(entity_type, search) if search else auto_search_query,
+                semaphore,
+            ))
+            for entity_type in entity_types
+        }
+
+    def get_search_result(self, entity_type, task):
+        ## Returns the response of a completed search, failures are reported with their status
+        if task.exception() is None:
+            resp = task.result()
+        elif isinstance(task.exception(), asyncio.TimeoutError):
+            resp = {'status': 504, 'errorMessage': 'Search timed out'}
+        else:
+            resp = {'status': 500, 'errorMessage': str(task.exception())}
+        logger.debug('Bullhorn {} search status: {}'.format(entity_type, resp.get('status')))
+
+        if resp.get('status') == 200:
+            for rec in resp.get('data', []):
+                rec['entity_type'] = entity_type
+        return resp
+
+    async def iter_search_results(self, searches):
+        ## Yields (entity_type, response) of each search as soon as it completes
+        entity_types = {task: entity_type for entity_type, task in searches.items()}
+        pending = set(entity_types)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield entity_types[task], self.get_search_result(entity_types[task], task)
+        finally:
+            ## The searches left are not needed anymore if the client went away
+            for task in pending:
+                task.cancel()
+
+    async def search_contact(self):
+        searches = await self.get_searches()
+        results = dict([result async for result in self.iter_search_results(searches)])
+
+        ## Results of the entity types that succeeded are kept, the others are reported in failed_entity_types
         final_response = {
             'data' : list(),
             'count' : 0,
-            'status': None
+            'total': 0,
+            'status': None,
+            'failed_entity_types': {},
         }
-        for entity_type in entity_types:
-            if not self.bh_config.entity_types.get(entity_type).get('is_contact_entity'):
-                continue
-            print("\n***************************** Start Searching for {}s ***************************** ".format(entity_type.capitalize()))
-            if search:
-                query = self.build_free_search_query(entity_type, search)
-            else:
-                params = self.request.args
-                if params.get('bhrest_token'):
-                    del params['bhrest_token']
-                if params.get('access_token'):
-                    del params['access_token']
-                query = self.build_auto_search_query(params)
-                
-            fields = ','.join(self.bh_config.entity_types.get(entity_type).get('response_fields'))
-            url = self.bh_config.rest_base_url+self.bh_config.get_entity_url+"?query={}&fields={}"
-            url = url.format(self.bh_config.entity_types.get(entity_type).get('name'), query, fields)
-            url = url+"&BhRestToken={}".format(self.bhrest_token)
-            print("\nURL : {}".format(url))
-            resp = self.make_request(url, "GET")
-
-            print("REQUEST RESPONSE : {}".format(resp))
-
+        failures = []
+        for entity_type in searches:
+            resp = results[entity_type]
             if resp.get('status') == 200:
-                final_response['status'] = 200 
+                final_response['status'] = 200
+                final_response['total'] = final_response['total'] + resp.get('total', resp.get('count'))
                 if resp.get('count') > 0:
-                    data = resp.get('data')
-                    for rec in data:
-                        rec['entity_type'] = entity_type
-                    final_response['data'].extend(data)
+                    final_response['data'].extend(resp.get('data'))
                     final_response['count'] = final_response['count'] + resp.get('count')
-            elif resp.get('status') == 401 or resp.get('status') == 403:
-                final_response = resp
-                break
             else:
-                final_response = resp
-            print("******************************** End Search for {}'s ******************************\n".format(entity_type.capitalize()))
-            print("\nTotal Response : {}\n".format(final_response))
+                failures.append(resp)
+                final_response['failed_entity_types'][entity_type] = {
+                    'status': resp.get('status'),
+                    'message': resp.get('errorMessage'),
+                }
+
+        if final_response['status'] is None and failures:
+            ## Every search failed, authentication failures take precedence over the other errors
+            failure = next((f for f in failures if f.get('status') in (401, 403)), failures[0])
+            final_response.update(failure)
         return final_response
 
+    async def stream_search_contact(self, mode):
+        ## Sends the records of each entity type as soon as its search completes, as a JSON object shaped like
+        ## the search_contact response or as one NDJSON line per entity type. The status is sent first, so it
+        ## is 200 and failures are only reported in failed_entity_types (or in the lines of the entity types).
+        if mode not in self.STREAM_CONTENT_TYPES:
+            raise ValueError('stream must be one of {}'.format(', '.join(self.STREAM_CONTENT_TYPES)))
+
+        searches = await self.get_searches()
+        response = await self.request.respond(content_type=self.STREAM_CONTENT_TYPES[mode])
+        summary = {'count': 0, 'total': 0, 'status': 200, 'failed_entity_types': {}}
+        if mode == 'json':
+            await response.send('{"data": [')
+
+        separator = ''
+        try:
+            async for entity_type, resp in self.iter_search_results(searches):
+                if mode == 'ndjson':
+                    await response.send(json.dumps({'entity_type': entity_type, **resp}) + '\n')
+                elif resp.get('status') == 200 and resp.get('data'):
+                    await response.send(separator + ', '.join(json.dumps(rec) for rec in resp.get('data')))
+                    separator = ', '
+
+                if resp.get('status') == 200:
+                    summary['count'] = summary['count'] + resp.get('count')
+                    summary['total'] = summary['total'] + resp.get('total', resp.get('count'))
+                else:
+                    summary['failed_entity_types'][entity_type] = {
+                        'status': resp.get('status'),
+                        'message': resp.get('errorMessage'),
+                    }
+        except Exception as e:
+            ## The 200 status is already sent, the failure ends the stream as an error line or in the summary
+            logger.error('Contact search stream failed: {}'.format(e))
+            error = {'status': 500, 'errorMessage': 'Internal server error', 'details': str(e)}
+            if mode == 'ndjson':
+                await response.send(json.dumps(error) + '\n')
+            summary.update(error)
+
+        if mode == 'json':
+            await response.send('], ' + json.dumps(summary)[1:])
+        await response.eof()
+
 
     def create_contact(self):
         pass
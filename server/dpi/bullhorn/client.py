@@ -1,24 +1,146 @@
-from core.utils import make_request
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+from core.http_client import HTTPClientManager
+from dpi.bullhorn.config import BullhornConfig
+from dpi.bullhorn.search_cache import search_cache
+
+
+bh_config = BullhornConfig()
+
+
+def search_params(query, fields, start=None, count=None):
+  """Returns the parameters of a search request, see BullhornClient.search."""
+  params = {'query': query, 'fields': ','.join(fields)}
+  if start is not None:
+    params['start'] = start
+  if count is not None:
+    params['count'] = count
+
+  return params
+
+
+class BullhornResponse:
+  """A Bullhorn REST API response.
+
+  Attributes:
+    status_code (int): The HTTP status code returned by Bullhorn.
+    status (int): The status reported to the callers, 200, 400, 401 and 403 are kept as they are,
+      any other status is reported as 500.
+    data (dict): The decoded JSON body.
+  """
+  STATUSES = frozenset([200, 400, 401, 403])
+
+  def __init__(self, status_code, data):
+    self.status_code = status_code
+    self.status = status_code if status_code in self.STATUSES else 500
+    self.data = data
+
+  @classmethod
+  def from_httpx(cls, response):
+    try:
+      data = response.json()
+    except ValueError:
+      data = {'errorMessage': response.text}
+
+    return cls(response.status_code, data)
+
+  @property
+  def ok(self):
+    return self.status == 200
+
+  def json(self):
+    """Returns the body with its reported status under the 'status' key."""
+    return {**self.data, 'status': self.status}
 
 
 class BullhornClient:
+  """The async entry point to the Bullhorn REST API.
 
-  def __init__(self, access_token):
+  Requests are sent with the shared HTTP client (see core.http_client), so they reuse pooled
+  connections and do not block the event loop.
+
+  Attributes:
+    access_token (str): The OAuth access token of the API user, used to log in.
+    rest_token (str): The BhRestToken of the REST session.
+    rest_url (str): The base url of the REST session.
+  """
+
+  def __init__(self, access_token=None, rest_token=None, rest_url=None):
     self.access_token = access_token
-    self.login_url = (
-      'https://rest.bullhornstaffing.com/rest-services/login'
-      f'?version=*&access_token={self.access_token}'
-    )
-    self.rest_url = None
+    self.rest_token = rest_token
+    self.rest_url = rest_url or bh_config.rest_base_url
+
+  @staticmethod
+  async def authorize():
+    """Returns an access token of the API user, through the OAuth authorization code flow."""
+    response = await HTTPClientManager.request('GET', bh_config.auth_code_url, params={
+      'client_id': bh_config.client_id,
+      'username': bh_config.username,
+      'password': bh_config.password,
+      'action': 'Login',
+      'response_type': 'code',
+    })
+    code = parse_qs(urlparse(response.headers['Location']).query)['code'][0]
+    response = await HTTPClientManager.request('POST', bh_config.access_token_url, params={
+      'client_id': bh_config.client_id,
+      'client_secret': bh_config.client_secret,
+      'grant_type': 'authorization_code',
+      'code': code,
+    })
+    return response.json()['access_token']
+
+  async def login(self, ttl=None):
+    """Opens a REST session, authorizing the API user first if there is no access token.
+
+    Args:
+      ttl (int): The idle lifetime of the session in seconds, Bullhorn's default if not given.
+    """
+    if not self.access_token:
+      self.access_token = await self.authorize()
+
+    params = {'version': '*', 'access_token': self.access_token}
+    if ttl:
+      # Bullhorn takes the session lifetime in minutes.
+      params['ttl'] = max(1, ttl // 60)
 
-  async def login(self):
-    response = await make_request('POST', self.login_url)
+    response = await HTTPClientManager.request('POST', bh_config.login_url, params=params)
     response_json = response.json()
-    self.rest_token = response_json['BhRestToken']
-    self.rest_url = response_json['restUrl']
-
-  async def make_request(self, method, uri, params=None, data=None, headers=None):
-    url = f'{self.rest_url}{uri}'
-    params = params or {}
-    params.update({'BhRestToken={self.rest_token}'})
-    return await make_request(method, url, params=params, data=data, headers=headers)
+    self.rest_token = response_json.get('BhRestToken')
+    self.rest_url = response_json.get('restUrl', self.rest_url)
+    return self
+
+  async def request(self, method, uri, params=None, data=None):
+    """Sends a request to the REST API.
+
+    Args:
+      method (str): The HTTP method for this request.
+      uri (str): The url of the resource, relative to the REST url.
+      params (dict): The request parameters, the BhRestToken is added to them.
+      data (dict): The body of the request.
+
+    Returns:
+      BullhornResponse
+    """
+    params = {**(params or {}), 'BhRestToken': self.rest_token}
+    response = await HTTPClientManager.request(
+      method, f'{self.rest_url}{uri}', params=params, data=data
+    )
+    # Entities created or updated through this client must not be hidden by cached searches.
+    if method.upper() != 'GET' and uri.startswith('entity/'):
+      await search_cache.invalidate_entity_name(uri.split('/')[1])
+
+    return BullhornResponse.from_httpx(response)
+
+  async def search(self, entity_name, query, fields, start=None, count=None):
+    """Searches the entities of the given type matching the Lucene query.
+
+    Args:
+      entity_name (str): The Bullhorn name of the entity type.
+      query (str): The Lucene query.
+      fields (list<str>): The fields of the records returned.
+      start (int): The index of the first record returned, 0 if not given.
+      count (int): The number of records returned, Bullhorn's default if not given.
+    """
+    params = search_params(query, fields, start=start, count=count)
+    return await self.request('GET', bh_config.get_entity_url.format(entity_name), params=params)
@@ -1,3 +1,4 @@
+from core import utils
 
 
 class BullhornConfig():
@@ -7,24 +8,28 @@ class BullhornConfig():
             "name": 'Lead',
             "search_query_fields": ['firstName', 'lastName', 'name', 'email', 'phone'],
             "response_fields": ['id', 'firstName', 'lastName', 'name', 'email', 'phone'],
+            "phone_fields": ['phone', 'mobile', 'phone2', 'phone3', 'workPhone'],
         },
         'candidate' : {
             "is_contact_entity": True,
             "name": 'Candidate',
             "search_query_fields": ['firstName', 'lastName', 'name', 'email', 'phone'],
             "response_fields": ['id', 'firstName', 'lastName', 'name', 'email', 'phone'],
+            "phone_fields": ['phone', 'mobile', 'phone2', 'phone3', 'workPhone'],
         },
         'company' : {
             "is_contact_entity": True,
             "name": 'ClientCorporation', 
             "search_query_fields": ['name',  'phone'],
             "response_fields": ['id','name',  'phone'],
+            "phone_fields": ['phone'],
         },
         'contact' : {
             "is_contact_entity": True,
             "name": 'ClientContact',
             "search_query_fields": ['firstName', 'lastName', 'name', 'email', 'phone'],
             "response_fields": ['id', 'firstName', 'lastName', 'name', 'email', 'phone'],
+            "phone_fields": ['phone', 'mobile', 'phone2', 'phone3', 'workPhone'],
         },
         'note' : {
             "is_contact_entity": False,
@@ -40,6 +45,41 @@ class BullhornConfig():
         }
     }
 
+    ## Bullhorn API user credentials and authentication urls
+    client_id = utils.getenv('BULLHORN_CLIENT_ID')
+    client_secret = utils.getenv('BULLHORN_CLIENT_SECRET')
+    username = utils.getenv('BULLHORN_USERNAME')
+    password = utils.getenv('BULLHORN_PASSWORD')
+    auth_code_url = "https://auth.bullhornstaffing.com/oauth/authorize"
+    access_token_url = "https://auth.bullhornstaffing.com/oauth/token"
+    login_url = "https://rest.bullhornstaffing.com/rest-services/login"
+
+    ## REST sessions are shared and logged in again session_refresh_margin seconds before they expire
+    session_ttl = int(utils.getenv('BULLHORN_SESSION_TTL', default=600))
+    session_refresh_margin = int(utils.getenv('BULLHORN_SESSION_REFRESH_MARGIN', default=60))
+
+    ## Contact entity types are searched concurrently, search_concurrency at a time
+    search_concurrency = int(utils.getenv('BULLHORN_SEARCH_CONCURRENCY', default=4))
+    search_timeout = float(utils.getenv('BULLHORN_SEARCH_TIMEOUT', default=5))
+    search_max_count = int(utils.getenv('BULLHORN_SEARCH_MAX_COUNT', default=500))
+
+    ## Search results are cached for search_cache_ttl seconds, empty results for search_cache_negative_ttl seconds
+    search_cache_size = int(utils.getenv('BULLHORN_SEARCH_CACHE_SIZE', default=10000))
+    search_cache_ttl = int(utils.getenv('BULLHORN_SEARCH_CACHE_TTL', default=30))
+    search_cache_negative_ttl = int(utils.getenv('BULLHORN_SEARCH_CACHE_NEGATIVE_TTL', default=10))
+    ## Shares the cached searches and their invalidations between workers through Redis
+    search_cache_redis = bool(int(utils.getenv('BULLHORN_SEARCH_CACHE_REDIS', default=0)))
+
+    ## Callers are identified with the local phone index (see PhoneIndex), synced every phone_index_sync_interval seconds
+    phone_index_enabled = bool(int(utils.getenv('BULLHORN_PHONE_INDEX', default=0)))
+    phone_index_sync_interval = int(utils.getenv('BULLHORN_PHONE_INDEX_SYNC_INTERVAL', default=300))
+    phone_index_sync_overlap = int(utils.getenv('BULLHORN_PHONE_INDEX_SYNC_OVERLAP', default=60))
+    ## A sync holds its lock for at most phone_index_sync_lock_timeout seconds, full exports take longer than the interval
+    phone_index_sync_lock_timeout = int(utils.getenv('BULLHORN_PHONE_INDEX_SYNC_LOCK_TIMEOUT', default=3600))
+    phone_index_page_size = int(utils.getenv('BULLHORN_PHONE_INDEX_PAGE_SIZE', default=500))
+    default_country_code = utils.getenv('BULLHORN_DEFAULT_COUNTRY_CODE', default="1")
+    national_number_length = int(utils.getenv('BULLHORN_NATIONAL_NUMBER_LENGTH', default=10))
+
     rest_base_url = "https://rest91.bullhornstaffing.com/rest-services/9rsl1s/"
     get_entity_url = "search/{}"
     get_entity_by_id_url = "entity/{}/{}"
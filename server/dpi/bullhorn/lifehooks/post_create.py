@@ -0,0 +1,36 @@
+import asyncio
+
+from core.logging import logger
+from core.sanic import Application
+
+from dpi.bullhorn.config import BullhornConfig
+from dpi.bullhorn.phone_index import phone_index
+from dpi.bullhorn.session import sessions
+
+
+bh_config = BullhornConfig()
+
+
+async def sync_phone_index():
+  """Keeps the phone index in sync with Bullhorn, every phone_index_sync_interval seconds."""
+  while True:
+    try:
+      await phone_index.sync_all(sessions)
+    except Exception as e:
+      logger.warning(f'Could not sync the Bullhorn phone index: {e}')
+
+    await asyncio.sleep(bh_config.phone_index_sync_interval)
+
+
+async def start_phone_index_sync(app, loop):
+  app.ctx.bullhorn_phone_index_sync = asyncio.ensure_future(sync_phone_index())
+
+
+async def stop_phone_index_sync(app, loop):
+  app.ctx.bullhorn_phone_index_sync.cancel()
+
+
+if bh_config.phone_index_enabled:
+  app = Application.root.wrapper
+  app.register_listener(start_phone_index_sync, 'after_server_start')
+  app.register_listener(stop_phone_index_sync, 'before_server_stop')
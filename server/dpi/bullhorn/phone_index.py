@@ -0,0 +1,241 @@
+import datetime
+import json
+import re
+
+from core import config
+from core import exceptions
+from core.logging import logger
+from core.singleflight import SingleFlight
+from dpi.bullhorn.config import BullhornConfig
+
+
+bh_config = BullhornConfig()
+
+# E.164 numbers have at most 15 digits, shorter than 7 digits are extensions or short codes.
+MIN_DIGITS = 7
+MAX_DIGITS = 15
+PHONE_PATTERN = re.compile(r'^\+?[\d\s().\-/]+$')
+SYNC_TIME_FORMAT = '%Y%m%d%H%M%S'
+
+
+def normalize_phone(value, country_code=None):
+  """Returns the phone number in E.164 format, None if it does not look like a phone number.
+
+  Numbers starting with + or 00 are international, national numbers get the country code. A
+  national number that already starts with the country code is kept as it is.
+
+  Args:
+    value (str): The phone number, as typed in Bullhorn or sent by Dialpad.
+    country_code (str): The country calling code of national numbers, default_country_code if not
+      given.
+  """
+  if value is None:
+    return None
+
+  value = str(value).strip()
+  if not PHONE_PATTERN.match(value):
+    return None
+
+  country_code = country_code or bh_config.default_country_code
+  digits = re.sub(r'\D', '', value)
+  if value.startswith('+'):
+    pass
+  elif digits.startswith('00'):
+    digits = digits[2:]
+  elif not (digits.startswith(country_code) and len(digits) > bh_config.national_number_length):
+    digits = country_code + digits.lstrip('0')
+
+  if not MIN_DIGITS <= len(digits) <= MAX_DIGITS:
+    return None
+
+  return f'+{digits}'
+
+
+class PhoneIndex:
+  """A reverse lookup index from E.164 phone numbers to Bullhorn contacts, stored in Redis.
+
+  Keys:
+    bullhorn:phone:<e164>: The set of <entity_type>:<id> of the contacts with that number.
+    bullhorn:contact:<entity_type>:<id>: The JSON record of the contact (its response_fields).
+    bullhorn:contact_phones:<entity_type>:<id>: The numbers the contact is indexed under, so that
+      numbers it no longer has are removed when it is indexed again.
+    bullhorn:phone_index:synced_at:<entity_type>: The Bullhorn time of the last sync.
+
+  The index is built by syncing every contact entity type, the first sync exports every record and
+  the following ones only the records modified since the previous sync. Deleted records are not
+  reported by the search API, they are dropped by resetting the index.
+  """
+
+  def __init__(self, prefix='bullhorn'):
+    self.prefix = prefix
+    self._syncs = SingleFlight(
+      'bullhorn_phone_index',
+      redis_lock=bool(config.REDIS_LOCKS),
+      lock_timeout=bh_config.phone_index_sync_lock_timeout,
+    )
+
+  @property
+  def _redis_client(self):
+    # redis is only a dependency of the enabled index, see requirements/dev.txt.
+    from redis import asyncio as aioredis
+    from core.orm.redis_db import RedisDB
+
+    return aioredis.Redis(connection_pool=RedisDB.get_pool())
+
+  def _phone_key(self, phone):
+    return f'{self.prefix}:phone:{phone}'
+
+  def _contact_key(self, contact):
+    return f'{self.prefix}:contact:{contact}'
+
+  def _contact_phones_key(self, contact):
+    return f'{self.prefix}:contact_phones:{contact}'
+
+  def _synced_at_key(self, entity_type):
+    return f'{self.prefix}:phone_index:synced_at:{entity_type}'
+
+  def get_phones(self, entity_type, record):
+    """Returns the normalized phone numbers of the record."""
+    phone_fields = bh_config.entity_types[entity_type].get('phone_fields', [])
+    phones = (normalize_phone(record.get(field)) for field in phone_fields)
+    return {phone for phone in phones if phone}
+
+  async def lookup(self, phone):
+    """Returns the records of the contacts with the phone number, tagged with their entity_type.
+
+    Args:
+      phone (str): The phone number, in any format normalize_phone understands.
+
+    Returns:
+      list<dict>: The records, empty if the number is not indexed.
+    """
+    phone = normalize_phone(phone)
+    if not phone:
+      return []
+
+    client = self._redis_client
+    contacts = sorted(await client.smembers(self._phone_key(phone)))
+    if not contacts:
+      return []
+
+    records = await client.mget([self._contact_key(contact) for contact in contacts])
+    return [
+      {**json.loads(record), 'entity_type': contact.split(':')[0]}
+      for contact, record in zip(contacts, records)
+      if record
+    ]
+
+  async def index_contacts(self, entity_type, records):
+    """Indexes the records of the entity type under their current phone numbers.
+
+    Args:
+      entity_type (str): The entity type of the records, a key of BullhornConfig.entity_types.
+      records (list<dict>): The Bullhorn records, with their id and phone_fields.
+    """
+    if not records:
+      return
+
+    client = self._redis_client
+    fields = bh_config.entity_types[entity_type]['response_fields']
+    contacts = [f"{entity_type}:{record['id']}" for record in records]
+    async with client.pipeline(transaction=False) as pipeline:
+      for contact in contacts:
+        pipeline.smembers(self._contact_phones_key(contact))
+      previous_phones = await pipeline.execute()
+
+    async with client.pipeline(transaction=True) as pipeline:
+      for contact, record, previous in zip(contacts, records, previous_phones):
+        phones = self.get_phones(entity_type, record)
+        for phone in previous - phones:
+          pipeline.srem(self._phone_key(phone), contact)
+        for phone in phones:
+          pipeline.sadd(self._phone_key(phone), contact)
+
+        pipeline.delete(self._contact_phones_key(contact))
+        if phones:
+          pipeline.sadd(self._contact_phones_key(contact), *phones)
+          pipeline.set(
+            self._contact_key(contact),
+            json.dumps({field: record.get(field) for field in fields}),
+          )
+        else:
+          pipeline.delete(self._contact_key(contact))
+
+      await pipeline.execute()
+
+  async def remove_contact(self, entity_type, id):
+    """Removes the contact from the index."""
+    client = self._redis_client
+    contact = f'{entity_type}:{id}'
+    phones = await client.smembers(self._contact_phones_key(contact))
+    async with client.pipeline(transaction=True) as pipeline:
+      for phone in phones:
+        pipeline.srem(self._phone_key(phone), contact)
+      pipeline.delete(self._contact_phones_key(contact), self._contact_key(contact))
+      await pipeline.execute()
+
+  async def _sync(self, client, entity_type, full=False):
+    entity = bh_config.entity_types[entity_type]
+    fields = sorted(
+      set(entity['response_fields']) | set(entity.get('phone_fields', [])) | {'id'}
+    )
+    redis_client = self._redis_client
+    synced_at = None if full else await redis_client.get(self._synced_at_key(entity_type))
+    # Records modified while the previous sync was running are exported again.
+    started_at = datetime.datetime.utcnow() - datetime.timedelta(
+      seconds=bh_config.phone_index_sync_overlap
+    )
+    query = f'dateLastModified:[{synced_at} TO *]' if synced_at else 'id:[0 TO *]'
+
+    start = 0
+    while True:
+      response = await client.search(
+        entity['name'], query, fields, start=start, count=bh_config.phone_index_page_size
+      )
+      if not response.ok:
+        raise exceptions.ServiceUnavailable(
+          f"Could not export {entity['name']}: {response.data.get('errorMessage')}"
+        )
+
+      records = response.data.get('data', [])
+      await self.index_contacts(entity_type, records)
+      start += len(records)
+      if not records or start >= response.data.get('total', 0):
+        break
+
+    await redis_client.set(self._synced_at_key(entity_type), started_at.strftime(SYNC_TIME_FORMAT))
+    logger.info(f'Indexed the phone numbers of {start} {entity_type} records')
+    return start
+
+  async def sync(self, client, entity_type, full=False):
+    """Indexes the records of the entity type modified since the last sync, all of them if full.
+
+    Syncs of the same entity type do not overlap, across workers too with REDIS_LOCKS. The lock is
+    held for at most phone_index_sync_lock_timeout seconds.
+
+    Args:
+      client (BullhornClient|BullhornSessionManager): The client the records are exported with.
+      entity_type (str): A contact entity type, a key of BullhornConfig.entity_types.
+      full (bool): Whether or not to export every record, even if the entity type was synced.
+
+    Returns:
+      int: The number of records indexed.
+    """
+    return await self._syncs.do(entity_type, self._sync, client, entity_type, full=full)
+
+  async def sync_all(self, client, full=False):
+    """Syncs every contact entity type, see sync."""
+    for entity_type, entity in bh_config.entity_types.items():
+      if entity.get('is_contact_entity'):
+        await self.sync(client, entity_type, full=full)
+
+  async def reset(self):
+    """Deletes the whole index, the next sync exports every record again."""
+    client = self._redis_client
+    keys = [key async for key in client.scan_iter(match=f'{self.prefix}:phone*')]
+    keys += [key async for key in client.scan_iter(match=f'{self.prefix}:contact*')]
+    if keys:
+      await client.delete(*keys)
+
+
+phone_index = PhoneIndex()
@@ -0,0 +1,95 @@
+import collections
+import re
+
+from core import cache
+from dpi.bullhorn.config import BullhornConfig
+
+
+bh_config = BullhornConfig()
+
+# The value of a field:value term, Bullhorn matches values regardless of their case.
+TERM_VALUE_PATTERN = re.compile(r'(\w+):(\S+)')
+
+
+class SearchCache:
+  """Caches Bullhorn search responses by entity type, normalized query, field set and page.
+
+  Queries are normalized by collapsing their whitespace and lowercasing the values of their
+  terms, field names and operators are case sensitive.
+
+  Empty results are cached for search_cache_negative_ttl seconds only, so that new contacts show
+  up quickly. Invalidating an entity type bumps its generation, which is part of the keys, so its
+  previous entries are never read again and age out of the LRU cache.
+
+  The cache and the generations are per process, unless search_cache_redis is set: the entries are
+  then shared through Redis too and the generations are kept in Redis, under
+  bullhorn:search_gen:<entity_type>, so that an invalidation is seen by every worker.
+  """
+
+  def __init__(self, name='bullhorn_search', redis=bh_config.search_cache_redis):
+    self.redis = redis
+    self._cache = cache.get_cache(
+      name, max_size=bh_config.search_cache_size, ttl=bh_config.search_cache_ttl, redis=redis
+    )
+    self._generations = collections.Counter()
+
+  @property
+  def _redis_client(self):
+    # redis is only a dependency of the shared cache, see requirements/dev.txt.
+    from redis import asyncio as aioredis
+    from core.orm.redis_db import RedisDB
+
+    return aioredis.Redis(connection_pool=RedisDB.get_pool())
+
+  @staticmethod
+  def _generation_key(entity_type):
+    return f'bullhorn:search_gen:{entity_type}'
+
+  async def _generation(self, entity_type):
+    if not self.redis:
+      return self._generations[entity_type]
+
+    return int(await self._redis_client.get(self._generation_key(entity_type)) or 0)
+
+  async def _key(self, entity_type, query, fields, start, count):
+    generation = await self._generation(entity_type)
+    normalized_query = TERM_VALUE_PATTERN.sub(
+      lambda match: f'{match[1]}:{match[2].lower()}', ' '.join(query.split())
+    )
+    page = f'{start or 0}:{count or ""}'
+    return f"{entity_type}:{generation}:{','.join(sorted(fields))}:{page}:{normalized_query}"
+
+  async def get(self, entity_type, query, fields, start=None, count=None):
+    """Returns the cached response of the search, None if it is not cached."""
+    return await self._cache.get(await self._key(entity_type, query, fields, start, count))
+
+  async def set(self, entity_type, query, fields, response, start=None, count=None):
+    """Caches the response of a successful search."""
+    ttl = bh_config.search_cache_ttl
+    if not response.get('count'):
+      ttl = bh_config.search_cache_negative_ttl
+
+    key = await self._key(entity_type, query, fields, start, count)
+    await self._cache.set(key, response, ttl=ttl)
+
+  async def invalidate(self, entity_type=None):
+    """Invalidates the cached searches of the entity type, of every entity type if not given."""
+    entity_types = [entity_type] if entity_type else list(bh_config.entity_types)
+    if not self.redis:
+      for entity_type in entity_types:
+        self._generations[entity_type] += 1
+      return
+
+    async with self._redis_client.pipeline(transaction=False) as pipeline:
+      for entity_type in entity_types:
+        pipeline.incr(self._generation_key(entity_type))
+      await pipeline.execute()
+
+  async def invalidate_entity_name(self, entity_name):
+    """Invalidates the cached searches of the entity type with the given Bullhorn name."""
+    for entity_type, entity in bh_config.entity_types.items():
+      if entity['name'] == entity_name:
+        await self.invalidate(entity_type)
+
+
+search_cache = SearchCache()
@@ -0,0 +1,79 @@
+import time
+
+from core import exceptions
+from core.logging import logger
+from core.singleflight import SingleFlight
+from dpi.bullhorn.client import BullhornClient
+from dpi.bullhorn.client import search_params
+from dpi.bullhorn.config import BullhornConfig
+
+
+bh_config = BullhornConfig()
+
+
+class BullhornSessionManager:
+  """Shares one logged in Bullhorn REST session between the requests of the process.
+
+  The session is opened on first use and opened again in the background once it is older than
+  session_ttl - session_refresh_margin seconds, the current session is used until then. Concurrent
+  logins share one login. Requests answered with a 401 are sent once more with a new session.
+
+  It has the request and search methods of BullhornClient, so it can be used in its place.
+  """
+
+  def __init__(self, ttl=bh_config.session_ttl, refresh_margin=bh_config.session_refresh_margin):
+    self.ttl = ttl
+    self.refresh_margin = refresh_margin
+    self._client = None
+    self._logged_in_at = None
+    self._logins = SingleFlight('bullhorn_session')
+
+  async def _login(self):
+    client = await BullhornClient().login(ttl=self.ttl)
+    if not client.rest_token:
+      raise exceptions.ServiceUnavailable('Could not log in to Bullhorn')
+
+    self._client, self._logged_in_at = client, time.monotonic()
+    return client
+
+  def _log_refresh_error(self, task):
+    if not task.cancelled() and task.exception():
+      logger.warning(f'Could not refresh the Bullhorn session: {task.exception()}')
+
+  async def get_client(self):
+    """Returns the BullhornClient of the current session, logging in if there is none."""
+    if self._client is None:
+      return await self._logins.do('login', self._login)
+
+    age = time.monotonic() - self._logged_in_at
+    if age >= self.ttl:
+      return await self._logins.do('login', self._login)
+
+    if age >= self.ttl - self.refresh_margin:
+      self._logins.start('login', self._login).add_done_callback(self._log_refresh_error)
+
+    return self._client
+
+  def invalidate(self, client=None):
+    """Drops the current session, only if it is the session of the given client if one is given."""
+    if client is None or client is self._client:
+      self._client = None
+
+  async def request(self, method, uri, params=None, data=None):
+    """Sends a request with the current session, see BullhornClient.request."""
+    client = await self.get_client()
+    response = await client.request(method, uri, params=params, data=data)
+    if response.status_code == 401:
+      self.invalidate(client)
+      client = await self.get_client()
+      response = await client.request(method, uri, params=params, data=data)
+
+    return response
+
+  async def search(self, entity_name, query, fields, start=None, count=None):
+    """Searches the entities of the given type, see BullhornClient.search."""
+    params = search_params(query, fields, start=start, count=count)
+    return await self.request('GET', bh_config.get_entity_url.format(entity_name), params=params)
+
+
+sessions = BullhornSessionManager()
@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from core.http_client import HTTPClientManager
+from dpi.bullhorn.client import BullhornClient
+from dpi.bullhorn.client import BullhornResponse
+from dpi.bullhorn.config import BullhornConfig
+from dpi.bullhorn.search_cache import search_cache
+
+
+bh_config = BullhornConfig()
+REST_URL = 'https://rest.bullhorn.test/rest-services/abc/'
+
+
+class TestBullhornResponse(unittest.TestCase):
+
+  def test_status_mapping(self):
+    for status_code in [200, 400, 401, 403]:
+      self.assertEqual(status_code, BullhornResponse(status_code, {}).status)
+
+    for status_code in [301, 404, 429, 500, 503]:
+      response = BullhornResponse(status_code, {})
+      self.assertEqual(status_code, response.status_code)
+      self.assertEqual(500, response.status)
+
+    self.assertTrue(BullhornResponse(200, {}).ok)
+    self.assertFalse(BullhornResponse(401, {}).ok)
+    self.assertEqual({'total': 0, 'status': 500}, BullhornResponse(404, {'total': 0}).json())
+
+  def test_from_httpx(self):
+    response = BullhornResponse.from_httpx(httpx.Response(200, json={'total': 1}))
+    self.assertEqual({'total': 1}, response.data)
+
+    response = BullhornResponse.from_httpx(httpx.Response(502, text='Bad Gateway'))
+    self.assertEqual(500, response.status)
+    self.assertEqual({'errorMessage': 'Bad Gateway'}, response.data)
+
+
+class TestBullhornClient(unittest.IsolatedAsyncioTestCase):
+
+  def setUp(self):
+    self.responses = []
+    self.requests = []
+    client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+    patcher = patch.object(HTTPClientManager, '_create_client', return_value=client)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  async def asyncTearDown(self):
+    await HTTPClientManager.close()
+
+  def handle(self, request):
+    self.requests.append(request)
+    status_code, data = self.responses.pop(0)
+    return httpx.Response(status_code, json=data)
+
+  async def test_login(self):
+    self.responses = [(200, {'BhRestToken': 'token', 'restUrl': REST_URL})]
+    client = await BullhornClient(access_token='access').login(ttl=600)
+    self.assertEqual('token', client.rest_token)
+    self.assertEqual(REST_URL, client.rest_url)
+
+    request = self.requests[0]
+    self.assertEqual('POST', request.method)
+    self.assertTrue(str(request.url).startswith(bh_config.login_url))
+    self.assertEqual('access', request.url.params['access_token'])
+    self.assertEqual('10', request.url.params['ttl'])
+
+  async def test_request(self):
+    self.responses = [(200, {'data': {'id': 1}}), (404, {'errorMessage': 'Not found'})]
+    client = BullhornClient(rest_token='token', rest_url=REST_URL)
+    response = await client.request('GET', 'entity/Candidate/1', params={'fields': 'id'})
+    self.assertTrue(response.ok)
+    self.assertEqual({'data': {'id': 1}}, response.data)
+    url = self.requests[0].url
+    self.assertEqual(f'{REST_URL}entity/Candidate/1', str(url.copy_with(query=None)))
+    self.assertEqual({'fields': 'id', 'BhRestToken': 'token'}, dict(url.params))
+
+    response = await client.request('GET', 'entity/Candidate/2')
+    self.assertEqual(404, response.status_code)
+    self.assertEqual(500, response.status)
+    self.assertEqual({'errorMessage': 'Not found', 'status': 500}, response.json())
+
+  async def test_search(self):
+    self.responses = [(200, {'total': 0, 'data': []})]
+    client = BullhornClient(rest_token='token', rest_url=REST_URL)
+    await client.search('Candidate', 'phone:1234', ['id', 'name'], start=0, count=5)
+    self.assertEqual(f'{REST_URL}search/Candidate', str(self.requests[0].url.copy_with(query=None)))
+    self.assertEqual({
+      'query': 'phone:1234',
+      'fields': 'id,name',
+      'start': '0',
+      'count': '5',
+      'BhRestToken': 'token',
+    }, dict(self.requests[0].url.params))
+
+  async def test_writes_invalidate_searches(self):
+    self.responses = [(200, {'total': 0}), (200, {'changedEntityId': 1})]
+    client = BullhornClient(rest_token='token', rest_url=REST_URL)
+    with patch.object(search_cache, 'invalidate_entity_name') as invalidate_entity_name:
+      await client.request('GET', 'entity/Candidate/1')
+      invalidate_entity_name.assert_not_called()
+
+      await client.request('PUT', 'entity/Candidate', data={'firstName': 'Jane'})
+      invalidate_entity_name.assert_called_once_with('Candidate')
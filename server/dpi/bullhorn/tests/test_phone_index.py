@@ -0,0 +1,174 @@
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from core import config
+from core import exceptions
+from dpi.bullhorn.client import BullhornResponse
+from dpi.bullhorn.config import BullhornConfig
+from dpi.bullhorn.phone_index import PhoneIndex
+from dpi.bullhorn.phone_index import normalize_phone
+
+
+class TestNormalizePhone(unittest.TestCase):
+
+  def test_national_numbers(self):
+    self.assertEqual('+14155550100', normalize_phone('(415) 555-0100'))
+    self.assertEqual('+14155550100', normalize_phone('415.555.0100'))
+    self.assertEqual('+442079460958', normalize_phone('020 7946 0958', country_code='44'))
+
+  def test_national_numbers_with_country_code(self):
+    self.assertEqual('+14155550100', normalize_phone('14155550100'))
+    self.assertEqual('+14155550100', normalize_phone('1 (415) 555-0100'))
+    # A national number that only starts with the digits of the country code gets it.
+    self.assertEqual('+11005550100', normalize_phone('1005550100'))
+
+  def test_international_numbers(self):
+    self.assertEqual('+442079460958', normalize_phone('+44 20 7946 0958'))
+    self.assertEqual('+442079460958', normalize_phone('0044 20 7946 0958'))
+
+  def test_length_bounds(self):
+    self.assertEqual('+1234567', normalize_phone('+123 4567'))
+    self.assertIsNone(normalize_phone('+123 456'))
+    self.assertEqual('+123456789012345', normalize_phone('+123 456 789 012 345'))
+    self.assertIsNone(normalize_phone('+123 456 789 012 3456'))
+
+  def test_not_phone_numbers(self):
+    for value in [None, '', '   ', 'Jane Doe', 'jane@example.com', '415-555-0100 ext 12', '+']:
+      self.assertIsNone(normalize_phone(value), value)
+
+
+class TestDependencies(unittest.TestCase):
+
+  def test_without_redis(self):
+    # The search imports the phone index, even when it is not enabled.
+    code = 'import sys; sys.modules["redis"] = None; import dpi.bullhorn.api.util'
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+class TestPhoneIndex(unittest.IsolatedAsyncioTestCase):
+
+  async def asyncSetUp(self):
+    self.phone_index = PhoneIndex(prefix='test_bullhorn')
+    await self.phone_index.reset()
+
+  async def asyncTearDown(self):
+    await self.phone_index.reset()
+
+  async def lookup_names(self, phone):
+    return [rec['name'] for rec in await self.phone_index.lookup(phone)]
+
+  def test_sync_lock(self):
+    self.assertEqual(bool(config.REDIS_LOCKS), self.phone_index._syncs.redis_lock)
+    self.assertEqual(
+      BullhornConfig.phone_index_sync_lock_timeout, self.phone_index._syncs.lock_timeout
+    )
+    self.assertGreater(
+      BullhornConfig.phone_index_sync_lock_timeout, BullhornConfig.phone_index_sync_interval
+    )
+
+  async def test_index(self):
+    await self.phone_index.index_contacts('candidate', [
+      {'id': 1, 'firstName': 'Jane', 'phone': '(415) 555-0100', 'mobile': '415 555 0101', 'x': 1},
+      {'id': 2, 'firstName': 'John', 'phone': '415-555-0100'},
+      {'id': 3, 'firstName': 'Nobody', 'phone': 'unknown'},
+    ])
+    await self.phone_index.index_contacts('company', [
+      {'id': 1, 'name': 'Acme', 'phone': '4155550100'},
+    ])
+
+    records = await self.phone_index.lookup('+1 415 555 0100')
+    self.assertEqual(['candidate', 'candidate', 'company'], [rec['entity_type'] for rec in records])
+    self.assertEqual({
+      'id': 1,
+      'firstName': 'Jane',
+      'lastName': None,
+      'name': None,
+      'email': None,
+      'phone': '(415) 555-0100',
+      'entity_type': 'candidate',
+    }, records[0])
+    self.assertEqual([1], [rec['id'] for rec in await self.phone_index.lookup('4155550101')])
+    self.assertEqual([], await self.phone_index.lookup('4155550199'))
+    self.assertEqual([], await self.phone_index.lookup('not a number'))
+
+    client = self.phone_index._redis_client
+    self.assertIsNone(await client.get(self.phone_index._contact_key('candidate:3')))
+
+  async def test_reindex_changed_number(self):
+    await self.phone_index.index_contacts('lead', [
+      {'id': 1, 'name': 'Jane', 'phone': '4155550100', 'mobile': '4155550101'},
+    ])
+    await self.phone_index.index_contacts('lead', [
+      {'id': 1, 'name': 'Jane Doe', 'phone': '4155550102', 'mobile': '4155550101'},
+    ])
+    self.assertEqual([], await self.phone_index.lookup('4155550100'))
+    self.assertEqual(['Jane Doe'], await self.lookup_names('4155550102'))
+    self.assertEqual(['Jane Doe'], await self.lookup_names('4155550101'))
+
+    # A contact without any number anymore is dropped.
+    await self.phone_index.index_contacts('lead', [{'id': 1, 'name': 'Jane Doe', 'phone': None}])
+    self.assertEqual([], await self.phone_index.lookup('4155550101'))
+    self.assertEqual([], await self.phone_index.lookup('4155550102'))
+
+  async def test_remove_contact(self):
+    await self.phone_index.index_contacts('contact', [
+      {'id': 1, 'name': 'Jane', 'phone': '4155550100'},
+      {'id': 2, 'name': 'John', 'phone': '4155550100'},
+    ])
+    await self.phone_index.remove_contact('contact', 1)
+    self.assertEqual(['John'], await self.lookup_names('4155550100'))
+
+    client = self.phone_index._redis_client
+    self.assertEqual(0, await client.exists(
+      self.phone_index._contact_key('contact:1'), self.phone_index._contact_phones_key('contact:1')
+    ))
+
+  async def test_reset(self):
+    await self.phone_index.index_contacts('lead', [
+      {'id': 1, 'name': 'Jane', 'phone': '4155550100'},
+    ])
+    client = self.phone_index._redis_client
+    await client.set(self.phone_index._synced_at_key('lead'), '20260101000000')
+    await client.set('test_bullhorn_other', 1)
+
+    await self.phone_index.reset()
+    self.assertEqual([], await self.phone_index.lookup('4155550100'))
+    self.assertEqual([], [key async for key in client.scan_iter(match='test_bullhorn:*')])
+    self.assertEqual('1', await client.get('test_bullhorn_other'))
+    await client.delete('test_bullhorn_other')
+
+  @patch.object(BullhornConfig, 'phone_index_page_size', 2)
+  async def test_sync(self):
+    pages = [
+      [{'id': 1, 'name': 'Jane', 'phone': '4155550100'}, {'id': 2, 'name': 'John', 'phone': None}],
+      [{'id': 3, 'name': 'Joe', 'phone': '4155550101'}],
+    ]
+    searches = []
+
+    class Client:
+      async def search(self, entity_name, query, fields, start=None, count=None):
+        searches.append((entity_name, query, start, count))
+        data = pages[start // count] if start // count < len(pages) else []
+        return BullhornResponse(200, {'data': data, 'count': len(data), 'total': 3})
+
+    self.assertEqual(3, await self.phone_index.sync(Client(), 'contact'))
+    self.assertEqual(
+      [('ClientContact', 'id:[0 TO *]', 0, 2), ('ClientContact', 'id:[0 TO *]', 2, 2)], searches
+    )
+    self.assertEqual(['Joe'], await self.lookup_names('4155550101'))
+
+    # The next sync only exports the records modified since the previous one.
+    await self.phone_index.sync(Client(), 'contact')
+    self.assertTrue(searches[2][1].startswith('dateLastModified:['))
+
+  async def test_failed_sync(self):
+    class Client:
+      async def search(self, entity_name, query, fields, start=None, count=None):
+        return BullhornResponse(401, {'errorMessage': 'Bad BhRestToken'})
+
+    with self.assertRaises(exceptions.ServiceUnavailable):
+      await self.phone_index.sync(Client(), 'lead')
+    client = self.phone_index._redis_client
+    self.assertIsNone(await client.get(self.phone_index._synced_at_key('lead')))
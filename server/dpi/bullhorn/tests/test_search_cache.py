@@ -0,0 +1,108 @@
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from redis import asyncio as aioredis
+
+from core import cache
+from core.orm.redis_db import RedisDB
+from dpi.bullhorn.config import BullhornConfig
+from dpi.bullhorn.search_cache import SearchCache
+
+
+bh_config = BullhornConfig()
+RESPONSE = {'data': [{'id': 1}], 'count': 1, 'total': 1, 'status': 200}
+
+
+class TestSearchCache(unittest.IsolatedAsyncioTestCase):
+
+  def setUp(self):
+    self.search_cache = SearchCache(name='test_bullhorn_search')
+    self.search_cache._cache.clear()
+
+  async def test_key_normalization(self):
+    await self.search_cache.set('lead', 'name:Jane*  OR phone:1*', ['id', 'name'], RESPONSE)
+    cached = await self.search_cache.get('lead', ' name:jane* OR\tphone:1* ', ['name', 'id'])
+    self.assertEqual(RESPONSE, cached)
+
+    # Field names and operators are not normalized.
+    self.assertIsNone(await self.search_cache.get('lead', 'NAME:jane* OR phone:1*', ['id', 'name']))
+    self.assertIsNone(await self.search_cache.get('lead', 'name:jane* or phone:1*', ['id', 'name']))
+
+    self.assertIsNone(await self.search_cache.get('candidate', 'name:jane* OR phone:1*', ['id']))
+    self.assertIsNone(await self.search_cache.get('lead', 'name:jane* OR phone:1*', ['id']))
+    self.assertIsNone(
+      await self.search_cache.get('lead', 'name:jane* OR phone:1*', ['id', 'name'], count=5)
+    )
+
+  def test_without_redis(self):
+    # The per-process cache must work where the redis package is not installed.
+    code = (
+      'import asyncio, sys; sys.modules["redis"] = None; '
+      'from dpi.bullhorn.search_cache import SearchCache; '
+      'search_cache = SearchCache(name="test_without_redis", redis=False); '
+      'asyncio.run(search_cache.invalidate("lead")); '
+      'asyncio.run(search_cache.set("lead", "name:jane", ["id"], {"count": 1})); '
+      'assert asyncio.run(search_cache.get("lead", "name:Jane", ["id"])) == {"count": 1}'
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+  async def test_pages(self):
+    await self.search_cache.set('lead', 'name:jane*', ['id'], RESPONSE, start=10, count=5)
+    self.assertEqual(RESPONSE, await self.search_cache.get('lead', 'name:jane*', ['id'], 10, 5))
+    self.assertIsNone(await self.search_cache.get('lead', 'name:jane*', ['id'], 0, 5))
+    # The first page is cached under the same key whether or not start is given.
+    await self.search_cache.set('lead', 'name:jane*', ['id'], RESPONSE, start=0)
+    self.assertEqual(RESPONSE, await self.search_cache.get('lead', 'name:jane*', ['id']))
+
+  async def test_negative_ttl(self):
+    with patch.object(self.search_cache._cache, 'set', wraps=self.search_cache._cache.set) as set:
+      await self.search_cache.set('lead', 'name:jane*', ['id'], RESPONSE)
+      self.assertEqual(bh_config.search_cache_ttl, set.call_args.kwargs['ttl'])
+
+      await self.search_cache.set('lead', 'name:john*', ['id'], {'data': [], 'count': 0})
+      self.assertEqual(bh_config.search_cache_negative_ttl, set.call_args.kwargs['ttl'])
+
+  async def test_invalidate(self):
+    await self.search_cache.set('lead', 'name:jane*', ['id'], RESPONSE)
+    await self.search_cache.set('candidate', 'name:jane*', ['id'], RESPONSE)
+
+    await self.search_cache.invalidate_entity_name('Lead')
+    self.assertIsNone(await self.search_cache.get('lead', 'name:jane*', ['id']))
+    self.assertEqual(RESPONSE, await self.search_cache.get('candidate', 'name:jane*', ['id']))
+
+    await self.search_cache.invalidate()
+    self.assertIsNone(await self.search_cache.get('candidate', 'name:jane*', ['id']))
+
+
+class TestSharedSearchCache(unittest.IsolatedAsyncioTestCase):
+
+  async def asyncSetUp(self):
+    self.redis_client = aioredis.Redis(connection_pool=RedisDB.get_pool())
+    await self.delete_keys()
+    self.search_cache = SearchCache(name='test_bullhorn_search_shared', redis=True)
+    # Another worker has the same cache, in its own process.
+    self.other_worker = SearchCache(name='test_bullhorn_search_shared', redis=True)
+    self.other_worker._cache = cache.Cache('test_bullhorn_search_shared', redis=True)
+
+  async def asyncTearDown(self):
+    await self.delete_keys()
+
+  async def delete_keys(self):
+    keys = [key async for key in self.redis_client.scan_iter(match='bullhorn:search_gen:*')]
+    keys += [key async for key in self.redis_client.scan_iter(match='cache:test_bullhorn_search*')]
+    if keys:
+      await self.redis_client.delete(*keys)
+
+  async def test_generations(self):
+    await self.search_cache.set('lead', 'name:jane*', ['id'], RESPONSE)
+    self.assertEqual(RESPONSE, await self.other_worker.get('lead', 'name:jane*', ['id']))
+
+    await self.other_worker.invalidate_entity_name('Lead')
+    self.assertEqual('1', await self.redis_client.get('bullhorn:search_gen:lead'))
+    self.assertIsNone(await self.search_cache.get('lead', 'name:jane*', ['id']))
+
+    await self.search_cache.invalidate()
+    self.assertEqual('2', await self.redis_client.get('bullhorn:search_gen:lead'))
+    self.assertEqual('1', await self.redis_client.get('bullhorn:search_gen:candidate'))
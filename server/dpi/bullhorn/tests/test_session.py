@@ -0,0 +1,96 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from core import exceptions
+from dpi.bullhorn.client import BullhornClient
+from dpi.bullhorn.client import BullhornResponse
+from dpi.bullhorn.session import BullhornSessionManager
+
+
+class TestBullhornSessionManager(unittest.IsolatedAsyncioTestCase):
+
+  def setUp(self):
+    self.logins = 0
+    self.valid_tokens = set()
+    self.requests = []
+    patcher = patch.object(BullhornClient, 'login', autospec=True, side_effect=self.login)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+    patcher = patch.object(BullhornClient, 'request', autospec=True, side_effect=self.request)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+    self.sessions = BullhornSessionManager(ttl=600, refresh_margin=60)
+
+  async def login(self, client, ttl=None):
+    self.logins += 1
+    await asyncio.sleep(0.01)
+    client.rest_token = f'token-{self.logins}'
+    self.valid_tokens.add(client.rest_token)
+    return client
+
+  async def login_rejected(self, client, ttl=None):
+    self.logins += 1
+    client.rest_token = f'token-{self.logins}'
+    return client
+
+  async def request(self, client, method, uri, params=None, data=None):
+    self.requests.append((client.rest_token, method, uri, params))
+    if client.rest_token not in self.valid_tokens:
+      return BullhornResponse(401, {'errorMessage': 'Bad BhRestToken'})
+
+    return BullhornResponse(200, {'data': []})
+
+  async def test_concurrent_logins(self):
+    clients = await asyncio.gather(*[self.sessions.get_client() for _ in range(5)])
+    self.assertEqual(1, self.logins)
+    self.assertTrue(all(client is clients[0] for client in clients))
+    self.assertEqual('token-1', clients[0].rest_token)
+    self.assertEqual(600, BullhornClient.login.call_args.kwargs['ttl'])
+
+  async def test_failed_login(self):
+    async def login(client, ttl=None):
+      return client
+
+    BullhornClient.login.side_effect = login
+    with self.assertRaises(exceptions.ServiceUnavailable):
+      await self.sessions.get_client()
+
+  async def test_proactive_refresh(self):
+    client = await self.sessions.get_client()
+    self.sessions._logged_in_at -= 550
+
+    # The current session is used while the new one is opened in the background.
+    self.assertIs(client, await self.sessions.get_client())
+    self.assertIs(client, await self.sessions.get_client())
+    await asyncio.sleep(0.05)
+    self.assertEqual(2, self.logins)
+    self.assertEqual('token-2', (await self.sessions.get_client()).rest_token)
+
+  async def test_expired_session(self):
+    await self.sessions.get_client()
+    self.sessions._logged_in_at -= 600
+    self.assertEqual('token-2', (await self.sessions.get_client()).rest_token)
+    self.assertEqual(2, self.logins)
+
+  async def test_retries_once_on_401(self):
+    await self.sessions.get_client()
+    self.valid_tokens.clear()
+    response = await self.sessions.request('GET', 'entity/Candidate/1')
+    self.assertTrue(response.ok)
+    self.assertEqual(['token-1', 'token-2'], [request[0] for request in self.requests])
+
+    # The request is not sent a third time if the new session is rejected too.
+    self.requests.clear()
+    self.valid_tokens.clear()
+    BullhornClient.login.side_effect = self.login_rejected
+    response = await self.sessions.request('GET', 'entity/Candidate/1')
+    self.assertEqual(401, response.status)
+    self.assertEqual(['token-2', 'token-3'], [request[0] for request in self.requests])
+
+  async def test_search(self):
+    await self.sessions.search('Candidate', 'phone:1234', ['id', 'name'], count=5)
+    params = {'query': 'phone:1234', 'fields': 'id,name', 'count': 5}
+    self.assertEqual(('token-1', 'GET', 'search/Candidate', params), self.requests[0])
@@ -0,0 +1,264 @@
+import asyncio
+import json
+import types
+import unittest
+from unittest.mock import patch
+
+from sanic.request import RequestParameters
+
+from dpi.bullhorn.api.util import BullhornAction
+from dpi.bullhorn.client import BullhornResponse
+from dpi.bullhorn.config import BullhornConfig
+from dpi.bullhorn.phone_index import phone_index
+from dpi.bullhorn.session import sessions
+
+
+bh_config = BullhornConfig()
+
+
+class StubClient:
+  """Answers the searches of each Bullhorn entity name with the given status, or hangs."""
+
+  def __init__(self, statuses):
+    self.statuses = statuses
+    self.searches = []
+
+  async def search(self, entity_name, query, fields, start=None, count=None):
+    self.searches.append((entity_name, query, fields, start, count))
+    status = self.statuses.get(entity_name, 200)
+    if status is None:
+      await asyncio.sleep(10)
+
+    if status != 200:
+      return BullhornResponse(status, {'errorMessage': f'{entity_name} failed'})
+
+    record = {'id': 1, 'name': entity_name}
+    return BullhornResponse(200, {'data': [record], 'count': 1, 'total': 3})
+
+
+class StubStream:
+  """Records what is sent to the client of a streamed response."""
+
+  def __init__(self, fail_after=None):
+    self.content_type = None
+    self.chunks = []
+    self.ended = False
+    self.fail_after = fail_after
+
+  async def respond(self, content_type=None):
+    self.content_type = content_type
+    return self
+
+  async def send(self, data):
+    if self.fail_after is not None and len(self.chunks) >= self.fail_after:
+      self.fail_after = None
+      raise RuntimeError('send failed')
+
+    self.chunks.append(data)
+
+  async def eof(self):
+    self.ended = True
+
+  @property
+  def body(self):
+    return ''.join(self.chunks)
+
+
+def make_action(statuses, stream=None, **args):
+  request = types.SimpleNamespace(
+    args=RequestParameters({
+      key: [value] for key, value in {'search': 'Jane', **args}.items() if value is not None
+    }),
+    respond=(stream or StubStream()).respond,
+  )
+  action = BullhornAction(request=request)
+  action.client = StubClient(statuses)
+  return action
+
+
+class TestSearchContact(unittest.IsolatedAsyncioTestCase):
+
+  def setUp(self):
+    patcher = patch.object(BullhornConfig, 'search_timeout', 0.05)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  async def test_merges_results(self):
+    result = await make_action({}).search_contact()
+    self.assertEqual(200, result['status'])
+    self.assertEqual(4, result['count'])
+    self.assertEqual(12, result['total'])
+    self.assertEqual({}, result['failed_entity_types'])
+    self.assertEqual(
+      ['lead', 'candidate', 'company', 'contact'], [rec['entity_type'] for rec in result['data']]
+    )
+
+  async def test_partial_failure(self):
+    result = await make_action({'Candidate': None, 'ClientContact': 401}).search_contact()
+    self.assertEqual(200, result['status'])
+    self.assertEqual(2, result['count'])
+    self.assertEqual(6, result['total'])
+    self.assertEqual(['lead', 'company'], [rec['entity_type'] for rec in result['data']])
+    self.assertEqual({
+      'candidate': {'status': 504, 'message': 'Search timed out'},
+      'contact': {'status': 401, 'message': 'ClientContact failed'},
+    }, result['failed_entity_types'])
+
+  async def test_all_failed(self):
+    statuses = {'Lead': None, 'Candidate': 500, 'ClientCorporation': 401, 'ClientContact': 403}
+    result = await make_action(statuses).search_contact()
+    # Authentication failures are reported rather than the other errors.
+    self.assertEqual(401, result['status'])
+    self.assertEqual('ClientCorporation failed', result['errorMessage'])
+    self.assertEqual([], result['data'])
+    self.assertEqual(4, len(result['failed_entity_types']))
+
+    statuses = {'Lead': 500, 'Candidate': None, 'ClientCorporation': 500, 'ClientContact': 403}
+    result = await make_action(statuses).search_contact()
+    self.assertEqual(403, result['status'])
+
+  async def test_all_timed_out(self):
+    statuses = {'Lead': None, 'Candidate': None, 'ClientCorporation': None, 'ClientContact': None}
+    result = await make_action(statuses).search_contact()
+    self.assertEqual(504, result['status'])
+    self.assertEqual('Search timed out', result['errorMessage'])
+
+  @patch.object(BullhornConfig, 'phone_index_enabled', True)
+  async def test_phone_index_hit(self):
+    action = make_action({}, search='(415) 555-0100')
+    action.client = sessions
+    records = [
+      {'id': 1, 'name': 'Jane', 'phone': '4155550100', 'entity_type': 'lead'},
+      {'id': 2, 'name': 'Acme', 'phone': '4155550100', 'entity_type': 'company'},
+    ]
+    with patch.object(phone_index, 'lookup', return_value=records) as lookup:
+      with patch.object(sessions, 'search') as search:
+        result = await action.search_contact()
+        search.assert_not_called()
+      lookup.assert_called_once_with('(415) 555-0100')
+
+    self.assertEqual(200, result['status'])
+    self.assertEqual(2, result['count'])
+    self.assertEqual(['lead', 'company'], [rec['entity_type'] for rec in result['data']])
+
+  async def test_auto_search(self):
+    action = make_action(
+      {}, search=None, phone='4155550100', bh_access_token='secret', idtoken='token', count='5'
+    )
+    await action.search_contact()
+    self.assertEqual({'phone:4155550100'}, {search[1] for search in action.client.searches})
+    # The request args are not modified.
+    self.assertEqual('secret', action.request.args.get('bh_access_token'))
+    self.assertEqual('5', action.request.args.get('count'))
+
+  async def test_unexpected_errors(self):
+    action = make_action({})
+
+    async def search(entity_name, *args, **kwargs):
+      raise RuntimeError(f'{entity_name} broke')
+
+    action.client.search = search
+    result = await action.search_contact()
+    self.assertEqual(500, result['status'])
+    failure = result['failed_entity_types']['lead']
+    self.assertEqual({'status': 500, 'message': 'Lead broke'}, failure)
+
+
+class TestSearchParams(unittest.TestCase):
+
+  def test_defaults(self):
+    action = make_action({})
+    action.parse_search_params()
+    self.assertEqual(0, action.start)
+    self.assertIsNone(action.count)
+    self.assertIsNone(action.fields)
+    self.assertEqual(['id', 'name', 'phone'], action.get_search_fields('company'))
+
+  def test_paging(self):
+    action = make_action({}, start='10', count=str(bh_config.search_max_count))
+    action.parse_search_params()
+    self.assertEqual(10, action.start)
+    self.assertEqual(bh_config.search_max_count, action.count)
+
+  def test_invalid_paging(self):
+    for args in [
+      {'start': '-1'},
+      {'start': 'first'},
+      {'count': '0'},
+      {'count': '-5'},
+      {'count': str(bh_config.search_max_count + 1)},
+      {'count': '1.5'},
+    ]:
+      with self.assertRaises(ValueError, msg=args):
+        make_action({}, **args).parse_search_params()
+
+  def test_fields(self):
+    action = make_action({}, fields=' email, id,,name ')
+    action.parse_search_params()
+    # The id is always returned first.
+    self.assertEqual(['id', 'email', 'name'], action.fields)
+    self.assertEqual(['id', 'email', 'name'], action.get_search_fields('company'))
+
+
+class TestStreamSearchContact(unittest.IsolatedAsyncioTestCase):
+
+  def setUp(self):
+    patcher = patch.object(BullhornConfig, 'search_timeout', 0.05)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+
+  async def test_json(self):
+    stream = StubStream()
+    action = make_action({'Candidate': None, 'ClientContact': 401}, stream=stream)
+    await action.stream_search_contact('json')
+    self.assertEqual('application/json', stream.content_type)
+    self.assertTrue(stream.ended)
+
+    body = json.loads(stream.body)
+    self.assertEqual(200, body['status'])
+    self.assertEqual(2, body['count'])
+    self.assertEqual(6, body['total'])
+    self.assertEqual(['company', 'lead'], sorted(rec['entity_type'] for rec in body['data']))
+    self.assertEqual({
+      'candidate': {'status': 504, 'message': 'Search timed out'},
+      'contact': {'status': 401, 'message': 'ClientContact failed'},
+    }, body['failed_entity_types'])
+
+  async def test_ndjson(self):
+    stream = StubStream()
+    action = make_action({'ClientContact': 401}, stream=stream, count='1', fields='name')
+    await action.stream_search_contact('ndjson')
+    self.assertEqual('application/x-ndjson', stream.content_type)
+    self.assertTrue(stream.ended)
+
+    lines = {line['entity_type']: line for line in map(json.loads, stream.body.splitlines())}
+    self.assertEqual(['candidate', 'company', 'contact', 'lead'], sorted(lines))
+    self.assertEqual(401, lines['contact']['status'])
+    self.assertEqual(200, lines['lead']['status'])
+    self.assertEqual([{'id': 1, 'name': 'Lead', 'entity_type': 'lead'}], lines['lead']['data'])
+    query = action.build_free_search_query('lead', 'Jane')
+    self.assertEqual(('Lead', query, ['id', 'name'], None, 1), action.client.searches[0])
+
+  async def test_invalid_mode(self):
+    stream = StubStream()
+    with self.assertRaises(ValueError):
+      await make_action({}, stream=stream).stream_search_contact('csv')
+    self.assertIsNone(stream.content_type)
+
+  async def test_failure_after_respond(self):
+    stream = StubStream(fail_after=2)
+    await make_action({}, stream=stream).stream_search_contact('json')
+    self.assertTrue(stream.ended)
+    body = json.loads(stream.body)
+    self.assertEqual(500, body['status'])
+    self.assertEqual('send failed', body['details'])
+    self.assertEqual(1, body['count'])
+
+    stream = StubStream(fail_after=1)
+    await make_action({}, stream=stream).stream_search_contact('ndjson')
+    self.assertTrue(stream.ended)
+    lines = [json.loads(line) for line in stream.body.splitlines()]
+    self.assertEqual(200, lines[0]['status'])
+    self.assertEqual({
+      'status': 500, 'errorMessage': 'Internal server error', 'details': 'send failed'
+    }, lines[-1])